@@ -0,0 +1,153 @@
+"""
+Пакетный расчёт: сразу много площадей × все товары (и все варианты упаковки auto_pick).
+Та же целочисленная арифметика (мм², базисные пункты), что в calc_counts_for_product,
+но массивами int64 NumPy — результаты совпадают со скалярной функцией бит в бит.
+
+    python -m batch rooms.csv -o estimate.csv --reserves 0,0.1
+
+CSV на входе: колонка area (м²), необязательно reserve (0.1 = 10%);
+остальные колонки (название комнаты и т.п.) переносятся в результат как есть.
+На выходе строка на (вход, товар, вариант упаковки): best=1 — лучший из вариантов по отдельности,
+recommended — сколько упаковок этого варианта в рекомендации бота (смешанный набор из MIX_TABLES).
+"""
+import csv
+import sys
+import argparse
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from calc import AREA_SCALE, MIX_TABLES, PRODUCTS, RESERVE_SCALE, PackMix
+
+
+def _packs(target: np.ndarray, pack_mm2: int) -> Dict[str, np.ndarray]:
+    count = -(-target // (pack_mm2 * RESERVE_SCALE))
+    over = count * pack_mm2 * RESERVE_SCALE - target
+    return {
+        "count": count,
+        "covered": count * pack_mm2 / AREA_SCALE,
+        "over": over / (AREA_SCALE * RESERVE_SCALE),
+        "over_units": over,
+    }
+
+
+def _mix(target: np.ndarray, mix: PackMix) -> np.ndarray:
+    """PackMix.lookup по массиву: (len(target), вариантов) — сколько упаковок каждого варианта."""
+    steps = -(-target // (mix.unit * RESERVE_SCALE))
+    inside = steps <= mix.limit
+    combos = np.zeros((len(target), len(mix.packs)), dtype=np.int64)
+    combos[inside] = np.asarray(mix.table, dtype=np.int64)[steps[inside]]
+    # за пределами таблицы — скалярный добор, по разу на каждое значение
+    outside = np.flatnonzero(~inside)
+    if len(outside):
+        uniq, inv = np.unique(target[outside], return_inverse=True)
+        combos[outside] = np.array([mix.lookup(int(t)) for t in uniq], dtype=np.int64)[inv]
+    return combos
+
+
+def estimate(
+    areas: Sequence[float],
+    reserves: Any = 0.10,
+    products: Optional[Iterable[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    areas и reserves — массивы одной длины (или reserves — одно число).
+    Для каждого товара: target_area и count/covered/over; для auto_pick — по каждому
+    варианту в "variants", индекс лучшего из них (меньше всего лишнего) в "best"
+    и рекомендованный смешанный набор в "mix" (как calc_counts_for_product()["mix"]).
+    """
+    areas = np.asarray(areas, dtype=np.float64)
+    reserves = np.broadcast_to(np.asarray(reserves, dtype=np.float64), areas.shape)
+    # как area_mm2 / with_reserve в calc: np.rint и round() округляют одинаково (к чётному)
+    mm2 = np.rint(areas * AREA_SCALE).astype(np.int64)
+    bp = np.rint(reserves * RESERVE_SCALE).astype(np.int64)
+    target = mm2 * (RESERVE_SCALE + bp)
+    target_area = target / (AREA_SCALE * RESERVE_SCALE)
+
+    result: Dict[str, Dict[str, Any]] = {}
+    for key in products or PRODUCTS:
+        p = PRODUCTS[key]
+        if p.get("auto_pick"):
+            variants = [dict(_packs(target, v["pack_mm2"]), label=v["label"]) for v in p["variants"]]
+            # argmin берёт первый минимум — как строгое "<" в скалярной версии
+            best = np.argmin(np.stack([v["over_units"] for v in variants]), axis=0)
+            combos = _mix(target, MIX_TABLES[key])
+            covered = combos @ np.array([v["pack_mm2"] for v in p["variants"]], dtype=np.int64)
+            mix = {
+                "counts": combos,
+                "count": combos.sum(axis=1),
+                "covered": covered / AREA_SCALE,
+                "over": (covered * RESERVE_SCALE - target) / (AREA_SCALE * RESERVE_SCALE),
+            }
+            result[key] = {
+                "type": "auto_pick", "target_area": target_area, "variants": variants, "best": best, "mix": mix,
+            }
+        else:
+            result[key] = dict(_packs(target, p["pack_mm2"]), type="single", target_area=target_area)
+    return result
+
+
+def iter_rows(
+    areas: Sequence[float],
+    reserves: Sequence[float],
+    extra: Optional[List[Dict[str, str]]] = None,
+    products: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Плоские строки для CSV: одна на (вход, товар, вариант упаковки)."""
+    res = estimate(areas, reserves, products)
+    for i in range(len(areas)):
+        base = dict(extra[i]) if extra else {}
+        base.update(area=float(areas[i]), reserve=float(reserves[i]))
+        for key, r in res.items():
+            if r["type"] == "single":
+                yield dict(base, product=key, variant="", target_area=float(r["target_area"][i]),
+                           count=int(r["count"][i]), covered=float(r["covered"][i]),
+                           over=float(r["over"][i]), best=1, recommended=int(r["count"][i]))
+                continue
+            for j, v in enumerate(r["variants"]):
+                yield dict(base, product=key, variant=v["label"], target_area=float(r["target_area"][i]),
+                           count=int(v["count"][i]), covered=float(v["covered"][i]),
+                           over=float(v["over"][i]), best=int(r["best"][i] == j),
+                           recommended=int(r["mix"]["counts"][i, j]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Пакетный расчёт упаковок по CSV")
+    ap.add_argument("input", help="CSV с колонкой area (и, по желанию, reserve)")
+    ap.add_argument("-o", "--output", help="куда писать CSV (по умолчанию stdout)")
+    ap.add_argument("--reserves", default="0.1",
+                    help="запасы через запятую, если в CSV нет колонки reserve (например: 0,0.1)")
+    ap.add_argument("--products", help="товары через запятую (по умолчанию все)")
+    a = ap.parse_args(argv)
+
+    with open(a.input, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+
+    areas: List[float] = []
+    reserves: List[float] = []
+    extra: List[Dict[str, str]] = []
+    fallback = [float(x) for x in a.reserves.split(",")]
+    for row in rows:
+        area = float(row.pop("area").replace(",", "."))
+        own = row.pop("reserve", None)
+        for r in ([float(own.replace(",", "."))] if own else fallback):
+            areas.append(area)
+            reserves.append(r)
+            extra.append(row)
+
+    products = a.products.split(",") if a.products else None
+    out = open(a.output, "w", newline="", encoding="utf-8") if a.output else sys.stdout
+    try:
+        writer = None
+        for item in iter_rows(areas, reserves, extra, products):
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(item))
+                writer.writeheader()
+            writer.writerow(item)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
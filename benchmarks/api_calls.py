@@ -0,0 +1,40 @@
+"""
+Сколько исходящих вызовов Bot API уходит на один завершённый расчёт:
+обычный режим против COMPACT_RESULT. wall — время всего сценария, если
+каждый вызов API занимает LATENCY (последовательные вызовы складываются).
+
+    python -m benchmarks.api_calls
+"""
+import time
+import asyncio
+from collections import Counter
+
+from benchmarks.fake_api import FLOWS, FakeSession, load_bot, step_update
+
+bot = load_bot()
+
+LATENCY = 0.02
+
+
+async def count_calls(flow, compact: bool):
+    bot.COMPACT_RESULT = compact
+    session = FakeSession(latency=LATENCY)
+    b = bot.Bot(bot.BOT_TOKEN, session=session)
+    t0 = time.perf_counter()
+    for step in flow:
+        await bot.dp.feed_update(b, step_update(1, step))
+    return Counter(type(m).__name__ for m in session.calls), time.perf_counter() - t0
+
+
+async def main() -> None:
+    print(f"{'flow':<20} {'mode':<8} {'total':>5} {'wall ms':>8}  calls")
+    for name, flow in FLOWS.items():
+        for compact in (False, True):
+            c, wall = await count_calls(flow, compact)
+            detail = ", ".join(f"{k} {v}" for k, v in sorted(c.items()))
+            mode = "compact" if compact else "classic"
+            print(f"{name:<20} {mode:<8} {sum(c.values()):>5} {wall * 1000:>8.0f}  {detail}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
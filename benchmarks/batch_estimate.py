@@ -0,0 +1,75 @@
+"""
+Пакетный расчёт NumPy против цикла по calc_counts_for_product.
+Перед замером сверяет результаты поэлементно (==, без допусков), включая
+площади ровно на границе упаковки — там ceil чувствителен к последнему биту.
+
+    python -m benchmarks.batch_estimate
+"""
+import time
+import random
+
+import numpy as np
+
+from calc import MIX_MAX_AREA, PRODUCTS, calc_counts_for_product
+from batch import estimate
+
+RESERVES = (0.0, 0.05, 0.10, 0.15)
+
+
+def edge_areas():
+    out = []
+    for p in PRODUCTS.values():
+        for pack in [v["pack_area"] for v in p.get("variants", [])] or [p["pack_area"]]:
+            for k in range(1, 60):
+                exact = pack * k
+                out += [exact, exact / 1.1, exact / 1.05, np.nextafter(exact, 0), np.nextafter(exact, 10 ** 6)]
+    # и за пределами таблицы смешанных упаковок
+    return out + [1.7999999, 1.8, 1.8000001, 0.01, 2.508 * 7, 2.508 * 7 / 1.1, MIX_MAX_AREA + 0.7, 1234.5]
+
+
+def check(areas, reserves) -> None:
+    res = estimate(areas, reserves)
+    for i, (a, r) in enumerate(zip(areas, reserves)):
+        for key, vec in res.items():
+            c = calc_counts_for_product(key, float(a), float(r))
+            assert vec["target_area"][i] == c["target_area"], (key, a, r)
+            if c["type"] == "single":
+                assert (vec["count"][i], vec["covered"][i]) == (c["count"], c["covered"]), (key, a, r)
+                continue
+            for v, s in zip(vec["variants"], c["variants"]):
+                assert (v["count"][i], v["covered"][i], v["over"][i]) == (s["count"], s["covered"], s["over"]), (key, a, r)
+            assert vec["variants"][vec["best"][i]]["label"] == c["best"]["label"], (key, a, r)
+            mix = vec["mix"]
+            assert [(v["label"], int(n)) for v, n in zip(c["variants"], mix["counts"][i]) if n] == \
+                [(m["label"], m["count"]) for m in c["mix"]["items"]], (key, a, r)
+            assert (mix["covered"][i], mix["over"][i]) == (c["mix"]["covered"], c["mix"]["over"]), (key, a, r)
+
+
+def main(n: int = 100_000) -> None:
+    edges = edge_areas()
+    check([a for a in edges for _ in RESERVES], [r for _ in edges for r in RESERVES])
+
+    rnd = random.Random(1)
+    areas = [round(rnd.uniform(0.5, 200), rnd.choice((1, 2, 3))) for _ in range(n)]
+    reserves = [rnd.choice(RESERVES) for _ in range(n)]
+    check(areas[:5000], reserves[:5000])
+    print(f"совпадение со скалярной версией: ok ({len(edges) * len(RESERVES) + 5000} входов × {len(PRODUCTS)} товаров)")
+
+    t0 = time.perf_counter()
+    for a, r in zip(areas, reserves):
+        for key in PRODUCTS:
+            calc_counts_for_product(key, a, r)
+    scalar = time.perf_counter() - t0
+
+    a_np, r_np = np.array(areas), np.array(reserves)
+    t0 = time.perf_counter()
+    estimate(a_np, r_np)
+    vector = time.perf_counter() - t0
+
+    print(f"{n} площадей × {len(PRODUCTS)} товаров")
+    print(f"  цикл calc_counts_for_product: {scalar * 1e3:8.1f} мс")
+    print(f"  batch.estimate (NumPy):       {vector * 1e3:8.1f} мс  (×{scalar / vector:.0f})")
+
+
+if __name__ == "__main__":
+    main()
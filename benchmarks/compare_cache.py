@@ -0,0 +1,39 @@
+"""
+Кнопка «Сравнить все товары» через весь Dispatcher: первое нажатие (все PRODUCTS за один
+проход) против переключения между товарами, когда всё уже лежит в compare_all.
+
+    python -m benchmarks.compare_cache
+"""
+import time
+import asyncio
+import statistics
+
+from benchmarks.fake_api import FakeSession, callback_update, load_bot
+
+bot = load_bot()
+
+AREAS = [(12_500_000, 1000), (3_600_000, 0), (18_500_000, 1000), (42_000_000, 500)]
+
+
+async def timed(b, data: str) -> float:
+    t0 = time.perf_counter()
+    await bot.dp.feed_update(b, callback_update(1, data))
+    return (time.perf_counter() - t0) * 1e6
+
+
+async def main(repeat: int = 200) -> None:
+    b = bot.Bot(bot.BOT_TOKEN, session=FakeSession())
+    await bot.dp.feed_update(b, callback_update(1, "compare:1000000:0:"))      # прогрев
+    print(f"{'площадь, запас':<18} {'первое µs':>10} {'переключение µs':>16}")
+    for area, reserve in AREAS:
+        bot.compare_all.cache_clear()
+        cold = await timed(b, f"compare:{area}:{reserve}:")
+        switches = [f"compare:{area}:{reserve}:{key}" for key in bot.PRODUCTS]
+        warm = statistics.median([await timed(b, switches[i % len(switches)]) for i in range(repeat)])
+        print(f"{area / 1e6:>7g} м², {reserve / 100:>4g}% {cold:>10.0f} {warm:>16.0f}")
+    info = bot.compare_all.cache_info()
+    print(f"кэш: {info.hits} попаданий, {info.misses} промахов, размер {info.currsize}/{info.maxsize}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""
+Фальшивый Bot API для бенчмарков: сессия aiogram, которая ничего не шлёт в сеть,
+а записывает вызовы и отвечает правдоподобными объектами.
+"""
+import os
+import itertools
+from typing import Any, Dict, List, Optional
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage, TelegramMethod
+from aiogram.types import CallbackQuery, Chat, InlineQuery, Message, Update, User
+
+# bot.py требует BOT_TOKEN при импорте; для локальных прогонов хватает фиктивного
+FAKE_TOKEN = "123456:" + "A" * 35
+
+
+def load_bot():
+    os.environ.setdefault("BOT_TOKEN", FAKE_TOKEN)
+    # Сценарии жмут кнопки быстрее любого человека — ограничитель частоты им не нужен
+    os.environ.setdefault("THROTTLE_RATE", "0")
+    import bot
+    return bot
+
+
+class FakeSession(BaseSession):
+    def __init__(self, latency: float = 0.0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.calls: List[TelegramMethod] = []
+        self._message_ids = itertools.count(1000)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args: Any, **kwargs: Any):  # pragma: no cover
+        yield b""
+
+    async def make_request(self, bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.calls.append(method)
+        if self.latency:
+            import asyncio
+            await asyncio.sleep(self.latency)
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return Message(
+                message_id=next(self._message_ids),
+                date=0,
+                chat=Chat(id=method.chat_id or 0, type="private"),
+                text=method.text,
+                reply_markup=method.reply_markup,
+            )
+        return True
+
+
+_ids = itertools.count(1)
+
+
+def message_update(chat_id: int, text: str) -> Update:
+    return Update(
+        update_id=next(_ids),
+        message=Message(
+            message_id=next(_ids),
+            date=0,
+            chat=Chat(id=chat_id, type="private"),
+            from_user=User(id=chat_id, is_bot=False, first_name="user"),
+            text=text,
+        ),
+    )
+
+
+def callback_update(chat_id: int, data: str, message_id: int = 1) -> Update:
+    return Update(
+        update_id=next(_ids),
+        callback_query=CallbackQuery(
+            id=str(next(_ids)),
+            chat_instance=str(chat_id),
+            from_user=User(id=chat_id, is_bot=False, first_name="user"),
+            data=data,
+            message=Message(
+                message_id=message_id,
+                date=0,
+                chat=Chat(id=chat_id, type="private"),
+                from_user=User(id=1, is_bot=True, first_name="bot"),
+                text="…",
+            ),
+        ),
+    )
+
+
+def inline_update(user_id: int, query: str) -> Update:
+    return Update(
+        update_id=next(_ids),
+        inline_query=InlineQuery(
+            id=str(next(_ids)),
+            from_user=User(id=user_id, is_bot=False, first_name="user"),
+            query=query,
+            offset="",
+        ),
+    )
+
+
+def step_update(chat_id: int, step: str) -> Update:
+    """Шаг сценария: "@data" — нажатие кнопки, "?текст" — inline-запрос, остальное — текст сообщения."""
+    if step.startswith("@"):
+        return callback_update(chat_id, step[1:])
+    if step.startswith("?"):
+        return inline_update(chat_id, step[1:])
+    return message_update(chat_id, step)
+
+
+# Полные сценарии расчёта — от /start до ответа о цене
+FLOWS = {
+    "quick_total": [
+        "/start", "@calc:panel_30x60_auto", "@mode:total", "12.5", "@openings:no", "@price:no",
+    ],
+    "surfaces_openings": [
+        "/start", "@calc:film_60x3", "@mode:surfaces",
+        "Стол", "300", "100", "@sides:2", "@surface:add",
+        "Полка", "80", "30", "@sides:1", "@surface:finish",
+        "@openings:yes", "@opening_type:door", "@opening_preset:door:0.8:2.0",
+        "@opening_type:window", "@opening_manual:window", "120", "140 см",
+        "@opening:finish", "@price:no",
+    ],
+    "laminate_waste": [
+        "/start", "@calc:laminate", "@waste:toggle", "@waste:toggle", "@waste:continue",
+        "18.5", "@openings:no", "@price:no",
+    ],
+    "price_entry": [
+        "/start", "@calc:panel_30x30_20", "@mode:total", "9.8", "@openings:no", "@price:yes", "790",
+    ],
+}
+
+# Последнее сообщение бота, если сценарий прошёл по шагам как задумано.
+# С COMPACT_RESULT стоимость, магазины и «Новый расчёт» приходят одним сообщением,
+# так что в price_entry заодно проверяется и сама цена. EDIT_IN_PLACE последних сообщений не меняет.
+def final_texts(bot) -> Dict[str, str]:
+    done = "Готово ✅\nНовый расчёт:"
+    if bot.COMPACT_RESULT:
+        priced = "💰 Стоимость:\n6 × 790 = 4 740.00 ₽\n\n🛒 Официальный магазин the_all4u — кнопки ниже.\n\nНовый расчёт 👇"
+    else:
+        priced = "\nНовый расчёт 👇"
+    return {
+        "quick_total": done,
+        "surfaces_openings": done,
+        "laminate_waste": done,
+        "price_entry": priced,
+    }
@@ -0,0 +1,95 @@
+"""
+Раскрой плёнки по рулонам 60×300 см на 50 случайных поверхностях мебели.
+Проверяет, что каждый кусок лежит ровно один раз и ничего не вылезает за рулон,
+и сравнивает: оценку по площади, один проход FFD и полный план с улучшением. Время плана —
+для больших наборов (улучшение идёт до дедлайна) и для обычных в боте 1–6 деталей, где план
+часто доходит до нижней оценки и останавливается сразу.
+
+    python -m benchmarks.film_layout
+"""
+import random
+import statistics
+import time
+
+from layout import (
+    ROLL_LENGTH_MM,
+    ROLL_WIDTH_MM,
+    SORT_KEYS,
+    FILM_BUDGET_MS,
+    _first_fit_decreasing,
+    _lower_bound,
+    film_pieces,
+    plan_film_rolls,
+)
+
+
+def random_surfaces(rnd: random.Random, n: int = 50):
+    return [
+        (f"Деталь {i}", rnd.choice((30, 40, 45, 60, 80, 120, 180, 210, 240)) + rnd.randint(0, 9) * 0.5,
+         rnd.choice((20, 30, 35, 40, 50, 60, 70, 100)), rnd.choice((1, 1, 2)))
+        for i in range(1, n + 1)
+    ]
+
+
+def check(surfaces, rolls) -> None:
+    want = sorted((p.name, p.length, p.width) for p in film_pieces(surfaces))
+    got = []
+    for r in rolls:
+        assert sum(s.length for s in r.shelves) + r.free_length == ROLL_LENGTH_MM
+        for s in r.shelves:
+            assert sum(c.width for c in s.columns) + s.free_width == ROLL_WIDTH_MM
+            for c in s.columns:
+                assert sum(p.length for p in c.pieces) + c.free_length == s.length
+                assert all(p.width <= c.width for p in c.pieces)
+            got += [(p.name, p.length, p.width) for p in s.pieces]
+    assert sorted(got) == want
+
+
+def plans(sets):
+    """Время плана (мс) по наборам и сколько планов дошло до нижней оценки (остановились раньше дедлайна)."""
+    times, at_bound, rolls_total = [], 0, 0
+    for surfaces in sets:
+        t0 = time.perf_counter()
+        rolls = plan_film_rolls(surfaces)
+        times.append((time.perf_counter() - t0) * 1e3)
+        check(surfaces, rolls)
+        at_bound += len(rolls) <= _lower_bound(film_pieces(surfaces))
+        rolls_total += len(rolls)
+    return sorted(times), at_bound, rolls_total / len(sets)
+
+
+def report(title: str, runs: int, times, at_bound: int) -> None:
+    over = [t - FILM_BUDGET_MS for t in times if t > FILM_BUDGET_MS]
+    print(f"{title}: p50 {times[len(times) // 2]:.2f} мс, p99 {times[int(len(times) * 0.99)]:.2f} мс, "
+          f"макс {times[-1]:.2f} мс; до нижней оценки {at_bound} из {runs}; "
+          f"сверх бюджета {len(over)} из {runs}" + (f" (на {statistics.median(over):.2f} мс в медиане, "
+                                                  f"макс {max(over):.2f} мс)" if over else ""))
+
+
+def main(runs: int = 200) -> None:
+    rnd = random.Random(3)
+    sets = [random_surfaces(rnd) for _ in range(runs)]
+    by_area, ffd, first = [], [], []
+    for surfaces in sets:
+        area = sum(ln * w * s for _, ln, w, s in surfaces) / 10_000
+        by_area.append(-(-area // 1.8))
+        t0 = time.perf_counter()
+        ffd.append(len(_first_fit_decreasing(film_pieces(surfaces), SORT_KEYS[0])))
+        first.append((time.perf_counter() - t0) * 1e3)
+    first.sort()
+    times, at_bound, mean_rolls = plans(sets)
+
+    print(f"{runs} наборов × 50 поверхностей, бюджет {FILM_BUDGET_MS} мс — раскладки корректны")
+    print(f"рулонов в среднем: по площади {statistics.mean(by_area):.1f}, "
+          f"FFD {statistics.mean(ffd):.1f}, с улучшением {mean_rolls:.1f}")
+    print(f"первый проход FFD (делается всегда): p50 {first[len(first) // 2]:.2f} мс, "
+          f"p99 {first[int(len(first) * 0.99)]:.2f} мс, макс {first[-1]:.2f} мс")
+    report("план, 50 поверхностей", runs, times, at_bound)
+    # обычный расчёт в боте — несколько деталей
+    rnd = random.Random(5)
+    times, at_bound, _ = plans([random_surfaces(rnd, rnd.randint(1, 6)) for _ in range(runs)])
+    report("план, 1–6 поверхностей", runs, times, at_bound)
+
+
+if __name__ == "__main__":
+    main()
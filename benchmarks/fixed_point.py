@@ -0,0 +1,87 @@
+"""
+Целочисленный расчёт упаковок (calc.py, мм² + б.п.) против прежнего float и варианта на Decimal:
+сколько точных кратных упаковки float-путь считал неверно и замер на одних и тех же строках ввода.
+Свойства самого расчёта проверяет tests/test_fixed_point.py.
+
+    python -m benchmarks.fixed_point
+"""
+import math
+import random
+import timeit
+from decimal import ROUND_CEILING, Decimal
+from fractions import Fraction
+
+from calc import PRODUCTS, packs_needed, parse_area_mm2, with_reserve
+
+PACKS = {key: [Fraction(v["pack_mm2"], 10 ** 6) for v in p.get("variants", [p])] for key, p in PRODUCTS.items()}
+# площади упаковок так, как они были записаны до перехода на мм²
+OLD_PACKS = {
+    "film_60x3": [0.6 * 3.0],
+    "panel_30x30_20": [0.3 * 0.3 * 20],
+    "panel_30x60_auto": [0.3 * 0.6 * 10, 0.3 * 0.6 * 18],
+    "laminate": [2.508],
+}
+
+
+def random_decimal(rnd: random.Random) -> str:
+    whole = rnd.randint(0, 300)
+    frac = "".join(rnd.choice("0123456789") for _ in range(rnd.randint(0, 6)))
+    text = f"{whole}.{frac}" if frac else str(whole)
+    return text.replace(".", ",") if rnd.random() < 0.3 else text
+
+
+# ----- прежний путь: float -----
+def float_counts(text: str, reserve: float, pack_area: float) -> int:
+    area = float(text.strip().replace(",", "."))
+    return math.ceil(area * (1 + reserve) / pack_area)
+
+
+# ----- вариант на Decimal (с той же проверкой ввода, что у parse_float) -----
+def decimal_counts(text: str, reserve: Decimal, pack_area: Decimal) -> int:
+    area = Decimal(text.strip().replace(",", "."))
+    if not area.is_finite() or area <= 0:
+        raise ValueError(text)
+    return int((area * (1 + reserve) / pack_area).to_integral_value(rounding=ROUND_CEILING))
+
+
+# ----- целые мм² (то, что внутри calc_counts_for_product) -----
+def fixed_counts(text: str, reserve_bp: int, pack_mm2: int) -> int:
+    return packs_needed(with_reserve(parse_area_mm2(text), reserve_bp), pack_mm2)
+
+
+def float_misses() -> int:
+    # сколько точных кратных упаковки старый float-путь считает не в то количество
+    misses = 0
+    for key, packs in PACKS.items():
+        for pack, old in zip(packs, OLD_PACKS[key]):
+            for k in range(1, 500):
+                if float_counts(str(float(pack * k)), 0.0, old) != k:
+                    misses += 1
+    return misses
+
+
+def main(number: int = 20_000) -> None:
+    print(f"float-путь ошибается на точных кратных упаковки: {float_misses()} раз из {499 * sum(map(len, PACKS.values()))}")
+
+    rnd = random.Random(1)
+    texts = [random_decimal(rnd) or "1" for _ in range(1000)]
+    texts = [t for t in texts if Fraction(t.replace(",", ".")) > 0]
+    key = "laminate"
+    pack_f, pack_d = OLD_PACKS[key][0], Decimal("2.508")
+    r_f, r_d = 0.1, Decimal("0.1")
+
+    def run(fn, *args):
+        return min(timeit.repeat(lambda: [fn(t, *args) for t in texts], number=number // len(texts) or 1, repeat=5))
+
+    per = (number // len(texts) or 1) * len(texts) / 1e6
+    t_float = run(float_counts, r_f, pack_f) / per
+    t_dec = run(decimal_counts, r_d, pack_d) / per
+    t_fixed = run(fixed_counts, 1000, PRODUCTS[key]["pack_mm2"]) / per
+    print(f"разбор строки + запас + ceil, {key}:")
+    print(f"  {'float (было)':<22} {t_float:>6.2f} µs")
+    print(f"  {'Decimal':<22} {t_dec:>6.2f} µs")
+    print(f"  {'целые мм² (calc.py)':<22} {t_fixed:>6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Сколько обращений к FSM-хранилищу на самом деле: сценарии FLOWS через весь Dispatcher,
+у хранилища подменены методы (time_storage_ops) и считаются вызовы. Сравнивается с тем,
+что FSMSession записывает в SESSION_STATS (его показывает health как fsm_ops_saved),
+и с тем, сколько сделал бы хендлер через FSMContext. Расхождение — ошибка, выход с кодом 1.
+
+    python -m benchmarks.fsm_ops
+"""
+import os
+import asyncio
+import tempfile
+from collections import Counter
+from typing import Dict
+
+from benchmarks import resp_server
+from benchmarks.fake_api import FLOWS, FakeSession, load_bot, step_update
+
+bot = load_bot()
+from storage import SESSION_STATS, build_storage, time_storage_ops  # noqa: E402
+
+
+async def run_flows(storage, isolation) -> Dict[str, int]:
+    calls: Counter = Counter()
+    time_storage_ops(storage, lambda seconds, op: calls.update((op,)))
+    bot.dp.fsm.storage, bot.dp.fsm.events_isolation = storage, isolation
+    before = dict(SESSION_STATS)
+    b = bot.Bot(bot.BOT_TOKEN, session=FakeSession())
+    for i, flow in enumerate(FLOWS.values()):
+        for step in flow:
+            await bot.dp.feed_update(b, step_update(500 + i, step))
+    await storage.close()
+    return {
+        "updates": SESSION_STATS["updates"] - before["updates"],
+        "logical": SESSION_STATS["logical_ops"] - before["logical_ops"],
+        "reported": SESSION_STATS["storage_ops"] - before["storage_ops"],
+        "real": sum(calls.values()),
+    }
+
+
+async def main() -> int:
+    tmp = tempfile.mkdtemp()
+    stand_in, server, port = await resp_server.start()
+    cases = [
+        ("memory (MemoryStorage)", dict(kind="memory")),
+        ("memory + TTL (по умолчанию)", dict(kind="memory", ttl=3600, max_sessions=1000)),
+        ("sqlite + write-behind", dict(kind="sqlite", sqlite_path=os.path.join(tmp, "fsm.sqlite3"))),
+        ("redis + write-behind", dict(kind="redis", redis_url=f"redis://127.0.0.1:{port}/0")),
+    ]
+    wrong = 0
+    print(f"{'хранилище':<30} {'апдейтов':>8} {'FSMContext':>11} {'в health':>9} {'на деле':>8}")
+    for name, kwargs in cases:
+        r = await run_flows(*build_storage(**kwargs))
+        ok = r["reported"] == r["real"]
+        wrong += not ok
+        print(f"{name:<30} {r['updates']:>8} {r['logical']:>11} {r['reported']:>9} {r['real']:>8}"
+              + ("" if ok else "  ← не сходится"))
+    server.close()
+    await server.wait_closed()
+    return wrong
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if asyncio.run(main()) else 0)
@@ -0,0 +1,71 @@
+"""
+История расчётов: сколько стоит record() в finalize_calc (только память) против
+немедленного INSERT на каждый расчёт, скорость пакетной записи и чтения /history.
+
+    python -m benchmarks.history_store
+"""
+import os
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+import statistics
+
+from calc import PRODUCTS, calc_counts_for_product
+from history import HistoryEntry, HistoryStore, now_ms
+
+
+def random_entries(rnd: random.Random, n: int):
+    keys = list(PRODUCTS)
+    entries = []
+    for i in range(n):
+        key = rnd.choice(keys)
+        area = rnd.randint(100, 5000) / 100
+        counts = calc_counts_for_product(key, area, 0.10)
+        entries.append((rnd.randint(1, 500), HistoryEntry(now_ms() + i, key, area, 0.0, 0.10, counts, [], None)))
+    return entries
+
+
+async def main(n: int = 20_000) -> None:
+    entries = random_entries(random.Random(7), n)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Как было бы без батчей: INSERT и COMMIT на каждый расчёт, прямо в хендлере
+        conn = sqlite3.connect(os.path.join(tmp, "sync.sqlite3"), isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE history (user_id, at, product, base_mm2, openings_mm2, reserve_bp, payload)")
+        sync = []
+        for uid, e in entries[:2000]:
+            t0 = time.perf_counter()
+            conn.execute("INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?)", e.to_row(uid))
+            sync.append((time.perf_counter() - t0) * 1e6)
+        conn.close()
+
+        store = HistoryStore(os.path.join(tmp, "history.sqlite3"))
+        record = []
+        for uid, e in entries:
+            t0 = time.perf_counter()
+            store.record(uid, e)
+            record.append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        await store.flush()
+        flush_s = time.perf_counter() - t0
+
+        users = [uid for uid, _ in entries[:1000]]
+        t0 = time.perf_counter()
+        for uid in users:
+            recent = await store.recent(uid, 10)
+            assert recent == sorted(recent, key=lambda e: -e.at)
+        recall = (time.perf_counter() - t0) / len(users) * 1e6
+        size = os.path.getsize(store.path) + os.path.getsize(store.path + "-wal")
+        await store.close()
+
+    print(f"INSERT на расчёт:   p50 {statistics.median(sync):.1f} µs, макс {max(sync):.0f} µs")
+    print(f"record() в памяти:  p50 {statistics.median(record):.2f} µs, макс {max(record):.0f} µs")
+    print(f"пачка {n} строк в рабочем потоке: {flush_s * 1e3:.0f} мс ({n / flush_s:,.0f} строк/с, ~{size // n} байт/строку)")
+    print(f"/history (10 последних): {recall:.0f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
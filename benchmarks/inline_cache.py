@@ -0,0 +1,40 @@
+"""
+Inline-запросы (@bot 12.5 ламинат) через весь Dispatcher: первый раз (расчёт + рендер)
+против повторного (готовые карточки из quick_articles). API — фальшивый, без задержки.
+
+    python -m benchmarks.inline_cache
+"""
+import time
+import asyncio
+import statistics
+
+from benchmarks.fake_api import FakeSession, inline_update, load_bot
+
+bot = load_bot()
+
+QUERIES = ["12.5 ламинат", "12,5", "8 м2 панели 30x60 5%", "3,6 плёнка без запаса", "панели 10", "18.5 ламинат"]
+
+
+async def timed(b, query: str) -> float:
+    t0 = time.perf_counter()
+    await bot.dp.feed_update(b, inline_update(1, query))
+    return (time.perf_counter() - t0) * 1e6
+
+
+async def main(repeat: int = 200) -> None:
+    session = FakeSession()
+    b = bot.Bot(bot.BOT_TOKEN, session=session)
+    await bot.dp.feed_update(b, inline_update(1, "1"))      # прогрев импорта/моделей
+    print(f"{'запрос':<26} {'карточек':>8} {'первый µs':>10} {'из кэша µs':>11}")
+    for q in QUERIES:
+        bot.quick_articles.cache_clear()
+        cold = await timed(b, q)
+        warm = statistics.median([await timed(b, q) for _ in range(repeat)])
+        n = len(session.calls[-1].results)
+        print(f"{q:<26} {n:>8} {cold:>10.0f} {warm:>11.0f}")
+    info = bot.quick_articles.cache_info()
+    print(f"кэш: {info.hits} попаданий, {info.misses} промахов, размер {info.currsize}/{info.maxsize}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
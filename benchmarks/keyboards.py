@@ -0,0 +1,41 @@
+"""
+Стоимость клавиатур на вызов хендлера: сборка InlineKeyboardBuilder + валидация
+pydantic заново (как было) против готовой разметки из кэша.
+
+    python -m benchmarks.keyboards
+"""
+import timeit
+
+from benchmarks.fake_api import load_bot
+
+bot = load_bot()
+
+# Какие клавиатуры строит каждый хендлер (по одной на ответ)
+HANDLER_KEYBOARDS = {
+    "start_cmd": [(bot.main_menu_kb, ())],
+    "choose_product": [(bot.input_mode_kb, ("film_60x3",))],
+    "waste_toggle": [(bot.waste_toggle_kb, (True,))],
+    "surface_width": [(bot.sides_kb, ())],
+    "surface_sides": [(bot.surfaces_kb, ())],
+    "opening_type_pick": [(bot.opening_presets_kb, ("door",))],
+    "opening_preset_pick": [(bot.opening_mode_kb, ())],
+    "finalize_calc": [(bot.buy_kb, ()), (bot.price_choice_kb, ())],
+    "handle_price_single": [(bot.buy_kb, ()), (bot.main_menu_kb, ())],
+}
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 2000) -> None:
+    bot.warm_keyboards()
+    print(f"{'handler':<22} {'rebuild µs':>11} {'cached µs':>10} {'saved µs':>9}")
+    for handler, keyboards in HANDLER_KEYBOARDS.items():
+        rebuild = per_call_us(lambda: [kb.__wrapped__(*args) for kb, args in keyboards], number)
+        cached = per_call_us(lambda: [kb(*args) for kb, args in keyboards], number)
+        print(f"{handler:<22} {rebuild:>11.1f} {cached:>10.2f} {rebuild - cached:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Раскладка ламината ряд за рядом: время на комнату и запас по раскладке против фиксированных 10%.
+
+    python -m benchmarks.laminate_layout
+"""
+import timeit
+
+from calc import PRODUCTS, calc_counts_for_product
+from layout import BOARD_LENGTH, BOARD_WIDTH, plan_laminate
+
+ROOMS = [
+    ("10×10 м", 10.0, 10.0, []),
+    ("20×5 м", 20.0, 5.0, []),
+    ("12.5×8 м, 2 двери, 3 окна", 12.5, 8.0, [(0.8, 2.0), (0.9, 2.0), (1.4, 1.4), (1.4, 1.4), (1.2, 1.5)]),
+    ("4.2×3.1 м", 4.2, 3.1, []),
+    ("3.05×2.75 м, дверь", 3.05, 2.75, [(0.8, 2.0)]),
+]
+
+
+def main(number: int = 200) -> None:
+    pack = PRODUCTS["laminate"]
+    print(f"{'комната':<28} {'мс':>6} {'досок':>6} {'запас':>7} {'уп.':>4} {'уп. при 10%':>11}")
+    for name, ln, w, openings in ROOMS:
+        mm = [(round(a * 1000), round(b * 1000)) for a, b in openings]
+        plan = plan_laminate(round(ln * 1000), round(w * 1000), mm)
+        assert plan.boards * BOARD_LENGTH * BOARD_WIDTH >= plan.covered * 100
+        ms = min(timeit.repeat(lambda: plan_laminate(round(ln * 1000), round(w * 1000), mm),
+                               number=number, repeat=3)) / number * 1e3
+
+        net = ln * w - sum(a * b for a, b in openings)
+        flat = calc_counts_for_product("laminate", net, pack["waste_percent"])
+        sim = calc_counts_for_product("laminate", net, pack["waste_percent"], room=(ln, w, openings))
+        print(f"{name:<28} {ms:>6.2f} {plan.boards:>6} {sim['layout']['waste'] * 100:>6.1f}% "
+              f"{sim['count']:>4} {flat['count']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Нагрузка от начала до конца: тысячи пользователей проходят сценарии FLOWS через настоящий
+dp.start_polling (лимит UPDATE_CONCURRENCY, ChatOrderIsolation, FSM, метрики), Bot API —
+фальшивый, с задержкой. Модель закрытая: пользователь шлёт следующий шаг, только когда бот
+закончил с предыдущим (плюс «время на подумать» think).
+
+Печатает пропускную способность и p50/p95/p99 — по сценариям (сколько пользователь ждал бота
+за весь сценарий) и по хендлерам (апдейт целиком: от отправки пользователем через getUpdates
+до конца обработки). Результат пишется в benchmarks/results/load_<commit>.json (каталог
+в .gitignore); --compare старый.json покажет разницу.
+
+    python -m benchmarks.load --users 2000
+    python -m benchmarks.load --users 2000 --compare benchmarks/results/load_<commit>.json
+
+Очередь отправки (SendQueue) не подключается: её лимиты — лимиты Telegram, см. benchmarks/send_queue.py.
+Хранилище FSM — как в боте, через переменные окружения (FSM_STORAGE=sqlite и т.д.).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import aiogram
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import User
+
+from benchmarks.fake_api import FLOWS, FakeSession, final_texts, load_bot, step_update
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def summary(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pct(ordered, 0.50), 3),
+        "p95_ms": round(pct(ordered, 0.95), 3),
+        "p99_ms": round(pct(ordered, 0.99), 3),
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+class LoadSession(FakeSession):
+    """getUpdates отдаёт то, что пользователи успели отправить (до 100 за раз), остальное — как FakeSession."""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(latency)
+        self.inbox: "asyncio.Queue[Any]" = asyncio.Queue()
+        self.last_text: Dict[int, str] = {}
+
+    async def make_request(self, b, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bot", username="bench_bot")
+        if isinstance(method, GetUpdates):
+            try:
+                batch = [await asyncio.wait_for(self.inbox.get(), 0.05)]
+            except asyncio.TimeoutError:
+                return []
+            while len(batch) < 100 and not self.inbox.empty():
+                batch.append(self.inbox.get_nowait())
+            return batch
+        result = await super().make_request(b, method, timeout)
+        self.calls.clear()                  # тысячи пользователей — не копим все вызовы
+        if getattr(method, "text", None) is not None:
+            self.last_text[method.chat_id] = method.text
+        return result
+
+
+class Load:
+    def __init__(self, bot, session: LoadSession, think: float, seed: int) -> None:
+        self.bot = bot
+        self.session = session
+        self.think = think
+        self.rnd = random.Random(seed)
+        self.waiting: Dict[int, asyncio.Future] = {}
+        self.handler_of: Dict[int, str] = {}
+        self.by_handler: Dict[str, List[float]] = defaultdict(list)
+        self.by_flow: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+
+    async def name_handler(self, handler, event, data):
+        """Inner-middleware: какой хендлер взял апдейт."""
+        self.handler_of[data["event_update"].update_id] = self.bot.handler_name(data["handler"].callback, event)
+        return await handler(event, data)
+
+    def wrap_feed_update(self) -> None:
+        # Polling зовёт dp.feed_update на каждый апдейт — оборачиваем его, чтобы конец апдейта
+        # считался после всех middleware (коммит FSM, отпускание замка чата)
+        dp = self.bot.dp
+        feed_update = dp.feed_update
+
+        async def timed(b, update, **kwargs):
+            try:
+                return await feed_update(b, update, **kwargs)
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                fut = self.waiting.pop(update.update_id, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(None)
+
+        dp.feed_update = timed
+
+    async def user(self, chat: int, flow: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        waited = 0.0
+        loop = asyncio.get_running_loop()
+        for step in FLOWS[flow]:
+            update = step_update(chat, step)
+            fut = self.waiting[update.update_id] = loop.create_future()
+            t0 = time.perf_counter()
+            self.session.inbox.put_nowait(update)
+            await fut
+            elapsed = (time.perf_counter() - t0) * 1000
+            waited += elapsed
+            self.by_handler[self.handler_of.pop(update.update_id, "unhandled")].append(elapsed)
+            if self.think:
+                await asyncio.sleep(self.think * self.rnd.uniform(0.5, 1.5))
+        self.by_flow[flow].append(waited)
+
+    async def run(self, users: int, ramp: float, concurrency: int):
+        flows = list(FLOWS)
+        plan = {1_000_000 + u: flows[u % len(flows)] for u in range(users)}
+        b = self.bot.Bot(self.bot.BOT_TOKEN, session=self.session)
+        b.session.middleware(self.bot.request_timer)
+
+        async def drive():
+            await asyncio.gather(*(
+                self.user(chat, flow, ramp * i / users) for i, (chat, flow) in enumerate(plan.items())
+            ))
+            await self.bot.dp.stop_polling()
+
+        t0 = time.perf_counter()
+        driver = asyncio.create_task(drive())
+        await self.bot.dp.start_polling(
+            b, handle_signals=False, close_bot_session=False, tasks_concurrency_limit=concurrency,
+        )
+        await driver
+        elapsed = time.perf_counter() - t0
+        final = final_texts(self.bot)
+        ok = sum(self.session.last_text.get(chat) == final[flow] for chat, flow in plan.items())
+        return elapsed, ok
+
+
+def git_commit() -> Dict[str, Any]:
+    try:
+        here = os.path.dirname(RESULTS_DIR)        # коммит репозитория, а не текущего каталога
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=here).stdout
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, cwd=here).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": sha.strip(), "dirty": bool(dirty.strip())}
+
+
+def report(result: Dict[str, Any]) -> None:
+    print(
+        f"{result['params']['users']} пользователей, {result['updates']} апдейтов за {result['elapsed_s']:.2f} с: "
+        f"{result['updates_per_s']:,.0f} апдейтов/с, {result['flows_per_s']:,.1f} сценариев/с, "
+        f"верно {result['flows_ok']}/{result['params']['users']}, ошибок {result['errors']}"
+    )
+    for title, section in (("сценарий", "flows"), ("хендлер", "handlers")):
+        print(f"\n{title:<24} {'n':>7} {'p50 мс':>9} {'p95 мс':>9} {'p99 мс':>9} {'max мс':>9}")
+        for name, s in sorted(result[section].items(), key=lambda kv: -kv[1]["p99_ms"]):
+            print(f"{name:<24} {s['count']:>7} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> None:
+    def change(a: float, b: float) -> str:
+        return f"{(b / a - 1) * 100:+.0f}%" if a else "—"
+
+    print(f"\nпротив {old.get('commit') or '?'}: апдейтов/с {old['updates_per_s']:,.0f} → {new['updates_per_s']:,.0f}"
+          f" ({change(old['updates_per_s'], new['updates_per_s'])})")
+    for title, section in (("сценарий", "flows"), ("хендлер", "handlers")):
+        print(f"\n{title:<24} {'p50 мс':>18} {'p95 мс':>18} {'p99 мс':>18}")
+        for name, s in sorted(new[section].items()):
+            was = old[section].get(name)
+            if was is None:
+                continue
+            cols = [f"{was[k]:.1f}→{s[k]:.1f} {change(was[k], s[k]):>5}" for k in ("p50_ms", "p95_ms", "p99_ms")]
+            print(f"{name:<24} " + " ".join(f"{c:>18}" for c in cols))
+
+
+async def main(users: int, latency: float, think: float, ramp: float, concurrency: Optional[int], seed: int) -> Dict[str, Any]:
+    os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(), "history.sqlite3"))
+    bot = load_bot()
+    logging.getLogger("aiogram").setLevel(logging.WARNING)     # без строки на каждый апдейт
+    concurrency = concurrency or bot.UPDATE_CONCURRENCY
+
+    load = Load(bot, LoadSession(latency), think, seed)
+    load.wrap_feed_update()
+    for observer in (bot.dp.message, bot.dp.callback_query, bot.dp.inline_query):
+        observer.middleware(load.name_handler)
+    elapsed, ok = await load.run(users, ramp, concurrency)
+
+    updates = sum(len(v) for v in load.by_handler.values())
+    return {
+        **git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "aiogram": aiogram.__version__,
+        "params": {
+            "users": users, "api_latency_s": latency, "think_s": think, "ramp_s": ramp,
+            "concurrency": concurrency, "seed": seed, "fsm_storage": bot.FSM_STORAGE,
+            "metrics": bot.METRICS_ENABLED, "compact_result": bot.COMPACT_RESULT,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "updates": updates,
+        "updates_per_s": round(updates / elapsed, 1),
+        "flows_per_s": round(users / elapsed, 2),
+        "flows_ok": ok,
+        "errors": load.errors,
+        "flows": {name: summary(v) for name, v in load.by_flow.items()},
+        "handlers": {name: summary(v) for name, v in load.by_handler.items()},
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--latency", type=float, default=0.02, help="задержка фальшивого Bot API, с")
+    ap.add_argument("--think", type=float, default=0.0, help="пауза пользователя между шагами, с (±50%%)")
+    ap.add_argument("--ramp", type=float, default=1.0, help="за сколько секунд подключаются все пользователи")
+    ap.add_argument("--concurrency", type=int, default=None, help="по умолчанию UPDATE_CONCURRENCY бота")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default=None, help="JSON с результатом (по умолчанию benchmarks/results/load_<commit>.json)")
+    ap.add_argument("--compare", default=None, help="JSON прошлого прогона для сравнения")
+    a = ap.parse_args()
+
+    result = asyncio.run(main(a.users, a.latency, a.think, a.ramp, a.concurrency, a.seed))
+    report(result)
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f:
+            compare(json.load(f), result)
+    out = a.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"load_{result['commit'] or 'nogit'}{'-dirty' if result['dirty'] else ''}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\nрезультат: {out}", file=sys.stderr)
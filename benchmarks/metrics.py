@@ -0,0 +1,90 @@
+"""
+Во что обходятся метрики на апдейт. Сравнивать целые прогоны с METRICS=1 и METRICS=0 на общей
+машине бесполезно (шум ±20% между процессами больше самой разницы), поэтому каждый таймер
+меряется отдельно — тот же вызов с обёрткой и без, — а потом умножается на то, сколько раз
+он срабатывает за апдейт в сценариях FLOWS через весь Dispatcher (API — фальшивый).
+
+    python -m benchmarks.metrics
+"""
+import time
+import asyncio
+import statistics
+
+from aiogram.methods import AnswerCallbackQuery
+
+from benchmarks.fake_api import FLOWS, FakeSession, load_bot, step_update
+
+bot = load_bot()
+from storage import _timed  # noqa: E402
+
+
+async def noop(*args, **kwargs):
+    return None
+
+
+async def per_call_us(call, number: int = 50_000) -> float:
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            await call()
+        best = min(best, (time.perf_counter() - t0) / number * 1e6)
+    return best
+
+
+async def wrapper_costs():
+    """Сколько µs добавляет каждая обёртка к пустому вызову."""
+    update = step_update(1, "/start")
+    data = {"handler": bot.dp.message.handlers[0], "raw_state": "CalcState:waiting_total_area"}
+    update_timer = bot.UpdateTimer(bot.metrics.histogram("bench_update_seconds", "", ("type",)))
+    timed_noop = _timed(noop, "get_record", bot.storage_seconds.observe)
+    method = AnswerCallbackQuery(callback_query_id="1")
+
+    base = await per_call_us(lambda: noop(update, data))
+    return {
+        "update": await per_call_us(lambda: update_timer(noop, update, data)) - base,
+        "handler": await per_call_us(lambda: bot.time_handler(noop, update.message, data)) - base,
+        "storage": await per_call_us(lambda: timed_noop(None)) - base,
+        "api": await per_call_us(lambda: bot.request_timer(noop, None, method)) - base,
+    }
+
+
+def observed(histogram) -> int:
+    return sum(sum(series.counts) for series in histogram.series.values())
+
+
+async def flows():
+    """Медиана µs на апдейт в сценариях и сколько раз за апдейт сработал каждый таймер."""
+    b = bot.Bot(bot.BOT_TOKEN, session=FakeSession())
+    b.session.middleware(bot.request_timer)
+    timers = {
+        "update": bot.update_seconds, "handler": bot.handler_seconds,
+        "storage": bot.storage_seconds, "api": bot.api_seconds,
+    }
+    before = {name: observed(h) for name, h in timers.items()}
+    samples = []
+    for r in range(20):
+        for i, flow in enumerate(FLOWS.values()):
+            for step in flow:
+                t0 = time.perf_counter()
+                await bot.dp.feed_update(b, step_update(1000 * r + i, step))
+                samples.append((time.perf_counter() - t0) * 1e6)
+    per_update = {name: (observed(h) - before[name]) / len(samples) for name, h in timers.items()}
+    return statistics.median(samples), per_update
+
+
+async def main() -> None:
+    if not bot.METRICS_ENABLED:
+        raise SystemExit("Запускайте без METRICS=0")
+    costs = await wrapper_costs()
+    update_us, per_update = await flows()
+    total = 0.0
+    print(f"{'таймер':<10} {'µs за вызов':>12} {'вызовов на апдейт':>18} {'µs на апдейт':>13}")
+    for name, cost in costs.items():
+        total += cost * per_update[name]
+        print(f"{name:<10} {cost:>12.2f} {per_update[name]:>18.2f} {cost * per_update[name]:>13.2f}")
+    print(f"итого {total:.1f} µs на апдейт при медиане апдейта {update_us:.0f} µs ({total / update_us * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Смешанные упаковки: таблица PackMix против перебора всех сочетаний.
+Сверяет ответы для каждой площади до MIX_MAX_AREA и далее (добор крупной упаковкой),
+затем сравнивает время ответа и показывает, сколько лишнего экономит смесь.
+
+    python -m benchmarks.pack_mix
+"""
+import time
+import timeit
+
+from calc import MIX_MAX_AREA, MIX_TABLES, PRODUCTS, RESERVE_SCALE, PackMix, calc_counts_for_product
+
+KEY = "panel_30x60_auto"
+
+
+def brute(packs, target: int):
+    """Все сочетания двух вариантов — лучшее по (лишнее, число упаковок)."""
+    a, b = packs
+    need = target
+    best = None
+    for j in range(-(-need // b) + 1):
+        i = max(0, -(-(need - j * b) // a))
+        key = (i * a + j * b - need, i + j)
+        if best is None or key < best[0]:
+            best = (key, (i, j))
+    return best[1]
+
+
+def main() -> None:
+    packs = [v["pack_mm2"] for v in PRODUCTS[KEY]["variants"]]
+    mix = MIX_TABLES[KEY]
+
+    t0 = time.perf_counter()
+    PackMix(packs, MIX_MAX_AREA * 10 ** 6)
+    build_ms = (time.perf_counter() - t0) * 1e3
+
+    checked = 0
+    for area_mm2 in range(10_000, int(MIX_MAX_AREA * 1.5) * 10 ** 6, 7_919):
+        target = area_mm2 * RESERVE_SCALE
+        got, want = mix.lookup(target), brute(packs, area_mm2)
+        over = lambda c: sum(n * p for n, p in zip(c, packs)) - area_mm2  # noqa: E731
+        assert over(got) == over(want), (area_mm2, got, want)
+        # ниже таблицы число упаковок тоже минимально; выше — лишнее то же, упаковок не больше +1
+        assert sum(got) <= sum(want) + (area_mm2 > MIX_MAX_AREA * 10 ** 6), (area_mm2, got, want)
+        checked += 1
+    print(f"совпадает с перебором: ok ({checked} площадей до {MIX_MAX_AREA * 1.5:g} м²)")
+
+    target = 87_300_000 * RESERVE_SCALE
+    t_table = min(timeit.repeat(lambda: mix.lookup(target), number=100_000, repeat=5)) / 100_000 * 1e6
+    t_brute = min(timeit.repeat(lambda: brute(packs, 87_300_000), number=2_000, repeat=5)) / 2_000 * 1e6
+    print(f"таблица до {MIX_MAX_AREA} м²: построение {build_ms:.1f} мс, {len(mix.table)} строк")
+    print(f"ответ: таблица {t_table:.2f} µs, перебор {t_brute:.1f} µs (87.3 м²)")
+
+    saved = total = 0
+    for area10 in range(10, 2000):
+        c = calc_counts_for_product(KEY, area10 / 10, 0.1)
+        saved += c["best"]["over"] - c["mix"]["over"]
+        total += c["mix"]["over"] < c["best"]["over"]
+    print(f"площади 1–200 м² с запасом 10%: смесь лучше одного варианта в {total} из 1990 случаев, "
+          f"в среднем −{saved / 1990:.2f} м² лишнего")
+
+
+if __name__ == "__main__":
+    main()
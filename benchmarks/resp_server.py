@@ -0,0 +1,113 @@
+"""
+Локальная заглушка Redis (RESP2) для проверки RedisStorage и бенчмарков без настоящего Redis.
+Поддерживает только команды, которые использует бот.
+
+    python -m benchmarks.resp_server --port 6380
+"""
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RespStandIn:
+    def __init__(self) -> None:
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands = 0
+
+    def _alive(self, key: bytes) -> Optional[Dict[bytes, bytes]]:
+        exp = self.expires.get(key)
+        if exp is not None and exp <= time.monotonic():
+            self.hashes.pop(key, None)
+            self.expires.pop(key, None)
+        return self.hashes.get(key)
+
+    def call(self, args: List[bytes]) -> Any:
+        self.commands += 1
+        cmd = args[0].upper()
+        if cmd in (b"PING", b"AUTH", b"SELECT"):
+            return "OK" if cmd != b"PING" else "PONG"
+        if cmd == b"HSET":
+            h = self._alive(args[1])
+            if h is None:
+                h = self.hashes[args[1]] = {}
+            added = 0
+            for f, v in zip(args[2::2], args[3::2]):
+                added += f not in h
+                h[f] = v
+            return added
+        if cmd == b"HMGET":
+            h = self._alive(args[1]) or {}
+            return [h.get(f) for f in args[2:]]
+        if cmd == b"DEL":
+            n = 0
+            for k in args[1:]:
+                n += self.hashes.pop(k, None) is not None
+                self.expires.pop(k, None)
+            return n
+        if cmd == b"EXPIRE":
+            if self._alive(args[1]) is None:
+                return 0
+            self.expires[args[1]] = time.monotonic() + int(args[2])
+            return 1
+        if cmd == b"DBSIZE":
+            return len(self.hashes)
+        if cmd == b"FLUSHDB":
+            self.hashes.clear()
+            self.expires.clear()
+            return "OK"
+        return Exception(f"ERR unknown command '{cmd.decode()}'")
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return b"-%s\r\n" % str(value).encode()
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(RespStandIn.encode(v) for v in value)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                n = int(line[1:-2])
+                args = []
+                for _ in range(n):
+                    size = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                writer.write(self.encode(self.call(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start(host: str = "127.0.0.1", port: int = 0) -> Tuple[RespStandIn, asyncio.AbstractServer, int]:
+    stand_in = RespStandIn()
+    server = await asyncio.start_server(stand_in.handle, host, port)
+    return stand_in, server, server.sockets[0].getsockname()[1]
+
+
+async def _main(host: str, port: int) -> None:
+    _, server, port = await start(host, port)
+    print(f"RESP stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6380)
+    a = ap.parse_args()
+    asyncio.run(_main(a.host, a.port))
@@ -0,0 +1,109 @@
+"""
+Очередь исходящих под наплывом (рекламная волна на /start): фальшивый Bot API с флуд-контролем
+как у Telegram (общий и на чат лимиты, 429 с retry_after), время ускорено в SCALE раз.
+Без очереди часть отправок падает с TelegramRetryAfter; с очередью — ни одной ошибки,
+порядок в каждом чате сохранён, а результаты расчёта с приоритетом HIGH доходят быстрее,
+чем та же волна через очередь без приоритетов.
+
+    python -m benchmarks.send_queue
+"""
+import time
+import asyncio
+import statistics
+from collections import defaultdict
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from benchmarks.fake_api import FakeSession, load_bot
+from sendqueue import HIGH, NORMAL, SendQueue, TokenBucket, send_priority
+
+bot = load_bot()
+
+SCALE = 50                       # 30 msg/s -> 1500 msg/s, 1 msg/s в чат -> 50
+GLOBAL_RATE, CHAT_RATE, CHAT_BURST = 30 * SCALE, 1 * SCALE, 5
+
+
+class FloodSession(FakeSession):
+    """Отвечает 429, если бот превысил лимиты; запоминает порядок доставленных сообщений."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.limits = None
+        self.chats = {}
+        self.flood = 0
+        self.delivered = defaultdict(list)
+
+    async def make_request(self, b, method, timeout=None):
+        if isinstance(method, SendMessage):
+            now = time.monotonic()
+            if self.limits is None:
+                self.limits = TokenBucket(GLOBAL_RATE * 1.1, GLOBAL_RATE, now)
+            chat = self.chats.setdefault(method.chat_id, TokenBucket(CHAT_RATE * 1.1, CHAT_BURST, now))
+            if self.limits.delay(now) or chat.delay(now):
+                self.flood += 1
+                raise TelegramRetryAfter(method=method, message="Too Many Requests", retry_after=1 / SCALE)
+            self.limits.take(now)
+            chat.take(now)
+            self.delivered[method.chat_id].append(method.text)
+        return await super().make_request(b, method, timeout)
+
+
+async def send(b, chat_id: int, n: int, priority: int, waits, errors, delay: float = 0.0) -> None:
+    await asyncio.sleep(delay)
+    with send_priority(priority):
+        for i in range(n):
+            t0 = time.perf_counter()
+            try:
+                await b.send_message(chat_id, f"{chat_id}:{i}")
+            except TelegramRetryAfter:
+                errors.append(chat_id)
+            waits[chat_id >= 20_000].append((time.perf_counter() - t0) * 1000)
+
+
+async def wave(queue, result_priority: int = HIGH, starts: int = 1500, results: int = 150):
+    session = FloodSession()
+    b = bot.Bot(bot.BOT_TOKEN, session=session)
+    if queue is not None:
+        b.session.middleware(queue)
+    waits, errors = defaultdict(list), []
+    t0 = time.perf_counter()
+    await asyncio.gather(
+        *(send(b, 10_000 + u, 2, NORMAL, waits, errors) for u in range(starts)),     # /start: приветствие + меню
+        # finalize_calc: 3 сообщения, приходят, когда очередь уже забита приветствиями
+        *(send(b, 20_000 + u, 3, result_priority, waits, errors, delay=0.05) for u in range(results)),
+    )
+    elapsed = time.perf_counter() - t0
+    in_order = all(texts == sorted(texts, key=lambda t: int(t.split(":")[1])) for texts in session.delivered.values())
+    return elapsed, session.flood, errors, waits, in_order
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+async def main() -> None:
+    runs = (
+        ("без очереди", None, HIGH),
+        ("SendQueue, без приоритетов", SendQueue(GLOBAL_RATE, CHAT_RATE, CHAT_BURST), NORMAL),
+        ("SendQueue, результаты HIGH", SendQueue(GLOBAL_RATE, CHAT_RATE, CHAT_BURST), HIGH),
+        # лимиты очереди завышены вдвое: спасают только retry_after и повторы
+        ("SendQueue, лимиты ×2", SendQueue(GLOBAL_RATE * 2, CHAT_RATE * 2, CHAT_BURST), HIGH),
+    )
+    for name, queue, result_priority in runs:
+        elapsed, flood, errors, waits, in_order = await wave(queue, result_priority)
+        print(f"{name}: {elapsed:.2f} с (×{SCALE}), 429 от API: {flood}, ошибок у хендлеров: {len(errors)}, "
+              f"порядок в чатах {'сохранён' if in_order else 'НАРУШЕН'}")
+        for is_result, label in ((True, "результат"), (False, "прочее")):
+            w = waits[is_result]
+            print(f"    {label:<10} p50 {statistics.median(w):7.1f} мс, p99 {pct(w, 0.99):7.1f} мс")
+        if queue is not None:
+            assert in_order and (queue.global_rate > GLOBAL_RATE or not errors)
+            st = queue.stats()
+            print(f"    очередь: макс. глубина {st['max_depth']}, retry_after {st['retries']}, "
+                  f"ожидание avg {st['wait_avg_ms']:.1f} / max {st['wait_max_ms']:.1f} мс, чатов {st['chats']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Задержка FSM-хранилища на один апдейт: MemoryStorage против SQLite/Redis,
+с write-behind батчингом и без него.
+
+Каждый апдейт повторяет шаблон surface_sides: чтение состояния в FSMContextMiddleware,
+get_data, update_data и set_state в хендлере.
+
+    python -m benchmarks.storage_latency --users 200 --updates 20
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List, Tuple
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+
+from storage import RedisStorage, SQLiteStorage, WriteBehindIsolation, WriteBehindStorage
+from benchmarks import resp_server
+
+
+async def one_update(storage: BaseStorage, isolation: BaseEventIsolation, key: StorageKey, i: int) -> None:
+    async with isolation.lock(key):
+        ctx = FSMContext(storage=storage, key=key)
+        await ctx.get_state()
+        data = await ctx.get_data()
+        surfaces = data.get("surfaces", [])
+        surfaces.append({"name": f"Полка {i}", "length_cm": 80.0, "width_cm": 30.0, "sides": 1, "area": 0.24})
+        await ctx.update_data(surfaces=surfaces, current_name=None, current_length_cm=None, current_width_cm=None)
+        await ctx.set_state("CalcState:waiting_surface_name")
+
+
+async def run_case(storage: BaseStorage, isolation: BaseEventIsolation, users: int, updates: int) -> List[float]:
+    samples: List[float] = []
+    keys = [StorageKey(bot_id=1, chat_id=u, user_id=u) for u in range(1, users + 1)]
+    for i in range(updates):
+        for key in keys:
+            t0 = time.perf_counter()
+            await one_update(storage, isolation, key, i)
+            samples.append(time.perf_counter() - t0)
+    await storage.close()
+    return samples
+
+
+def report(name: str, samples: List[float], base: float) -> None:
+    s = sorted(samples)
+    p = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1e6  # noqa: E731
+    mean = statistics.fmean(samples) * 1e6
+    print(f"{name:<32} mean {mean:9.1f} µs  p50 {p(0.5):9.1f}  p95 {p(0.95):9.1f}  x{mean / (base * 1e6):6.1f} vs memory")
+
+
+async def main(users: int, updates: int) -> None:
+    tmp = tempfile.mkdtemp()
+    stand_in, server, port = await resp_server.start()
+    url = f"redis://127.0.0.1:{port}/0"
+
+    cases: List[Tuple[str, BaseStorage, BaseEventIsolation]] = []
+    cases.append(("memory", MemoryStorage(), DisabledEventIsolation()))
+    cases.append(("sqlite", SQLiteStorage(os.path.join(tmp, "a.sqlite3")), DisabledEventIsolation()))
+    wb = WriteBehindStorage(SQLiteStorage(os.path.join(tmp, "b.sqlite3")))
+    cases.append(("sqlite + write-behind", wb, WriteBehindIsolation(wb)))
+    cases.append(("redis (stand-in)", RedisStorage(url), DisabledEventIsolation()))
+    wb = WriteBehindStorage(RedisStorage(url))
+    cases.append(("redis (stand-in) + write-behind", wb, WriteBehindIsolation(wb)))
+
+    results: Dict[str, List[float]] = {}
+    for name, storage, isolation in cases:
+        before = stand_in.commands
+        results[name] = await run_case(storage, isolation, users, updates)
+        if name.startswith("redis"):
+            print(f"  {name}: {(stand_in.commands - before) / (users * updates):.1f} redis commands / update")
+        stand_in.hashes.clear()
+
+    print(f"\n{users} users × {updates} updates")
+    base = statistics.fmean(results["memory"])
+    for name, samples in results.items():
+        report(name, samples, base)
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--updates", type=int, default=20)
+    a = ap.parse_args()
+    asyncio.run(main(a.users, a.updates))
@@ -0,0 +1,104 @@
+"""
+Один «злоумышленник» долбит calc:-кнопками и числами в process_total_area, пока 50 обычных
+пользователей проходят сценарии FLOWS в человеческом темпе (время ускорено: лимит 30/с вместо 3/с).
+Bot API отвечает с задержкой. Сравнивает задержку апдейтов обычных пользователей и сколько
+вызовов API и операций с хранилищем досталось спамеру — без ограничителя и с ним.
+
+Хвост задержки (p99) на одной машине шумит сильнее, чем отличаются варианты, поэтому
+варианты чередуются в нескольких раундах и печатаются медианы по раундам с разбросом.
+В конце раунда спамер, уже упёршийся в лимит, шлёт inline-запрос — он должен получить ответ.
+
+    python -m benchmarks.throttle [раундов]
+"""
+import os
+import sys
+import time
+import asyncio
+import statistics
+from collections import defaultdict
+
+os.environ["THROTTLE_RATE"] = "30"
+os.environ["THROTTLE_BURST"] = "10"
+
+from aiogram.methods import AnswerInlineQuery  # noqa: E402
+
+from benchmarks.fake_api import FLOWS, FakeSession, load_bot, step_update  # noqa: E402
+from storage import SESSION_STATS  # noqa: E402
+
+bot = load_bot()
+
+ABUSER = 1
+SPAM = ["@calc:film_60x3", "12.5", "@calc:laminate", "9.8"]
+
+
+async def user(b, chat: int, flow, latencies, pace: float) -> None:
+    for step in flow:
+        t0 = time.perf_counter()
+        await bot.dp.feed_update(b, step_update(chat, step))
+        latencies.append((time.perf_counter() - t0) * 1000)
+        await asyncio.sleep(pace)
+
+
+async def abuser(b, stop: asyncio.Event, rate: float):
+    """Апдейты спамера приходят с постоянной частотой, каждый — своей задачей, как из polling."""
+    tasks = []
+    while rate and not stop.is_set():
+        tasks.append(asyncio.create_task(bot.dp.feed_update(b, step_update(ABUSER, SPAM[len(tasks) % len(SPAM)]))))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return len(tasks)
+
+
+async def run(throttled: bool, spam_rate: float = 1000, users: int = 50, pace: float = 0.1):
+    bot.throttle.tat.clear()
+    bot.throttle.tolerance = (bot.THROTTLE_BURST - 1) * bot.throttle.interval if throttled else float("inf")
+    before = {**bot.throttle.throttled}
+    ops_before = SESSION_STATS["storage_ops"]
+    session = FakeSession(latency=0.002)
+    b = bot.Bot(bot.BOT_TOKEN, session=session)
+    latencies, stop = [], asyncio.Event()
+    spam = asyncio.create_task(abuser(b, stop, spam_rate))
+    flows = list(FLOWS.values())
+    await asyncio.gather(*(user(b, 100_000 + u, flows[u % len(flows)], latencies, pace) for u in range(users)))
+    stop.set()
+    sent = await spam
+    spam_calls = sum(getattr(c, "chat_id", None) == ABUSER for c in session.calls)
+    blocked = sum(bot.throttle.throttled.values()) - sum(before.values())
+    ops = SESSION_STATS["storage_ops"] - ops_before
+    if throttled:
+        # добиваем ведро спамера, чтобы inline-запрос пришёл точно сверх лимита
+        for i in range(bot.THROTTLE_BURST + 1):
+            await bot.dp.feed_update(b, step_update(ABUSER, SPAM[i % len(SPAM)]))
+        answered = sum(isinstance(c, AnswerInlineQuery) for c in session.calls)
+        await bot.dp.feed_update(b, step_update(ABUSER, "?12.5 ламинат"))
+        if sum(isinstance(c, AnswerInlineQuery) for c in session.calls) == answered:
+            raise SystemExit("inline-запрос спамера остался без ответа")
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies), "p99": latencies[int(len(latencies) * 0.99)],
+        "spam": sent, "blocked": blocked, "calls": spam_calls, "ops": ops,
+    }
+
+
+async def main(rounds: int) -> None:
+    variants = (("без спама", False, 0), ("без ограничителя", False, 1000), ("с ограничителем", True, 1000))
+    results = defaultdict(list)
+    for _ in range(rounds):
+        for name, throttled, spam_rate in variants:
+            results[name].append(await run(throttled, spam_rate))
+    print(f"{rounds} раундов, медиана (мин–макс) по раундам")
+    for name, _, _ in variants:
+        rs = results[name]
+
+        def med(key: str) -> float:
+            return statistics.median(r[key] for r in rs)
+
+        p99 = [r["p99"] for r in rs]
+        print(f"{name}: обычные пользователи p50 {med('p50'):.1f} мс, "
+              f"p99 {med('p99'):.1f} ({min(p99):.1f}–{max(p99):.1f}) мс; "
+              f"спам: {med('spam'):.0f} апдейтов, отсечено {med('blocked'):.0f}, "
+              f"сообщений спамеру {med('calls'):.0f}, операций FSM всего {med('ops'):.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,42 @@
+"""
+Раскладка панелей 30×30 / 30×60 сеткой: время на поверхность и сколько панелей
+по сравнению с «площадь ÷ панель» и с подрезкой без повторного использования обрезков.
+
+    python -m benchmarks.tile_layout
+"""
+import random
+import time
+
+from layout import OffcutPool, _tile_estimate, plan_tiles
+
+
+def random_surfaces(rnd: random.Random, n: int):
+    return [
+        (f"Поверхность {i}", rnd.randint(20, 400) + rnd.choice((0, 0.5)), rnd.randint(20, 280), rnd.choice((1, 1, 2)))
+        for i in range(1, n + 1)
+    ]
+
+
+def main(n: int = 2000) -> None:
+    rnd = random.Random(5)
+    surfaces = random_surfaces(rnd, n)
+    sides = sum(s for *_, s in surfaces)
+    for tile in ((300, 300), (300, 600)):
+        t0 = time.perf_counter()
+        counts = plan_tiles(surfaces, tile, OffcutPool())
+        per_surface = (time.perf_counter() - t0) / sides * 1e6
+
+        panels = sum(c.full + c.cut for c in counts)
+        by_area = -(-sum(round(ln * 10) * round(w * 10) * s for _, ln, w, s in surfaces) // (tile[0] * tile[1]))
+        no_reuse = sum(
+            min(_tile_estimate(round(ln * 10), round(w * 10), *t) for t in {tile, tile[::-1]}) * s
+            for _, ln, w, s in surfaces
+        )
+        assert by_area <= panels <= no_reuse, (tile, by_area, panels, no_reuse)
+        print(f"{tile[0] // 10}×{tile[1] // 10} см, {sides} поверхностей: {per_surface:.1f} µs/поверхность; "
+              f"панелей по площади {by_area}, с подрезкой без обрезков {no_reuse}, по плану {panels} "
+              f"(краёв из обрезков: {sum(c.reused for c in counts)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Синтетическая нагрузка на настоящий dp.start_polling: фальшивый getUpdates отдаёт сразу все шаги
+сценариев FLOWS от сотен пользователей («быстрые нажатия» — следующий шаг приходит, не дожидаясь
+ответа на предыдущий), Bot API отвечает с задержкой.
+
+Сравнивает старую схему (задача на каждый апдейт без лимита, чаты без сериализации)
+с ChatOrderIsolation + tasks_concurrency_limit: сколько сценариев дошли до конца правильно,
+сколько апдейтов одного чата выполнялись одновременно, пик задач и пропускная способность.
+
+    python -m benchmarks.update_scheduler
+"""
+import os
+import time
+import logging
+import asyncio
+import tempfile
+from collections import defaultdict
+
+from aiogram.fsm.storage.memory import DisabledEventIsolation
+from aiogram.methods import GetMe, GetUpdates
+from aiogram.types import User
+
+os.environ.setdefault("HISTORY_PATH", os.path.join(tempfile.mkdtemp(), "history.sqlite3"))
+
+from benchmarks.fake_api import FLOWS, FakeSession, final_texts, load_bot, step_update  # noqa: E402
+from storage import ChatOrderIsolation  # noqa: E402
+
+bot = load_bot()
+FINAL = final_texts(bot)
+logging.getLogger("aiogram").setLevel(logging.CRITICAL)    # старая схема сыплет KeyError из перепутанных шагов
+
+
+class PollingSession(FakeSession):
+    def __init__(self, updates, latency: float) -> None:
+        super().__init__(latency)
+        self.updates = updates
+        self.last_text = {}
+
+    async def make_request(self, b, method, timeout=None):
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bot", username="bench_bot")
+        if isinstance(method, GetUpdates):
+            batch, self.updates = self.updates[:100], self.updates[100:]
+            if not batch:
+                await asyncio.sleep(0.01)
+            return batch
+        result = await super().make_request(b, method, timeout)
+        if getattr(method, "text", None) is not None:
+            self.last_text[method.chat_id] = method.text
+        return result
+
+
+class Probe:
+    """Outer-middleware: сколько апдейтов идёт сейчас (всего и в каждом чате)."""
+
+    def __init__(self) -> None:
+        self.reset(0)
+
+    def reset(self, total: int) -> None:
+        self.total = total
+        self.done = self.running = self.peak = self.overlap = 0
+        self.active = defaultdict(int)
+
+    async def __call__(self, handler, event, data):
+        chat = (event.message or event.callback_query.message).chat.id
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        self.active[chat] += 1
+        if self.active[chat] > 1:
+            self.overlap += 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.active[chat] -= 1
+            self.running -= 1
+            self.done += 1
+            if self.done == self.total:
+                asyncio.get_running_loop().create_task(bot.dp.stop_polling())
+
+
+probe = Probe()
+bot.dp.update.outer_middleware(probe)
+
+
+async def run(first_chat: int, users: int, limit, isolation, latency: float = 0.002):
+    flows = list(FLOWS)
+    plan = {first_chat + u: flows[u % len(flows)] for u in range(users)}
+    # Чаты перемешаны, шаги внутри чата — по порядку (как их выдаст Telegram)
+    updates = [
+        step_update(chat, FLOWS[flow][i])
+        for i in range(max(len(f) for f in FLOWS.values()))
+        for chat, flow in plan.items()
+        if i < len(FLOWS[flow])
+    ]
+
+    session = PollingSession(updates, latency)
+    b = bot.Bot(bot.BOT_TOKEN, session=session)
+    bot.dp.fsm.events_isolation = isolation
+    probe.reset(len(updates))
+    t0 = time.perf_counter()
+    await bot.dp.start_polling(b, handle_signals=False, close_bot_session=False, tasks_concurrency_limit=limit)
+    elapsed = time.perf_counter() - t0
+    ok = sum(session.last_text.get(chat) == FINAL[flow] for chat, flow in plan.items())
+    return elapsed, len(updates), ok
+
+
+async def main(users: int = 400) -> None:
+    runs = (
+        ("без лимита, без порядка в чате", None, DisabledEventIsolation()),
+        ("лимит 64 + ChatOrderIsolation", 64, ChatOrderIsolation()),
+        ("лимит 16 + ChatOrderIsolation", 16, ChatOrderIsolation()),
+    )
+    for i, (name, limit, isolation) in enumerate(runs):
+        elapsed, total, ok = await run(10_000 * (i + 1), users, limit, isolation)
+        print(f"{name}: {total} апдейтов за {elapsed:.2f} с ({total / elapsed:,.0f}/с), "
+              f"сценариев верно {ok}/{users}, одновременно в одном чате {probe.overlap} раз, "
+              f"пик одновременных апдейтов {probe.peak}")
+        if limit:
+            assert ok == users and not probe.overlap and probe.peak <= limit
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,17 +1,86 @@
 import os
-import math
+import time
 import asyncio
-import threading
-from typing import Dict, Any, List
-
-from aiogram import Bot, Dispatcher, F
-from aiogram.filters import CommandStart
-from aiogram.types import Message, CallbackQuery
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from aiohttp import web
+
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject, CommandStart
+from aiogram.types import (
+    Message,
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+)
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.context import FSMContext
-
-from flask import Flask
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from calc import (
+    AREA_SCALE,
+    MIX_MAX_AREA as MIX_MAX_AREA_DEFAULT,
+    PRODUCTS,
+    RESERVE_SCALE,
+    build_mix_tables,
+    calc_counts_for_product,
+    fmt,
+    looks_like_bulk,
+    money,
+    parse_dims,
+    parse_float,
+    parse_length_to_m,
+    parse_quick_query,
+    parse_surfaces,
+    recommended_packs,
+    render_counts,
+)
+from callbacks import (
+    BACK_PRODUCTS,
+    MODE_SURFACES,
+    MODE_TOTAL,
+    OPENING_BACK_TO_TYPE,
+    OPENING_CLEAR,
+    OPENING_FINISH,
+    OPENINGS_NO,
+    OPENINGS_YES,
+    PRICE_NO,
+    PRICE_YES,
+    SURFACE_ADD,
+    SURFACE_CLEAR,
+    SURFACE_FINISH,
+    WASTE_CONTINUE,
+    WASTE_TOGGLE,
+    CallbackRouter,
+    CompareCb,
+    OpeningManualCb,
+    OpeningPresetCb,
+    OpeningTypeCb,
+    ProductCb,
+    RepeatCb,
+    SidesCb,
+)
+from history import HistoryEntry, HistoryStore, now_ms
+from metrics import Registry, RequestTimer, UpdateTimer, since_update
+from roomspec import SpecError, compile_room_spec, looks_like_spec
+from sendqueue import HIGH, SendQueue, send_priority
+from throttle import ThrottleMiddleware
+from storage import (
+    ChatOrderIsolation,
+    EvictingMemoryStorage,
+    FSMSession,
+    FSMSessionMiddleware,
+    SESSION_STATS,
+    build_storage,
+    register_wire_type,
+    time_storage_ops,
+)
 
 
 # =========================
@@ -21,6 +90,66 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не найден. Добавь его в Environment Variables в Render.")
 
+# Режим получения апдейтов: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+PORT = int(os.environ.get("PORT", 10000))
+
+# Для webhook: публичный адрес сервиса (на Render есть RENDER_EXTERNAL_URL)
+WEBHOOK_BASE_URL = (os.getenv("WEBHOOK_BASE_URL") or os.getenv("RENDER_EXTERNAL_URL") or "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError(f"Неизвестный BOT_MODE={BOT_MODE!r}. Допустимо: polling или webhook.")
+if BOT_MODE == "webhook" and not WEBHOOK_BASE_URL:
+    raise ValueError("Для BOT_MODE=webhook нужен WEBHOOK_BASE_URL (или RENDER_EXTERNAL_URL).")
+
+# Результат одним сообщением (расчёт + магазины + вопрос о цене) вместо трёх
+COMPACT_RESULT = os.getenv("COMPACT_RESULT", "0") == "1"
+
+# Переключатели и списки правят существующее сообщение вместо отправки нового
+EDIT_IN_PLACE = os.getenv("EDIT_IN_PLACE", "0") == "1"
+
+# Хранилище FSM: memory (по умолчанию), sqlite (файл, WAL) или redis (общий для реплик)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory")
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", "fsm.sqlite3")
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+# Брошенные расчёты: удалять после простоя (сек, 0 = никогда) и держать не больше N сессий (0 = без лимита).
+# TTL действует для memory и redis.
+FSM_SESSION_TTL = int(os.getenv("FSM_SESSION_TTL", str(24 * 3600)))
+FSM_MAX_SESSIONS = int(os.getenv("FSM_MAX_SESSIONS", "50000"))
+
+# До какой площади (м²) таблица смешанных упаковок отвечает за O(1); дальше — добор крупной упаковкой
+MIX_MAX_AREA = float(os.getenv("MIX_MAX_AREA", str(MIX_MAX_AREA_DEFAULT)))
+
+# Inline-режим (@bot 12.5 ламинат): сколько секунд Telegram кэширует ответ и сколько готовых ответов держим у себя
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_CACHE_SIZE = int(os.getenv("INLINE_CACHE_SIZE", "4096"))
+
+# Сравнение всех товаров: сколько разных (площадь, запас) держать готовыми
+COMPARE_CACHE_SIZE = int(os.getenv("COMPARE_CACHE_SIZE", "1024"))
+
+# История расчётов (/history, /repeat): файл SQLite и сколько последних показывать
+HISTORY_PATH = os.getenv("HISTORY_PATH", "history.sqlite3")
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "10"))
+
+# Очередь исходящих: лимиты Telegram (~30 сообщений/с на бота, ~1/с в чат с коротким всплеском)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "5"))
+
+# Сколько апдейтов обрабатывается одновременно (разные чаты; внутри чата — строго по очереди).
+# Дальше polling не забирает новые апдейты, а webhook не открывает Telegram больше соединений.
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+
+# Лимит апдейтов от одного пользователя: в среднем THROTTLE_RATE в секунду, всплеск до THROTTLE_BURST.
+# THROTTLE_RATE=0 — без ограничения.
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "3"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "10"))
+
+# Гистограммы и счётчики на /metrics (формат Prometheus). METRICS=0 — не собирать.
+METRICS_ENABLED = os.getenv("METRICS", "1") == "1"
+
 
 # =========================
 # STORE LINKS (ваши магазины)
@@ -29,38 +158,6 @@ WB_STORE_URL = "https://www.wildberries.ru/seller/1284128"
 OZON_STORE_URL = "https://ozon.ru/t/R9dELyu"
 
 
-# =========================
-# PRODUCTS
-# =========================
-PRODUCTS: Dict[str, Dict[str, Any]] = {
-    "film_60x3": {
-        "title": "Плёнка 60×3 м (рулон)",
-        "pack_area": 0.6 * 3.0,  # 1.8 м²
-        "pack_name": "рулон(ов)",
-    },
-    "panel_30x30_20": {
-        "title": "Панели 30×30 см (20 шт/уп)",
-        "pack_area": 0.3 * 0.3 * 20,  # 1.8 м²
-        "pack_name": "упаковок",
-    },
-    "panel_30x60_auto": {
-        "title": "Панели 30×60 см (автоподбор 10 или 18 шт/уп)",
-        "auto_pick": True,
-        "variants": [
-            {"label": "10 шт/уп", "pack_area": 0.3 * 0.6 * 10, "pack_name": "упаковок"},
-            {"label": "18 шт/уп", "pack_area": 0.3 * 0.6 * 18, "pack_name": "упаковок"},
-        ],
-    },
-    "laminate": {
-        "title": "Ламинат 91.44×15.24 см",
-        "pack_area": 2.508,          # м²/уп
-        "pack_name": "упаковок",
-        "waste_percent": 0.10,       # 10%
-        "waste_default_on": True,    # по умолчанию ВКЛ
-    },
-}
-
-
 # =========================
 # FSM STATES
 # =========================
@@ -84,12 +181,106 @@ class CalcState(StatesGroup):
     waiting_price_single = State()
 
 
-dp = Dispatcher()
+fsm_storage, fsm_isolation = build_storage(
+    FSM_STORAGE,
+    sqlite_path=FSM_SQLITE_PATH,
+    redis_url=FSM_REDIS_URL,
+    ttl=FSM_SESSION_TTL,
+    max_sessions=FSM_MAX_SESSIONS,
+)
+# FSM-middleware регистрируем сами (disable_fsm=True), чтобы ограничитель стоял перед ним:
+# лишние апдейты отсекаются до замка чата и чтения хранилища
+dp = Dispatcher(storage=fsm_storage, events_isolation=fsm_isolation, disable_fsm=True)
+
+HEALTH: Dict[str, Any] = {
+    "mode": BOT_MODE,
+    "started_at": time.time(),
+    "ready": False,
+    "updates_total": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "last_update_at": None,
+}
+
+
+async def track_updates(handler, event, data):
+    HEALTH["updates_total"] += 1
+    HEALTH["last_update_at"] = time.time()
+    HEALTH["in_flight"] += 1
+    HEALTH["max_in_flight"] = max(HEALTH["max_in_flight"], HEALTH["in_flight"])
+    try:
+        return await handler(event, data)
+    finally:
+        HEALTH["in_flight"] -= 1
+
+
+# Самым первым из outer-middleware: считаются все апдейты — и отсечённые ограничителем,
+# и ждущие замка своего чата
+dp.update.outer_middleware(track_updates)
+
+metrics = Registry()
+update_seconds = metrics.histogram("bot_update_seconds", "Апдейт целиком, от получения до конца обработки", ("type",))
+handler_seconds = metrics.histogram("bot_handler_seconds", "Хендлер по имени и состоянию FSM на входе", ("handler", "state"))
+handler_errors = metrics.counter("bot_handler_errors_total", "Исключения из хендлеров", ("handler", "state", "error"))
+api_seconds = metrics.histogram("bot_api_request_seconds", "Вызов Bot API без ожидания в очереди отправки", ("method",))
+api_errors = metrics.counter("bot_api_errors_total", "Ошибки вызовов Bot API", ("method", "error"))
+storage_seconds = metrics.histogram("bot_fsm_storage_seconds", "Операция с хранилищем FSM", ("op",))
+calc_reply_seconds = metrics.histogram("bot_calc_reply_seconds", "От получения апдейта до отправленного результата расчёта")
+request_timer = RequestTimer(api_seconds, api_errors)
+if METRICS_ENABLED:
+    # Сразу за track_updates: в время апдейта входят и ограничитель, и ожидание своего чата
+    dp.update.outer_middleware(UpdateTimer(update_seconds))
+    time_storage_ops(fsm_storage, storage_seconds.observe)
+
+throttle = ThrottleMiddleware(THROTTLE_RATE, THROTTLE_BURST) if THROTTLE_RATE > 0 else None
+if throttle is not None:
+    dp.update.outer_middleware(throttle)
+dp.update.outer_middleware(dp.fsm)
+dp.update.outer_middleware(FSMSessionMiddleware())
+callbacks = CallbackRouter()
+dp.callback_query.register(callbacks.dispatch)
+
+
+def handler_name(callback, event) -> str:
+    # Все кнопки идут через callbacks.dispatch — имя берём у маршрута, который она выберет
+    if callback == callbacks.dispatch:
+        route = callbacks.resolve(event.data or "")
+        return route.name if route is not None else "unhandled"
+    return callback.__name__
+
+
+async def time_handler(handler, event, data):
+    name = handler_name(data["handler"].callback, event)
+    state = data.get("raw_state") or "none"
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    except Exception as e:
+        handler_errors.inc(name, state, type(e).__name__)
+        raise
+    finally:
+        handler_seconds.observe(time.perf_counter() - started, name, state)
+
+
+if METRICS_ENABLED:
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(time_handler)
+if isinstance(fsm_storage, EvictingMemoryStorage):
+    dp.startup.register(fsm_storage.start_sweeper)
+history = HistoryStore(HISTORY_PATH)
+dp.startup.register(history.start_flusher)
+dp.shutdown.register(history.close)
+send_queue = SendQueue(SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST)
 
 
 # =========================
 # TEXT + KEYBOARDS
 # =========================
+# Клавиатуры одинаковы для всех пользователей: каждая строится один раз
+# (lru_cache, см. warm_keyboards) и дальше переиспользуется как есть.
+ROOM_SPEC_HINT = "Или всё сразу одной строкой: room 4.2x3.1 h2.7; door 80x200; window 140x140 x2"
+
+
 def welcome_text() -> str:
     return (
         "✨ the_all4u — самоклеящиеся покрытия\n\n"
@@ -100,87 +291,97 @@ def welcome_text() -> str:
         "✔ панели 30×60 см\n"
         "✔ ламинат 91.44×15.24 см\n"
         "✔ расчёт стоимости\n\n"
-        "Выберите вариант расчёта и получите точный результат 👌"
+        "Выберите вариант расчёта и получите точный результат 👌\n"
+        "Прошлые расчёты: /history"
     )
 
 
+@lru_cache(maxsize=None)
 def main_menu_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="1) Плёнка 60×3 м", callback_data="calc:film_60x3")
-    kb.button(text="2) Панели 30×30 (20 шт/уп)", callback_data="calc:panel_30x30_20")
-    kb.button(text="3) Панели 30×60 (автоподбор)", callback_data="calc:panel_30x60_auto")
-    kb.button(text="4) Ламинат 91.44×15.24", callback_data="calc:laminate")
+    kb.button(text="1) Плёнка 60×3 м", callback_data=ProductCb(key="film_60x3"))
+    kb.button(text="2) Панели 30×30 (20 шт/уп)", callback_data=ProductCb(key="panel_30x30_20"))
+    kb.button(text="3) Панели 30×60 (автоподбор)", callback_data=ProductCb(key="panel_30x60_auto"))
+    kb.button(text="4) Ламинат 91.44×15.24", callback_data=ProductCb(key="laminate"))
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=16)
 def input_mode_kb(product_key: str):
     kb = InlineKeyboardBuilder()
     # Для ламината поверхности не нужны
     if product_key != "laminate":
-        kb.button(text="Быстрый ввод общей площади (м²)", callback_data="mode:total")
-        kb.button(text="Добавить поверхности (мебель/полки/стол)", callback_data="mode:surfaces")
+        kb.button(text="Быстрый ввод общей площади (м²)", callback_data=MODE_TOTAL)
+        kb.button(text="Добавить поверхности (мебель/полки/стол)", callback_data=MODE_SURFACES)
     else:
-        kb.button(text="Ввести площадь пола/стены (м²)", callback_data="mode:total")
-    kb.button(text="⬅️ Назад к выбору товара", callback_data="back:products")
+        kb.button(text="Ввести площадь пола/стены (м²)", callback_data=MODE_TOTAL)
+    kb.button(text="⬅️ Назад к выбору товара", callback_data=BACK_PRODUCTS)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=None)
 def surfaces_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="➕ Добавить ещё поверхность", callback_data="surface:add")
-    kb.button(text="✅ Завершить и перейти к проёмам", callback_data="surface:finish")
-    kb.button(text="🧹 Очистить список", callback_data="surface:clear")
+    kb.button(text="➕ Добавить ещё поверхность", callback_data=SURFACE_ADD)
+    kb.button(text="✅ Завершить и перейти к проёмам", callback_data=SURFACE_FINISH)
+    kb.button(text="🧹 Очистить список", callback_data=SURFACE_CLEAR)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=None)
 def sides_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="1 сторона", callback_data="sides:1")
-    kb.button(text="2 стороны", callback_data="sides:2")
+    kb.button(text="1 сторона", callback_data=SidesCb(n=1))
+    kb.button(text="2 стороны", callback_data=SidesCb(n=2))
     kb.adjust(2)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=None)
 def price_choice_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="✅ Да, рассчитать стоимость", callback_data="price:yes")
-    kb.button(text="❌ Нет, только количество", callback_data="price:no")
-    kb.button(text="⬅️ Назад к выбору товара", callback_data="back:products")
+    kb.button(text="✅ Да, рассчитать стоимость", callback_data=PRICE_YES)
+    kb.button(text="❌ Нет, только количество", callback_data=PRICE_NO)
+    kb.button(text="⬅️ Назад к выбору товара", callback_data=BACK_PRODUCTS)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=16)
 def waste_toggle_kb(is_on: bool):
     kb = InlineKeyboardBuilder()
     status = "ВКЛ ✅" if is_on else "ВЫКЛ ❌"
-    kb.button(text=f"Запас 10%: {status} (нажми, чтобы переключить)", callback_data="waste:toggle")
-    kb.button(text="➡️ Далее", callback_data="waste:continue")
-    kb.button(text="⬅️ Назад к выбору товара", callback_data="back:products")
+    kb.button(text=f"Запас 10%: {status} (нажми, чтобы переключить)", callback_data=WASTE_TOGGLE)
+    kb.button(text="➡️ Далее", callback_data=WASTE_CONTINUE)
+    kb.button(text="⬅️ Назад к выбору товара", callback_data=BACK_PRODUCTS)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=None)
 def openings_yesno_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="Нет, без проёмов", callback_data="openings:no")
-    kb.button(text="Да, добавить окна/двери", callback_data="openings:yes")
+    kb.button(text="Нет, без проёмов", callback_data=OPENINGS_NO)
+    kb.button(text="Да, добавить окна/двери", callback_data=OPENINGS_YES)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=None)
 def opening_mode_kb():
     kb = InlineKeyboardBuilder()
-    kb.button(text="🚪 Добавить дверь", callback_data="opening_type:door")
-    kb.button(text="🪟 Добавить окно", callback_data="opening_type:window")
-    kb.button(text="✅ Готово, рассчитать", callback_data="opening:finish")
-    kb.button(text="🧹 Очистить проёмы", callback_data="opening:clear")
+    kb.button(text="🚪 Добавить дверь", callback_data=OpeningTypeCb(kind="door"))
+    kb.button(text="🪟 Добавить окно", callback_data=OpeningTypeCb(kind="window"))
+    kb.button(text="✅ Готово, рассчитать", callback_data=OPENING_FINISH)
+    kb.button(text="🧹 Очистить проёмы", callback_data=OPENING_CLEAR)
     kb.adjust(1)
     return kb.as_markup()
 
 
+@lru_cache(maxsize=16)
 def opening_presets_kb(opening_type: str):
     kb = InlineKeyboardBuilder()
 
@@ -200,16 +401,59 @@ def opening_presets_kb(opening_type: str):
         ]
 
     for label, w, h in presets:
-        kb.button(text=label, callback_data=f"opening_preset:{opening_type}:{w}:{h}")
+        kb.button(text=label, callback_data=OpeningPresetCb(kind=opening_type, w=w, h=h))
+
+    kb.button(text="⌨️ Ввести вручную", callback_data=OpeningManualCb(kind=opening_type))
+    kb.button(text="⬅️ Назад к выбору типа", callback_data=OPENING_BACK_TO_TYPE)
+    kb.button(text="✅ Готово, рассчитать", callback_data=OPENING_FINISH)
+    kb.button(text="🧹 Очистить проёмы", callback_data=OPENING_CLEAR)
+    kb.adjust(1)
+    return kb.as_markup()
+
+
+def merge_kb(*markups: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[row for m in markups for row in m.inline_keyboard])
+
+
+@lru_cache(maxsize=None)
+def result_kb():
+    return merge_kb(buy_kb(), price_choice_kb())
+
+
+@lru_cache(maxsize=None)
+def final_kb():
+    return merge_kb(buy_kb(), main_menu_kb())
+
+
+@lru_cache(maxsize=COMPARE_CACHE_SIZE)
+def compare_button_kb(area_mm2: int, reserve_bp: int):
+    kb = InlineKeyboardBuilder()
+    kb.button(text="⚖️ Сравнить все товары", callback_data=CompareCb(area=area_mm2, reserve=reserve_bp))
+    return kb.as_markup()
+
 
-    kb.button(text="⌨️ Ввести вручную", callback_data=f"opening_manual:{opening_type}")
-    kb.button(text="⬅️ Назад к выбору типа", callback_data="opening:back_to_type")
-    kb.button(text="✅ Готово, рассчитать", callback_data="opening:finish")
-    kb.button(text="🧹 Очистить проёмы", callback_data="opening:clear")
+@lru_cache(maxsize=COMPARE_CACHE_SIZE)
+def compare_kb(area_mm2: int, reserve_bp: int, current: str = ""):
+    kb = InlineKeyboardBuilder()
+    for key, p in PRODUCTS.items():
+        if key != current:
+            kb.button(text=f"🔎 {p['title']}", callback_data=CompareCb(area=area_mm2, reserve=reserve_bp, key=key))
+    if current:
+        kb.button(text="⚖️ Все товары рядом", callback_data=CompareCb(area=area_mm2, reserve=reserve_bp))
+    kb.button(text="🔄 Новый расчёт", callback_data=BACK_PRODUCTS)
     kb.adjust(1)
     return kb.as_markup()
 
 
+def history_kb(entries: List[HistoryEntry]):
+    kb = InlineKeyboardBuilder()
+    for i, entry in enumerate(entries, 1):
+        kb.button(text=f"🔁 {i}", callback_data=RepeatCb(at=entry.at))
+    kb.adjust(5)
+    return kb.as_markup()
+
+
+@lru_cache(maxsize=None)
 def buy_kb():
     kb = InlineKeyboardBuilder()
     kb.button(text="🟣 Купить на Wildberries", url=WB_STORE_URL)
@@ -218,199 +462,216 @@ def buy_kb():
     return kb.as_markup()
 
 
+def warm_keyboards():
+    for build in (main_menu_kb, surfaces_kb, sides_kb, price_choice_kb, openings_yesno_kb,
+                  opening_mode_kb, buy_kb, result_kb, final_kb):
+        build()
+    for key in PRODUCTS:
+        input_mode_kb(key)
+    for is_on in (True, False):
+        waste_toggle_kb(is_on)
+    for opening_type in ("door", "window"):
+        opening_presets_kb(opening_type)
+
+
 # =========================
 # HELPERS
 # =========================
-def fmt(n: float) -> str:
-    return f"{n:.2f}".rstrip("0").rstrip(".")
+async def _await(aw):
+    return await aw
 
 
-def money(n: float) -> str:
-    return f"{n:,.2f}".replace(",", " ") + " ₽"
+async def concurrently(*aws):
+    """Отправляет независимые вызовы Bot API параллельно (порядок ответов не важен)."""
+    return await asyncio.gather(*(_await(aw) for aw in aws))
 
 
-def parse_float(text: str) -> float:
-    v = float(text.strip().replace(",", "."))
-    if v <= 0:
-        raise ValueError
-    return v
+@dataclass
+class Surface:
+    __slots__ = ("name", "length_cm", "width_cm", "sides", "area")
+    name: str
+    length_cm: float
+    width_cm: float
+    sides: int
+    area: float
 
+    def to_wire(self) -> list:
+        return [self.name, self.length_cm, self.width_cm, self.sides, self.area]
 
-def parse_length_to_m(text: str) -> float:
-    """
-    Поддержка:
-      - 1.2 / 0,8          -> метры
-      - 120 см / 120cm     -> сантиметры
-      - 120 (без единиц)   -> если >=10, считаем см; иначе м
-    """
-    t = text.strip().lower().replace(",", ".")
-    t = t.replace(" ", "")
-    is_cm = ("см" in t) or ("cm" in t)
-    t = t.replace("см", "").replace("cm", "")
-    val = float(t)
-    if val <= 0:
-        raise ValueError
-    if is_cm:
-        return val / 100.0
-    return val / 100.0 if val >= 10 else val
+    @classmethod
+    def from_wire(cls, row: list) -> "Surface":
+        return cls(*row)
+
+
+@dataclass
+class Opening:
+    __slots__ = ("type", "w_m", "h_m", "area")
+    type: str  # door/window
+    w_m: float
+    h_m: float
+    area: float
 
+    def to_wire(self) -> list:
+        return [self.type, self.w_m, self.h_m, self.area]
 
-def with_reserve(area: float, reserve: float) -> float:
-    return area * (1 + reserve)
+    @classmethod
+    def from_wire(cls, row: list) -> "Opening":
+        return cls(*row)
 
 
-def packs_needed(area_with_reserve: float, pack_area: float) -> int:
-    return math.ceil(area_with_reserve / pack_area)
+register_wire_type("~s", Surface)
+register_wire_type("~o", Opening)
 
 
-def openings_total(openings: List[Dict[str, Any]]) -> float:
-    return sum(o["area"] for o in openings)
+def openings_total(openings: List[Opening]) -> float:
+    return sum(o.area for o in openings)
 
 
-def openings_summary(openings: List[Dict[str, Any]]) -> str:
+def openings_summary(openings: List[Opening], total: Optional[float] = None) -> str:
     if not openings:
         return "Проёмы не добавлены."
     lines = ["Проёмы (окна/двери):"]
     for i, o in enumerate(openings, 1):
-        icon = "🚪" if o.get("type") == "door" else "🪟"
-        type_ru = "Дверь" if o.get("type") == "door" else "Окно"
-        lines.append(f"{i}) {icon} {type_ru}: {fmt(o['w_m'])} × {fmt(o['h_m'])} м = {fmt(o['area'])} м²")
-    lines.append(f"\nИтого проёмов: {fmt(openings_total(openings))} м²")
+        icon = "🚪" if o.type == "door" else "🪟"
+        type_ru = "Дверь" if o.type == "door" else "Окно"
+        lines.append(f"{i}) {icon} {type_ru}: {fmt(o.w_m)} × {fmt(o.h_m)} м = {fmt(o.area)} м²")
+    lines.append(f"\nИтого проёмов: {fmt(openings_total(openings) if total is None else total)} м²")
     return "\n".join(lines)
 
 
-def surfaces_total(data_surfaces: List[Dict[str, Any]]) -> float:
-    return sum(item["area"] for item in data_surfaces)
+def surfaces_total(data_surfaces: List[Surface]) -> float:
+    return sum(item.area for item in data_surfaces)
 
 
-def surfaces_summary(data_surfaces: List[Dict[str, Any]]) -> str:
+def surfaces_summary(data_surfaces: List[Surface], total: Optional[float] = None) -> str:
     if not data_surfaces:
         return "Пока не добавлено ни одной поверхности."
     lines = ["Добавленные поверхности:"]
     for i, s in enumerate(data_surfaces, 1):
-        sides_txt = "2 стороны" if s["sides"] == 2 else "1 сторона"
+        sides_txt = "2 стороны" if s.sides == 2 else "1 сторона"
         lines.append(
-            f"{i}) {s['name']}: {fmt(s['length_cm'])}×{fmt(s['width_cm'])} см, {sides_txt} = {fmt(s['area'])} м²"
+            f"{i}) {s.name}: {fmt(s.length_cm)}×{fmt(s.width_cm)} см, {sides_txt} = {fmt(s.area)} м²"
         )
-    lines.append(f"\nИтого: {fmt(surfaces_total(data_surfaces))} м²")
-    return "\n".join(lines)
-
-
-def calc_counts_for_product(product_key: str, area: float, reserve_percent: float) -> Dict[str, Any]:
-    p = PRODUCTS[product_key]
-    target = with_reserve(area, reserve_percent)
-
-    if p.get("auto_pick"):
-        variants = []
-        best = None
-        best_over = None
-        for v in p["variants"]:
-            cnt = packs_needed(target, v["pack_area"])
-            covered = cnt * v["pack_area"]
-            over = covered - target
-            item = {
-                "label": v["label"],
-                "count": cnt,
-                "pack_name": v["pack_name"],
-                "covered": covered,
-                "over": over,
-            }
-            variants.append(item)
-            if best_over is None or over < best_over:
-                best_over = over
-                best = item
-        return {
-            "type": "auto_pick",
-            "title": p["title"],
-            "target_area": target,
-            "reserve_percent": reserve_percent,
-            "variants": variants,
-            "best": best,
-        }
-
-    cnt = packs_needed(target, p["pack_area"])
-    covered = cnt * p["pack_area"]
-    return {
-        "type": "single",
-        "title": p["title"],
-        "target_area": target,
-        "reserve_percent": reserve_percent,
-        "count": cnt,
-        "pack_name": p["pack_name"],
-        "covered": covered,
-    }
-
-
-def render_counts(base_area: float, openings_area: float, net_area: float, counts: Dict[str, Any]) -> str:
-    rp = float(counts.get("reserve_percent", 0.10))
-    reserve_line = (
-        f"С запасом {int(rp * 100)}%: {fmt(counts['target_area'])} м²"
-        if rp > 0 else
-        f"Без запаса: {fmt(counts['target_area'])} м²"
-    )
-
-    lines = [
-        "📊 Результат расчёта",
-        "",
-        f"📏 Площадь (введено): {fmt(base_area)} м²",
-        f"🪟 Проёмы: − {fmt(openings_area)} м²" if openings_area > 0 else "🪟 Проёмы: не вычитаются",
-        f"✅ Площадь к расчёту: {fmt(net_area)} м²",
-        f"🧮 {reserve_line}",
-        "",
-    ]
-
-    if counts["type"] == "single":
-        lines += [
-            f"🧱 {counts['title']}",
-            f"📦 Нужно: {counts['count']} {counts['pack_name']}",
-            f"Покрытие: ~ {fmt(counts['covered'])} м²",
-        ]
-        return "\n".join(lines)
-
-    lines.append(f"🧱 {counts['title']}")
-    for v in counts["variants"]:
-        lines.append(f"• {v['label']}: {v['count']} упаковок (покроет ~ {fmt(v['covered'])} м²)")
-    lines += ["", f"✅ Рекомендация: {counts['best']['label']} — {counts['best']['count']} упаковок"]
+    lines.append(f"\nИтого: {fmt(surfaces_total(data_surfaces) if total is None else total)} м²")
     return "\n".join(lines)
 
 
 # =========================
 # HANDLERS
 # =========================
+async def show(
+    callback: CallbackQuery,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup] = None,
+    keep_text: bool = False,
+):
+    """
+    Ответ на нажатие кнопки. В режиме EDIT_IN_PLACE правит сообщение с кнопкой
+    (keep_text=True — только клавиатуру), ничего не шлёт, если содержимое не изменилось,
+    и отправляет новое сообщение, если старое уже нельзя редактировать.
+    """
+    msg = callback.message
+    if EDIT_IN_PLACE and isinstance(msg, Message):
+        same_text = keep_text or msg.text == text
+        if same_text and msg.reply_markup == reply_markup:
+            return msg
+        try:
+            if same_text:
+                return await msg.edit_reply_markup(reply_markup=reply_markup)
+            return await msg.edit_text(text, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return msg
+            # Сообщение слишком старое или удалено — просто пишем новое
+    return await msg.answer(text, reply_markup=reply_markup)
+
+
 @dp.message(CommandStart())
-async def start_cmd(message: Message, state: FSMContext):
-    await state.clear()
+async def start_cmd(message: Message, session: FSMSession):
+    session.clear()
     await message.answer(welcome_text(), reply_markup=main_menu_kb())
 
 
-@dp.callback_query(F.data == "back:products")
-async def back_products(callback: CallbackQuery, state: FSMContext):
-    await state.clear()
+# ---------- История: /history, /repeat [N] ----------
+def history_line(i: int, entry: HistoryEntry) -> str:
+    when = time.strftime("%d.%m %H:%M", time.localtime(entry.at / 1000))
+    title = PRODUCTS[entry.product_key]["title"] if entry.product_key in PRODUCTS else entry.product_key
+    return f"{i}) {when} · {title}: {fmt(entry.net_area)} м² → {counts_summary(entry.counts)}"
+
+
+@dp.message(Command("history"))
+async def history_cmd(message: Message):
+    entries = await history.recent(message.chat.id, HISTORY_LIMIT)
+    if not entries:
+        await message.answer("История пуста — здесь появятся ваши расчёты.", reply_markup=main_menu_kb())
+        return
+    lines = ["🕘 Последние расчёты:", ""] + [history_line(i, e) for i, e in enumerate(entries, 1)]
+    lines += ["", "Повторить: кнопка ниже или /repeat N (без номера — последний)."]
+    await message.answer("\n".join(lines), reply_markup=history_kb(entries))
+
+
+@dp.message(Command("repeat"))
+async def repeat_cmd(message: Message, command: CommandObject, session: FSMSession):
+    arg = (command.args or "1").strip()
+    n = int(arg) if arg.isdigit() else 0
+    if not 1 <= n <= HISTORY_LIMIT:
+        await message.answer(f"Номер расчёта — от 1 до {HISTORY_LIMIT}, см. /history")
+        return
+    entries = await history.recent(message.chat.id, n)
+    if len(entries) < n:
+        await message.answer("Такого расчёта нет в истории, см. /history")
+        return
+    await repeat_entry(message, session, entries[n - 1])
+
+
+@callbacks.route(RepeatCb)
+async def repeat_pick(callback: CallbackQuery, callback_data: RepeatCb, session: FSMSession):
+    entry = await history.find(callback.message.chat.id, callback_data.at)
+    if entry is None:
+        await callback.answer("Этого расчёта уже нет в истории", show_alert=True)
+        return
+    await concurrently(repeat_entry(callback.message, session, entry), callback.answer())
+
+
+async def repeat_entry(message: Message, session: FSMSession, entry: HistoryEntry):
+    """Результат из истории как свежий: тот же ответ и вопрос о стоимости, без пересчёта."""
+    session.clear()
+    session.update(product_key=entry.product_key, reserve_percent=entry.reserve_percent)
+    await send_result(message, session, entry.base_area, entry.openings_area, entry.net_area,
+                      entry.reserve_percent, entry.counts)
+
+
+@callbacks.route(BACK_PRODUCTS)
+async def back_products(callback: CallbackQuery, session: FSMSession):
+    session.clear()
     await callback.message.answer("Выберите товар:", reply_markup=main_menu_kb())
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("calc:"))
-async def choose_product(callback: CallbackQuery, state: FSMContext):
-    key = callback.data.split(":", 1)[1]
+@callbacks.route(ProductCb)
+async def choose_product(callback: CallbackQuery, callback_data: ProductCb, session: FSMSession):
+    key = callback_data.key
     if key not in PRODUCTS:
         await callback.answer("Неизвестный товар", show_alert=True)
         return
 
-    await state.update_data(
+    session.update(
         product_key=key,
         reserve_percent=0.10,
         surfaces=[],
+        surfaces_area=0.0,
         openings=[],
+        openings_area=0.0,
         base_area=None,
+        room=None,
         current_opening_w=None,
         current_opening_type=None
     )
 
     if key == "laminate":
         default_on = bool(PRODUCTS["laminate"].get("waste_default_on", True))
-        await state.update_data(reserve_percent=(0.10 if default_on else 0.0))
-        await state.set_state(CalcState.choose_waste)
+        session.update(reserve_percent=(0.10 if default_on else 0.0))
+        session.set_state(CalcState.choose_waste)
         await callback.message.answer(
             f"Вы выбрали: {PRODUCTS[key]['title']}\n\nНужен запас 10%?",
             reply_markup=waste_toggle_kb(default_on),
@@ -418,7 +679,7 @@ async def choose_product(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
 
-    await state.set_state(CalcState.choose_input_mode)
+    session.set_state(CalcState.choose_input_mode)
     await callback.message.answer(
         f"Вы выбрали: {PRODUCTS[key]['title']}\n\nКак хотите ввести площадь?",
         reply_markup=input_mode_kb(key)
@@ -427,63 +688,101 @@ async def choose_product(callback: CallbackQuery, state: FSMContext):
 
 
 # ---------- Ламинат: запас ----------
-@dp.callback_query(CalcState.choose_waste, F.data == "waste:toggle")
-async def waste_toggle(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
+@callbacks.route(WASTE_TOGGLE, CalcState.choose_waste)
+async def waste_toggle(callback: CallbackQuery, session: FSMSession):
+    data = session.get_data()
     rp = float(data.get("reserve_percent", 0.10))
     new_rp = 0.0 if rp > 0 else 0.10
-    await state.update_data(reserve_percent=new_rp)
-    await callback.message.answer(
+    session.update(reserve_percent=new_rp)
+    await show(
+        callback,
         f"Запас для ламината: {'ВКЛ ✅ (10%)' if new_rp > 0 else 'ВЫКЛ ❌ (0%)'}",
         reply_markup=waste_toggle_kb(new_rp > 0),
+        keep_text=True,
     )
     await callback.answer()
 
 
-@dp.callback_query(CalcState.choose_waste, F.data == "waste:continue")
-async def waste_continue(callback: CallbackQuery, state: FSMContext):
-    await state.set_state(CalcState.waiting_total_area)
+@callbacks.route(WASTE_CONTINUE, CalcState.choose_waste)
+async def waste_continue(callback: CallbackQuery, session: FSMSession):
+    session.set_state(CalcState.waiting_total_area)
     await callback.message.answer(
-        "Введите площадь ПОЛА/СТЕНЫ в м² (например: 18.5)\n\n"
-        "Далее при желании можно вычесть проёмы (окна/двери)."
+        "Введите площадь ПОЛА/СТЕНЫ в м² (например: 18.5)\n"
+        "или размеры в метрах (например: 4.2x3.1) — тогда запас посчитаю по раскладке досок.\n\n"
+        "Далее при желании можно вычесть проёмы (окна/двери).\n"
+        f"{ROOM_SPEC_HINT}"
     )
     await callback.answer()
 
 
 # ---------- Режимы ввода площади ----------
-@dp.callback_query(CalcState.choose_input_mode, F.data == "mode:total")
-async def mode_total(callback: CallbackQuery, state: FSMContext):
-    await state.set_state(CalcState.waiting_total_area)
+@callbacks.route(MODE_TOTAL, CalcState.choose_input_mode)
+async def mode_total(callback: CallbackQuery, session: FSMSession):
+    session.set_state(CalcState.waiting_total_area)
     await callback.message.answer(
         "Введите общую площадь в м² (например: 12.5)\n\n"
-        "Если есть окна/двери — на следующем шаге можно их вычесть."
+        "Если есть окна/двери — на следующем шаге можно их вычесть.\n"
+        f"{ROOM_SPEC_HINT}"
     )
     await callback.answer()
 
 
-@dp.callback_query(CalcState.choose_input_mode, F.data == "mode:surfaces")
-async def mode_surfaces(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
+@callbacks.route(MODE_SURFACES, CalcState.choose_input_mode)
+async def mode_surfaces(callback: CallbackQuery, session: FSMSession):
+    data = session.get_data()
     if data.get("product_key") == "laminate":
         await callback.answer("Для ламината этот режим отключён.", show_alert=True)
         return
 
-    await state.set_state(CalcState.waiting_surface_name)
-    await callback.message.answer("Введите название поверхности (например: Стол, Полка 1, Дверца шкафа):")
+    session.set_state(CalcState.waiting_surface_name)
+    await callback.message.answer(
+        "Введите название поверхности (например: Стол, Полка 1, Дверца шкафа):\n\n"
+        "Или пришлите сразу список — по строке на поверхность:\n"
+        "Стол 120x60 x2\nПолка 80×30\nДверца 40*70 см 1"
+    )
     await callback.answer()
 
 
 # ---------- Ввод общей площади ----------
+async def process_room_spec(message: Message, session: FSMSession):
+    try:
+        spec = compile_room_spec(message.text)
+    except SpecError as e:
+        await message.answer(
+            f"⚠️ {e}\n\nПример: room 4.2x3.1 h2.7; door 80x200; window 140x140 x2\n"
+            "Г-образная комната: room 0,0 4,0 4,2 2,2 2,3 0,3 h2.7 · пол: floor 4.2x3.1"
+        )
+        return
+
+    openings = [Opening(kind, w / 1000, h / 1000, w * h / 1_000_000) for kind, w, h in spec.openings]
+    session.update(
+        base_area=spec.base_area,
+        room=[spec.rect[0] / 1000, spec.rect[1] / 1000] if spec.rect else None,
+        openings=openings,
+        openings_area=spec.openings_area,
+    )
+    await finalize_calc(message, session)
+
+
 @dp.message(CalcState.waiting_total_area)
-async def process_total_area(message: Message, state: FSMContext):
+async def process_total_area(message: Message, session: FSMSession):
+    if looks_like_spec(message.text or ""):
+        await process_room_spec(message, session)
+        return
+    room = None
     try:
-        area = parse_float(message.text)
+        if any(sep in message.text.lower() for sep in ("x", "х", "×", "*")):
+            length_mm, width_mm = parse_dims(message.text)
+            room = [length_mm / 1000, width_mm / 1000]
+            area = length_mm * width_mm / 1_000_000
+        else:
+            area = parse_float(message.text)
     except Exception:
         await message.answer("Введите корректное число, например: 9.8")
         return
 
-    await state.update_data(base_area=area, openings=[])
-    await state.set_state(CalcState.ask_openings)
+    session.update(base_area=area, room=room, openings=[], openings_area=0.0)
+    session.set_state(CalcState.ask_openings)
     await message.answer(
         "Нужно вычесть проёмы (окна/двери) из этой площади?",
         reply_markup=openings_yesno_kb()
@@ -492,44 +791,48 @@ async def process_total_area(message: Message, state: FSMContext):
 
 # ---------- Поверхности ----------
 @dp.message(CalcState.waiting_surface_name)
-async def surface_name(message: Message, state: FSMContext):
-    name = message.text.strip()
+async def surface_name(message: Message, session: FSMSession):
+    text = message.text or ""      # фото, стикер и т.п. — без текста
+    if looks_like_bulk(text):
+        await surfaces_bulk(message, session)
+        return
+    name = text.strip()
     if not name:
         await message.answer("Название не должно быть пустым.")
         return
-    await state.update_data(current_name=name)
-    await state.set_state(CalcState.waiting_surface_length)
+    session.update(current_name=name)
+    session.set_state(CalcState.waiting_surface_length)
     await message.answer("Введите длину в см (например: 120)")
 
 
 @dp.message(CalcState.waiting_surface_length)
-async def surface_length(message: Message, state: FSMContext):
+async def surface_length(message: Message, session: FSMSession):
     try:
         length_cm = parse_float(message.text)
     except Exception:
         await message.answer("Введите корректную длину в см.")
         return
-    await state.update_data(current_length_cm=length_cm)
-    await state.set_state(CalcState.waiting_surface_width)
+    session.update(current_length_cm=length_cm)
+    session.set_state(CalcState.waiting_surface_width)
     await message.answer("Введите ширину в см (например: 60)")
 
 
 @dp.message(CalcState.waiting_surface_width)
-async def surface_width(message: Message, state: FSMContext):
+async def surface_width(message: Message, session: FSMSession):
     try:
         width_cm = parse_float(message.text)
     except Exception:
         await message.answer("Введите корректную ширину в см.")
         return
-    await state.update_data(current_width_cm=width_cm)
-    await state.set_state(CalcState.waiting_surface_sides)
+    session.update(current_width_cm=width_cm)
+    session.set_state(CalcState.waiting_surface_sides)
     await message.answer("Сколько сторон оклеивать?", reply_markup=sides_kb())
 
 
-@dp.callback_query(CalcState.waiting_surface_sides, F.data.startswith("sides:"))
-async def surface_sides(callback: CallbackQuery, state: FSMContext):
-    sides = int(callback.data.split(":")[1])
-    data = await state.get_data()
+@callbacks.route(SidesCb, CalcState.waiting_surface_sides)
+async def surface_sides(callback: CallbackQuery, callback_data: SidesCb, session: FSMSession):
+    sides = callback_data.n
+    data = session.get_data()
 
     name = data["current_name"]
     length_cm = data["current_length_cm"]
@@ -537,49 +840,69 @@ async def surface_sides(callback: CallbackQuery, state: FSMContext):
 
     area_m2 = (length_cm / 100) * (width_cm / 100) * sides
 
-    surfaces = data.get("surfaces", [])
-    surfaces.append({
-        "name": name,
-        "length_cm": length_cm,
-        "width_cm": width_cm,
-        "sides": sides,
-        "area": area_m2,
-    })
-
-    await state.update_data(
+    # Новый список, а не append: данные сессии — неглубокая копия, и при ошибке отправки
+    # сумма откатится, а дописанная в сохранённый список поверхность — нет
+    surfaces = [*data.get("surfaces", []), Surface(name, length_cm, width_cm, sides, area_m2)]
+    total = data.get("surfaces_area", 0.0) + area_m2
+
+    session.update(
         surfaces=surfaces,
+        surfaces_area=total,
         current_name=None,
         current_length_cm=None,
         current_width_cm=None,
     )
 
-    await callback.message.answer(
+    await show(
+        callback,
         f"✅ Добавлено: {name} — {fmt(area_m2)} м² ({'2 стороны' if sides == 2 else '1 сторона'})\n\n"
-        f"{surfaces_summary(surfaces)}",
+        f"{surfaces_summary(surfaces, total)}",
         reply_markup=surfaces_kb()
     )
-    await state.set_state(CalcState.waiting_surface_name)
+    session.set_state(CalcState.waiting_surface_name)
     await callback.answer()
 
 
-@dp.callback_query(F.data == "surface:add")
-async def add_more_surface(callback: CallbackQuery, state: FSMContext):
-    await state.set_state(CalcState.waiting_surface_name)
+async def surfaces_bulk(message: Message, session: FSMSession):
+    rows, errors = parse_surfaces(message.text)
+    if not rows:
+        await message.answer("Не удалось разобрать ни одной поверхности:\n" + "\n".join(errors))
+        return
+
+    data = session.get_data()
+    surfaces = list(data.get("surfaces", []))      # копия — см. surface_sides
+    added = 0.0
+    for name, length_cm, width_cm, sides in rows:
+        area_m2 = (length_cm / 100) * (width_cm / 100) * sides
+        surfaces.append(Surface(name, length_cm, width_cm, sides, area_m2))
+        added += area_m2
+    total = data.get("surfaces_area", 0.0) + added
+    session.update(surfaces=surfaces, surfaces_area=total)
+
+    text = f"✅ Добавлено поверхностей: {len(rows)} — {fmt(added)} м²"
+    if errors:
+        text += "\n\n⚠️ Пропущены строки:\n" + "\n".join(errors)
+    await message.answer(f"{text}\n\n{surfaces_summary(surfaces, total)}", reply_markup=surfaces_kb())
+
+
+@callbacks.route(SURFACE_ADD)
+async def add_more_surface(callback: CallbackQuery, session: FSMSession):
+    session.set_state(CalcState.waiting_surface_name)
     await callback.message.answer("Введите название следующей поверхности:")
     await callback.answer()
 
 
-@dp.callback_query(F.data == "surface:clear")
-async def clear_surfaces(callback: CallbackQuery, state: FSMContext):
-    await state.update_data(surfaces=[])
-    await state.set_state(CalcState.waiting_surface_name)
-    await callback.message.answer("Список очищен. Введите название поверхности:")
+@callbacks.route(SURFACE_CLEAR)
+async def clear_surfaces(callback: CallbackQuery, session: FSMSession):
+    session.update(surfaces=[], surfaces_area=0.0)
+    session.set_state(CalcState.waiting_surface_name)
+    await show(callback, "Список очищен. Введите название поверхности:")
     await callback.answer()
 
 
-@dp.callback_query(F.data == "surface:finish")
-async def finish_surfaces(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
+@callbacks.route(SURFACE_FINISH)
+async def finish_surfaces(callback: CallbackQuery, session: FSMSession):
+    data = session.get_data()
     surfaces = data.get("surfaces", [])
 
     if not surfaces:
@@ -587,154 +910,153 @@ async def finish_surfaces(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
 
-    total = surfaces_total(surfaces)
-    await state.update_data(base_area=total, openings=[])
-    await state.set_state(CalcState.ask_openings)
+    total = data.get("surfaces_area", 0.0)
+    session.update(base_area=total, openings=[], openings_area=0.0)
+    session.set_state(CalcState.ask_openings)
 
     await callback.message.answer(
-        surfaces_summary(surfaces) + "\n\nНужно вычесть проёмы (окна/двери)?",
+        surfaces_summary(surfaces, total) + "\n\nНужно вычесть проёмы (окна/двери)?",
         reply_markup=openings_yesno_kb()
     )
     await callback.answer()
 
 
 # ---------- Проёмы ----------
-@dp.callback_query(CalcState.ask_openings, F.data == "openings:no")
-async def openings_no(callback: CallbackQuery, state: FSMContext):
-    await state.update_data(openings=[])
-    await finalize_calc(callback.message, state)
-    await callback.answer()
+@callbacks.route(OPENINGS_NO, CalcState.ask_openings)
+async def openings_no(callback: CallbackQuery, session: FSMSession):
+    session.update(openings=[], openings_area=0.0)
+    await concurrently(finalize_calc(callback.message, session), callback.answer())
 
 
-@dp.callback_query(CalcState.ask_openings, F.data == "openings:yes")
-async def openings_yes(callback: CallbackQuery, state: FSMContext):
-    await state.update_data(openings=[])
-    await state.set_state(CalcState.waiting_opening_type)
+@callbacks.route(OPENINGS_YES, CalcState.ask_openings)
+async def openings_yes(callback: CallbackQuery, session: FSMSession):
+    session.update(openings=[], openings_area=0.0)
+    session.set_state(CalcState.waiting_opening_type)
     await callback.message.answer("Выберите тип проёма:", reply_markup=opening_mode_kb())
     await callback.answer()
 
 
-@dp.callback_query(CalcState.waiting_opening_type, F.data.startswith("opening_type:"))
-async def opening_type_pick(callback: CallbackQuery, state: FSMContext):
-    opening_type = callback.data.split(":")[1]  # door/window
-    await state.update_data(current_opening_type=opening_type)
+@callbacks.route(OpeningTypeCb, CalcState.waiting_opening_type)
+async def opening_type_pick(callback: CallbackQuery, callback_data: OpeningTypeCb, session: FSMSession):
+    opening_type = callback_data.kind  # door/window
+    session.update(current_opening_type=opening_type)
     title = "двери" if opening_type == "door" else "окна"
-    await callback.message.answer(
+    await show(
+        callback,
         f"Выберите пресет для {title} или введите размер вручную:",
         reply_markup=opening_presets_kb(opening_type)
     )
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("opening_preset:"))
-async def opening_preset_pick(callback: CallbackQuery, state: FSMContext):
-    _, opening_type, w_str, h_str = callback.data.split(":")
-    w_m = float(w_str)
-    h_m = float(h_str)
+@callbacks.route(OpeningPresetCb)
+async def opening_preset_pick(callback: CallbackQuery, callback_data: OpeningPresetCb, session: FSMSession):
+    opening_type = callback_data.kind
+    w_m = callback_data.w
+    h_m = callback_data.h
     area = w_m * h_m
 
-    data = await state.get_data()
-    openings = data.get("openings", [])
-    openings.append({"type": opening_type, "w_m": w_m, "h_m": h_m, "area": area})
-    await state.update_data(openings=openings)
+    data = session.get_data()
+    openings = [*data.get("openings", []), Opening(opening_type, w_m, h_m, area)]    # копия — см. surface_sides
+    total = data.get("openings_area", 0.0) + area
+    session.update(openings=openings, openings_area=total)
 
     icon = "🚪" if opening_type == "door" else "🪟"
     type_ru = "Дверь" if opening_type == "door" else "Окно"
 
-    await callback.message.answer(
+    await show(
+        callback,
         f"✅ Добавлено: {icon} {type_ru} {fmt(w_m)}×{fmt(h_m)} м = {fmt(area)} м²\n\n"
-        f"{openings_summary(openings)}",
+        f"{openings_summary(openings, total)}",
         reply_markup=opening_mode_kb()
     )
-    await state.set_state(CalcState.waiting_opening_type)
+    session.set_state(CalcState.waiting_opening_type)
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("opening_manual:"))
-async def opening_manual_pick(callback: CallbackQuery, state: FSMContext):
-    opening_type = callback.data.split(":")[1]
-    await state.update_data(current_opening_type=opening_type)
+@callbacks.route(OpeningManualCb)
+async def opening_manual_pick(callback: CallbackQuery, callback_data: OpeningManualCb, session: FSMSession):
+    opening_type = callback_data.kind
+    session.update(current_opening_type=opening_type)
     label = "двери" if opening_type == "door" else "окна"
-    await state.set_state(CalcState.waiting_opening_width)
+    session.set_state(CalcState.waiting_opening_width)
     await callback.message.answer(
         f"Введите ШИРИНУ {label}.\nМожно: 1.2 (м) или 120 см.\nЕсли просто число 120 — это будет 120 см."
     )
     await callback.answer()
 
 
-@dp.callback_query(F.data == "opening:back_to_type")
-async def opening_back_to_type(callback: CallbackQuery, state: FSMContext):
-    await state.set_state(CalcState.waiting_opening_type)
-    await callback.message.answer("Выберите тип проёма:", reply_markup=opening_mode_kb())
+@callbacks.route(OPENING_BACK_TO_TYPE)
+async def opening_back_to_type(callback: CallbackQuery, session: FSMSession):
+    session.set_state(CalcState.waiting_opening_type)
+    await show(callback, "Выберите тип проёма:", reply_markup=opening_mode_kb())
     await callback.answer()
 
 
 @dp.message(CalcState.waiting_opening_width)
-async def opening_width(message: Message, state: FSMContext):
+async def opening_width(message: Message, session: FSMSession):
     try:
         w_m = parse_length_to_m(message.text)
     except Exception:
         await message.answer("Не понял ширину. Пример: 1.2 или 120 см")
         return
 
-    await state.update_data(current_opening_w=w_m)
-    await state.set_state(CalcState.waiting_opening_height)
+    session.update(current_opening_w=w_m)
+    session.set_state(CalcState.waiting_opening_height)
     await message.answer("Теперь введите ВЫСОТУ (например: 2.1 или 210 см)")
 
 
 @dp.message(CalcState.waiting_opening_height)
-async def opening_height(message: Message, state: FSMContext):
+async def opening_height(message: Message, session: FSMSession):
     try:
         h_m = parse_length_to_m(message.text)
     except Exception:
         await message.answer("Не понял высоту. Пример: 2.1 или 210 см")
         return
 
-    data = await state.get_data()
+    data = session.get_data()
     w_m = float(data["current_opening_w"])
     opening_type = data.get("current_opening_type", "window")
     area = w_m * h_m
 
-    openings = data.get("openings", [])
-    openings.append({"type": opening_type, "w_m": w_m, "h_m": h_m, "area": area})
+    openings = [*data.get("openings", []), Opening(opening_type, w_m, h_m, area)]    # копия — см. surface_sides
+    total = data.get("openings_area", 0.0) + area
 
-    await state.update_data(openings=openings, current_opening_w=None, current_opening_type=None)
+    session.update(openings=openings, openings_area=total, current_opening_w=None, current_opening_type=None)
 
     icon = "🚪" if opening_type == "door" else "🪟"
     type_ru = "Дверь" if opening_type == "door" else "Окно"
 
     await message.answer(
         f"✅ Добавлено: {icon} {type_ru} {fmt(w_m)}×{fmt(h_m)} м = {fmt(area)} м²\n\n"
-        f"{openings_summary(openings)}",
+        f"{openings_summary(openings, total)}",
         reply_markup=opening_mode_kb()
     )
-    await state.set_state(CalcState.waiting_opening_type)
+    session.set_state(CalcState.waiting_opening_type)
 
 
-@dp.callback_query(F.data == "opening:clear")
-async def opening_clear(callback: CallbackQuery, state: FSMContext):
-    await state.update_data(openings=[], current_opening_type=None, current_opening_w=None)
-    await state.set_state(CalcState.waiting_opening_type)
-    await callback.message.answer("Проёмы очищены. Выберите тип проёма:", reply_markup=opening_mode_kb())
+@callbacks.route(OPENING_CLEAR)
+async def opening_clear(callback: CallbackQuery, session: FSMSession):
+    session.update(openings=[], openings_area=0.0, current_opening_type=None, current_opening_w=None)
+    session.set_state(CalcState.waiting_opening_type)
+    await show(callback, "Проёмы очищены. Выберите тип проёма:", reply_markup=opening_mode_kb())
     await callback.answer()
 
 
-@dp.callback_query(F.data == "opening:finish")
-async def opening_finish(callback: CallbackQuery, state: FSMContext):
-    await finalize_calc(callback.message, state)
-    await callback.answer()
+@callbacks.route(OPENING_FINISH)
+async def opening_finish(callback: CallbackQuery, session: FSMSession):
+    await concurrently(finalize_calc(callback.message, session), callback.answer())
 
 
 # ---------- Финал расчёта ----------
-async def finalize_calc(message: Message, state: FSMContext):
-    data = await state.get_data()
+async def finalize_calc(message: Message, session: FSMSession):
+    data = session.get_data()
 
     product_key = data["product_key"]
     reserve_percent = float(data.get("reserve_percent", 0.10))
 
     base_area = float(data.get("base_area") or 0.0)
-    openings = data.get("openings", [])
-    openings_area = openings_total(openings)
+    openings_area = float(data.get("openings_area", 0.0))
     net_area = max(base_area - openings_area, 0.0)
 
     if net_area <= 0:
@@ -742,95 +1064,332 @@ async def finalize_calc(message: Message, state: FSMContext):
             "После вычета проёмов площадь стала 0 м².\nПроверьте данные и попробуйте ещё раз.",
             reply_markup=main_menu_kb()
         )
-        await state.clear()
+        session.clear()
         return
 
-    counts = calc_counts_for_product(product_key, net_area, reserve_percent)
-
-    await state.update_data(
+    surfaces = [(s.name, s.length_cm, s.width_cm, s.sides) for s in data.get("surfaces") or []]
+    room = data.get("room")
+    if room:
+        room = (room[0], room[1], [(o.w_m, o.h_m) for o in data.get("openings", [])])
+    counts = calc_counts_for_product(product_key, net_area, reserve_percent, surfaces, room)
+    history.record(message.chat.id, HistoryEntry(
+        now_ms(), product_key, base_area, openings_area, reserve_percent, counts, surfaces, room,
+    ))
+    await send_result(message, session, base_area, openings_area, net_area, reserve_percent, counts)
+    elapsed = since_update()
+    if elapsed is not None:
+        calc_reply_seconds.observe(elapsed)
+
+
+async def send_result(
+    message: Message,
+    session: FSMSession,
+    base_area: float,
+    openings_area: float,
+    net_area: float,
+    reserve_percent: float,
+    counts: Dict[str, Any],
+):
+    compare = compare_button_kb(round(net_area * AREA_SCALE), round(reserve_percent * RESERVE_SCALE))
+    session.set_state(CalcState.waiting_ask_price)
+    session.update(
         last_base_area=base_area,
         last_openings_area=openings_area,
         last_net_area=net_area,
         last_counts=counts,
     )
 
-    # 1) Пишем расчёт
-    await message.answer(render_counts(base_area, openings_area, net_area, counts))
+    # Результат расчёта — то, ради чего человек ждёт: в очереди исходящих он идёт первым
+    with send_priority(HIGH):
+        if COMPACT_RESULT:
+            # Одно сообщение: расчёт + магазины + вопрос о стоимости
+            await message.answer(
+                render_counts(base_area, openings_area, net_area, counts)
+                + "\n\n🛒 Официальный магазин the_all4u — кнопки ниже."
+                + "\n\nХотите рассчитать стоимость в рублях?",
+                reply_markup=merge_kb(compare, result_kb()),
+            )
+            return
 
-    # 2) Премиальная кнопка покупки (магазины)
-    await message.answer("🛒 Официальный магазин the_all4u:", reply_markup=buy_kb())
+        # 1) Пишем расчёт
+        await message.answer(render_counts(base_area, openings_area, net_area, counts), reply_markup=compare)
 
-    # 3) Вопрос о стоимости
-    await message.answer("Хотите рассчитать стоимость в рублях?", reply_markup=price_choice_kb())
-    await state.set_state(CalcState.waiting_ask_price)
+        # 2) Премиальная кнопка покупки (магазины)
+        await message.answer("🛒 Официальный магазин the_all4u:", reply_markup=buy_kb())
+
+        # 3) Вопрос о стоимости
+        await message.answer("Хотите рассчитать стоимость в рублях?", reply_markup=price_choice_kb())
 
 
 # ---------- Стоимость ----------
-@dp.callback_query(CalcState.waiting_ask_price, F.data == "price:no")
-async def price_no(callback: CallbackQuery, state: FSMContext):
-    await callback.message.answer("Готово ✅\nНовый расчёт:", reply_markup=main_menu_kb())
-    await state.clear()
-    await callback.answer()
+@callbacks.route(PRICE_NO, CalcState.waiting_ask_price)
+async def price_no(callback: CallbackQuery, session: FSMSession):
+    session.clear()
+    await concurrently(
+        callback.message.answer("Готово ✅\nНовый расчёт:", reply_markup=main_menu_kb()),
+        callback.answer(),
+    )
+
+
+def price_prompt(packs: List[Tuple[str, int]], i: int) -> str:
+    if len(packs) == 1:
+        return "Введите цену за 1 упаковку/рулон (например: 790)"
+    return f"Введите цену за 1 упаковку {packs[i][0]} ({i + 1} из {len(packs)}, например: 790)"
 
 
-@dp.callback_query(CalcState.waiting_ask_price, F.data == "price:yes")
-async def price_yes(callback: CallbackQuery, state: FSMContext):
-    await callback.message.answer("Введите цену за 1 упаковку/рулон (например: 790)")
-    await state.set_state(CalcState.waiting_price_single)
+@callbacks.route(PRICE_YES, CalcState.waiting_ask_price)
+async def price_yes(callback: CallbackQuery, session: FSMSession):
+    # Считаем ту же рекомендацию, что в результате: смесь фасовок — цена за каждую
+    packs = recommended_packs(session.get("last_counts"))
+    session.update(prices=[])
+    await callback.message.answer(price_prompt(packs, 0))
+    session.set_state(CalcState.waiting_price_single)
     await callback.answer()
 
 
 @dp.message(CalcState.waiting_price_single)
-async def handle_price_single(message: Message, state: FSMContext):
+async def handle_price_single(message: Message, session: FSMSession):
     try:
         price = parse_float(message.text)
     except Exception:
         await message.answer("Введите корректную цену, например: 850")
         return
 
-    data = await state.get_data()
-    counts = data["last_counts"]
+    data = session.get_data()
+    packs = recommended_packs(data["last_counts"])
+    prices = (data.get("prices") or []) + [price]
+    if len(prices) < len(packs):
+        session.update(prices=prices)
+        await message.answer(price_prompt(packs, len(prices)))
+        return
 
-    if counts["type"] == "single":
-        qty = counts["count"]
-        total_cost = qty * price
-        text = f"💰 Стоимость:\n{qty} × {fmt(price)} = {money(total_cost)}"
+    if len(packs) == 1:
+        label, qty = packs[0]
+        title = f"💰 Стоимость ({label}):" if label else "💰 Стоимость:"
+        text = f"{title}\n{qty} × {fmt(price)} = {money(qty * price)}"
     else:
-        qty = counts["best"]["count"]
-        label = counts["best"]["label"]
-        total_cost = qty * price
-        text = f"💰 Стоимость ({label}):\n{qty} × {fmt(price)} = {money(total_cost)}"
+        lines = ["💰 Стоимость:"]
+        for (label, qty), p in zip(packs, prices):
+            lines.append(f"{label}: {qty} × {fmt(p)} = {money(qty * p)}")
+        total = sum(qty * p for (_, qty), p in zip(packs, prices))
+        lines.append(f"Итого за {sum(qty for _, qty in packs)} упаковок: {money(total)}")
+        text = "\n".join(lines)
+
+    if COMPACT_RESULT:
+        await message.answer(
+            text + "\n\n🛒 Официальный магазин the_all4u — кнопки ниже.\n\nНовый расчёт 👇",
+            reply_markup=final_kb(),
+        )
+        session.clear()
+        return
 
     await message.answer(text)
     await message.answer("🛒 Официальный магазин the_all4u:", reply_markup=buy_kb())
     await message.answer("\nНовый расчёт 👇", reply_markup=main_menu_kb())
-    await state.clear()
+    session.clear()
+
+
+# ---------- Сравнение всех товаров ----------
+@lru_cache(maxsize=COMPARE_CACHE_SIZE)
+def compare_all(area_mm2: int, reserve_bp: int) -> Tuple[str, Dict[str, str]]:
+    """
+    Все товары из PRODUCTS за один проход: сводка и готовый текст расчёта по каждому.
+    Переключение между товарами дальше — только поиск в кэше, без пересчёта и без ввода заново.
+    """
+    area = area_mm2 / AREA_SCALE
+    reserve = reserve_bp / RESERVE_SCALE
+    lines = [
+        "⚖️ Сравнение товаров",
+        "",
+        f"✅ Площадь к расчёту: {fmt(area)} м², " + (f"запас {fmt(reserve * 100)}%" if reserve_bp else "без запаса"),
+        "",
+    ]
+    details = {}
+    for key, p in PRODUCTS.items():
+        counts = calc_counts_for_product(key, area, reserve)
+        lines.append(f"• {p['title']}: {counts_summary(counts)}")
+        details[key] = render_counts(area, 0.0, area, counts)
+    lines += ["", "Расчёт по площади, без раскладки по поверхностям. Подробнее — кнопки ниже."]
+    return "\n".join(lines), details
+
+
+@callbacks.route(CompareCb)
+async def compare_products(callback: CallbackQuery, callback_data: CompareCb):
+    key = callback_data.key
+    if key and key not in PRODUCTS:
+        await callback.answer("Неизвестный товар", show_alert=True)
+        return
+    summary, details = compare_all(callback_data.area, callback_data.reserve)
+    await show(
+        callback,
+        details[key] if key else summary,
+        reply_markup=compare_kb(callback_data.area, callback_data.reserve, key),
+    )
+    await callback.answer()
+
+
+# ---------- Inline-режим: @bot 12.5 ламинат ----------
+def counts_summary(counts: Dict[str, Any]) -> str:
+    if counts["type"] == "single":
+        return f"{counts['count']} {counts['pack_name']}"
+    return " + ".join(f"{count} × {label}" for label, count in recommended_packs(counts))
+
+
+@lru_cache(maxsize=INLINE_CACHE_SIZE)
+def quick_articles(area_mm2: int, keys: tuple, reserve_bp: int) -> tuple:
+    """Готовые карточки на нормализованный запрос: популярные запросы не считаются и не рендерятся заново."""
+    area = area_mm2 / AREA_SCALE
+    reserve = reserve_bp / RESERVE_SCALE
+    articles = []
+    for key in keys:
+        counts = calc_counts_for_product(key, area, reserve)
+        articles.append(InlineQueryResultArticle(
+            id=f"{key}:{area_mm2}:{reserve_bp}",
+            title=f"{PRODUCTS[key]['title']} — {counts_summary(counts)}",
+            description=f"{fmt(area)} м², " + (f"запас {fmt(reserve * 100)}%" if reserve_bp else "без запаса"),
+            input_message_content=InputTextMessageContent(message_text=render_counts(area, 0.0, area, counts)),
+        ))
+    return tuple(articles)
+
+
+INLINE_HINT = InlineQueryResultsButton(text="Напишите площадь, например: 12.5 ламинат", start_parameter="calc")
+
+
+@dp.inline_query()
+async def inline_estimate(query: InlineQuery):
+    parsed = parse_quick_query(query.query)
+    if parsed is None:
+        await query.answer([], cache_time=INLINE_CACHE_TIME, button=INLINE_HINT)
+        return
+    await query.answer(list(quick_articles(*parsed)), cache_time=INLINE_CACHE_TIME)
 
 
 # =========================
-# FLASK (Render health check)
+# WEB (health check + webhook) — один aiohttp на том же event loop
 # =========================
-app = Flask(__name__)
+def health_text() -> str:
+    now = time.time()
+    last = HEALTH["last_update_at"]
+    lines = [
+        "Bot is running",
+        f"mode: {HEALTH['mode']}",
+        f"ready: {'yes' if HEALTH['ready'] else 'no'}",
+        f"uptime_s: {int(now - HEALTH['started_at'])}",
+        f"updates_total: {HEALTH['updates_total']}",
+        f"last_update_s_ago: {int(now - last) if last is not None else 'never'}",
+        f"fsm_ops_saved: {SESSION_STATS['logical_ops'] - SESSION_STATS['storage_ops']}"
+        f" ({SESSION_STATS['storage_ops']} storage ops for {SESSION_STATS['updates']} updates)",
+    ]
+    if isinstance(fsm_storage, EvictingMemoryStorage):
+        st = fsm_storage.stats()
+        lines.append(
+            f"fsm_sessions: {st['sessions']} (~{st['bytes'] // 1024} KiB),"
+            f" evicted: {st['evicted_ttl']} idle / {st['evicted_lru']} over limit"
+        )
+    lines.append(
+        f"updates_in_flight: {HEALTH['in_flight']} (max {HEALTH['max_in_flight']}, limit {UPDATE_CONCURRENCY})"
+    )
+    order = getattr(fsm_isolation, "inner", fsm_isolation)
+    if isinstance(order, ChatOrderIsolation):
+        lines[-1] += f", waiting for own chat: {order.waiting} (total {order.queued})"
+    if throttle is not None:
+        th = throttle.stats()
+        lines.append(
+            f"throttled: {th['throttled']} (callbacks {th['throttled_callback_query']},"
+            f" messages {th['throttled_message']}, other {th['throttled_other']}), buckets: {th['buckets']}"
+        )
+    sq = send_queue.stats()
+    lines.append(
+        f"send_queue: {sq['depth']} queued (max {sq['max_depth']}), sent {sq['sent']}, retry_after {sq['retries']},"
+        f" wait avg {sq['wait_avg_ms']:.0f} ms / max {sq['wait_max_ms']:.0f} ms"
+    )
+    return "\n".join(lines)
 
 
-@app.route("/")
-def home():
-    return "Bot is running"
+async def home(request: web.Request) -> web.Response:
+    return web.Response(text=health_text())
 
 
-def run_web():
-    port = int(os.environ.get("PORT", 10000))
-    app.run(host="0.0.0.0", port=port)
+async def ready(request: web.Request) -> web.Response:
+    return web.Response(text=health_text(), status=200 if HEALTH["ready"] else 503)
 
 
-async def main():
-    bot = Bot(BOT_TOKEN)
+metrics.gauge("bot_updates_in_flight", "Апдейтов в обработке сейчас", lambda: HEALTH["in_flight"])
+metrics.gauge("bot_send_queue_depth", "Отправок в очереди сейчас", lambda: send_queue.depth)
+
+
+async def metrics_page(request: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.expose().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def build_web_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/metrics", metrics_page)
+    return app
 
-    # На всякий случай: убираем вебхук и хвосты апдейтов при старте (стабильнее после деплоев)
-    await bot.delete_webhook(drop_pending_updates=True)
 
-    threading.Thread(target=run_web, daemon=True).start()
-    await dp.start_polling(bot, skip_updates=True)
+async def serve(app: web.Application) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host="0.0.0.0", port=PORT).start()
+    return runner
+
+
+async def run_polling(bot: Bot):
+    runner = await serve(build_web_app())
+    try:
+        # На всякий случай: убираем вебхук и хвосты апдейтов при старте (стабильнее после деплоев)
+        await bot.delete_webhook(drop_pending_updates=True)
+        HEALTH["ready"] = True
+        # Семафор aiogram: пока заняты UPDATE_CONCURRENCY задач, новые апдейты не забираются
+        await dp.start_polling(bot, skip_updates=True, tasks_concurrency_limit=UPDATE_CONCURRENCY)
+    finally:
+        HEALTH["ready"] = False
+        await runner.cleanup()
+
+
+async def run_webhook(bot: Bot):
+    app = build_web_app()
+    # Апдейт обрабатывается внутри запроса: одновременных апдейтов не больше, чем соединений
+    # (max_connections ниже), без фоновых задач сверх этого
+    SimpleRequestHandler(
+        dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET, handle_in_background=False,
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+
+    runner = await serve(app)
+    try:
+        await bot.set_webhook(
+            WEBHOOK_BASE_URL + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=max(1, min(UPDATE_CONCURRENCY, 100)),
+            drop_pending_updates=True,
+        )
+        HEALTH["ready"] = True
+        await asyncio.Event().wait()
+    finally:
+        HEALTH["ready"] = False
+        await runner.cleanup()
+
+
+async def main():
+    bot = Bot(BOT_TOKEN)
+    bot.session.middleware(send_queue)
+    if METRICS_ENABLED:
+        bot.session.middleware(request_timer)       # после очереди: меряем сам вызов API
+    warm_keyboards()
+    if MIX_MAX_AREA != MIX_MAX_AREA_DEFAULT:
+        build_mix_tables(MIX_MAX_AREA)
+    if BOT_MODE == "webhook":
+        await run_webhook(bot)
+    else:
+        await run_polling(bot)
 
 
 if __name__ == "__main__":
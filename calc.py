@@ -0,0 +1,565 @@
+import re
+from math import gcd
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from layout import (
+    BOARD_LENGTH,
+    BOARD_WIDTH,
+    film_plan_summary,
+    plan_film_rolls,
+    plan_laminate,
+    plan_tiles,
+)
+
+
+# =========================
+# FIXED POINT
+# =========================
+# Площади считаются в целых мм², запас — в целых базисных пунктах (0.10 -> 1000),
+# поэтому 1.8 м² — это ровно 1 800 000, а не 1.7999999..., и ceil не добавляет лишнюю упаковку.
+AREA_SCALE = 1_000_000      # мм² в 1 м²
+RESERVE_SCALE = 10_000      # б.п. в 1.0
+MIX_MAX_AREA = 500          # м², до какой площади таблица смешанных упаковок даёт ответ за O(1)
+_POW10 = [10 ** i for i in range(10)]
+
+
+# =========================
+# PRODUCTS
+# =========================
+PRODUCTS: Dict[str, Dict[str, Any]] = {
+    "film_60x3": {
+        "title": "Плёнка 60×3 м (рулон)",
+        "pack_mm2": 600 * 3000,  # 1.8 м²
+        "pack_name": "рулон(ов)",
+        "roll_layout": True,     # в режиме поверхностей — раскрой по полосам 60 см
+    },
+    "panel_30x30_20": {
+        "title": "Панели 30×30 см (20 шт/уп)",
+        "pack_mm2": 300 * 300 * 20,  # 1.8 м²
+        "pack_name": "упаковок",
+        "tile_mm": (300, 300),   # в режиме поверхностей — раскладка сеткой с подрезкой краёв
+    },
+    "panel_30x60_auto": {
+        "title": "Панели 30×60 см (автоподбор 10 или 18 шт/уп)",
+        "auto_pick": True,
+        "tile_mm": (300, 600),
+        "variants": [
+            {"label": "10 шт/уп", "pack_mm2": 300 * 600 * 10, "pack_name": "упаковок"},
+            {"label": "18 шт/уп", "pack_mm2": 300 * 600 * 18, "pack_name": "упаковок"},
+        ],
+    },
+    "laminate": {
+        "title": "Ламинат 91.44×15.24 см",
+        "pack_mm2": 2_508_000,       # 2.508 м²/уп
+        "pack_name": "упаковок",
+        "waste_percent": 0.10,       # 10%
+        "waste_default_on": True,    # по умолчанию ВКЛ
+        "pack_boards": 18,           # досок в упаковке
+        "plank_layout": True,        # по размерам комнаты — запас по раскладке вместо 10%
+    },
+}
+
+# pack_area (м², float) — для вывода и внешнего кода; считается всё по pack_mm2
+for _p in PRODUCTS.values():
+    for _pack in _p.get("variants", [_p]):
+        _pack["pack_area"] = _pack["pack_mm2"] / AREA_SCALE
+
+
+# =========================
+# HELPERS
+# =========================
+def fmt(n: float) -> str:
+    return f"{n:.2f}".rstrip("0").rstrip(".")
+
+
+def money(n: float) -> str:
+    return f"{n:,.2f}".replace(",", " ") + " ₽"
+
+
+def parse_fixed(text: str, digits: int) -> int:
+    """
+    Десятичная строка -> целое в единицах 10**-digits, без float и Decimal.
+    Лишние знаки округляются половиной вверх. Принимает только цифры и одну точку/запятую
+    (никаких "1e3", "nan", "inf", "-5").
+    """
+    t = text.strip().replace(",", ".")
+    if t[:1] == "+":
+        t = t[1:]
+    whole, _, frac = t.partition(".")
+    d = whole + frac
+    if not (d.isdigit() and d.isascii()):
+        raise ValueError(text)
+    n = len(frac)
+    if n <= digits:
+        return int(d) * _POW10[digits - n]
+    return int(d[:len(whole) + digits]) + (frac[digits] >= "5")
+
+
+def parse_area_mm2(text: str) -> int:
+    v = parse_fixed(text, 6)
+    if v <= 0:
+        raise ValueError
+    return v
+
+
+def parse_float(text: str) -> float:
+    # до 6 знаков после точки — ровно то же число, что float(text)
+    return parse_area_mm2(text) / AREA_SCALE
+
+
+def parse_length_mm(text: str) -> int:
+    """
+    Поддержка:
+      - 1.2 / 0,8          -> метры
+      - 120 см / 120cm     -> сантиметры
+      - 120 (без единиц)   -> если >=10, считаем см; иначе м
+    Результат — целые миллиметры.
+    """
+    t = text.strip().lower().replace(" ", "")
+    is_cm = ("см" in t) or ("cm" in t)
+    t = t.replace("см", "").replace("cm", "")
+    val = parse_fixed(t, 3)          # тысячные доли введённого числа
+    if val <= 0:
+        raise ValueError
+    if is_cm or val >= 10_000:
+        return (val + 50) // 100     # см -> мм, половина вверх
+    return val
+
+
+def parse_length_to_m(text: str) -> float:
+    return parse_length_mm(text) / 1000
+
+
+DIM_SEPARATORS = ("×", "х", "*")      # и латинская x
+UNIT_MM = {"мм": 1, "mm": 1, "см": 10, "cm": 10, "м": 1000, "m": 1000}
+
+
+def parse_dims(text: str) -> Tuple[int, int]:
+    """
+    "4.2x3.1", "420×310 см", "4200*3100мм" -> (длина, ширина) в мм.
+    Единица в конце относится к обоим числам; без неё — как parse_length_mm (>=10 — см).
+    """
+    t = text.strip().lower().replace(" ", "")
+    unit = next((u for u in UNIT_MM if t.endswith(u)), None)
+    if unit:
+        t = t[:-len(unit)]
+    for sep in DIM_SEPARATORS:
+        t = t.replace(sep, "x")
+    parts = t.split("x")
+    if len(parts) != 2:
+        raise ValueError(text)
+    if unit is None:
+        return parse_length_mm(parts[0]), parse_length_mm(parts[1])
+    a, b = (parse_fixed(p, 3) * UNIT_MM[unit] for p in parts)
+    if a <= 0 or b <= 0:
+        raise ValueError(text)
+    return (a + 500) // 1000, (b + 500) // 1000
+
+
+# "Стол 120x60 x2", "Полка 80×30", "Дверца 40*70 см 1"
+_NUM = r"\d+(?:[.,]\d+)?"
+SURFACE_LINE = re.compile(
+    rf"(?P<name>.*?)\s*(?P<a>{_NUM})\s*[x×х*]\s*(?P<b>{_NUM})\s*(?P<unit>мм|mm|см|cm|м|m)?\.?"
+    rf"\s*(?:[x×х*]\s*(?P<sx>\d+)|(?P<s>\d+))?\s*",
+    re.IGNORECASE,
+)
+BULK_HINT = re.compile(r"\d\s*[x×х*]\s*\d", re.IGNORECASE)
+BULK_MAX_LINES = 100
+
+
+def looks_like_bulk(text: str) -> bool:
+    return bool(BULK_HINT.search(text))
+
+
+def parse_surfaces(text: str) -> Tuple[List[Tuple[str, float, float, int]], List[str]]:
+    """
+    Много поверхностей одним сообщением, по строке на каждую: название, размеры, стороны (1 по умолчанию).
+    Единицы — как в parse_dims. -> ([(название, длина см, ширина см, сторон)], ["строка N: ошибка"]).
+    """
+    rows: List[Tuple[str, float, float, int]] = []
+    errors: List[str] = []
+    for n, line in enumerate(text.splitlines(), 1):
+        line = line.strip().lstrip("•-–—").strip()
+        if not line:
+            continue
+        if len(rows) >= BULK_MAX_LINES:
+            errors.append(f"строка {n}: больше {BULK_MAX_LINES} поверхностей за раз — остальные пропущены")
+            break
+        m = SURFACE_LINE.fullmatch(line)
+        if m is None:
+            errors.append(f"строка {n}: не понял «{line}» — нужно так: Стол 120x60 x2")
+            continue
+        name = m["name"].strip(" :—-")
+        if not name:
+            errors.append(f"строка {n}: нет названия — «{line}»")
+            continue
+        sides = int(m["sx"] or m["s"] or 1)
+        if sides not in (1, 2):
+            errors.append(f"строка {n}: сторон может быть 1 или 2 — «{line}»")
+            continue
+        try:
+            a, b = parse_dims(f"{m['a']}x{m['b']}{m['unit'] or ''}")
+        except ValueError:
+            errors.append(f"строка {n}: размеры должны быть больше нуля — «{line}»")
+            continue
+        rows.append((name, a / 10, b / 10, sides))
+    return rows, errors
+
+
+def area_mm2(area: float) -> int:
+    # площадь из сессии (float) -> мм²; шум вроде 0.30000000000000004 уходит при округлении
+    return round(area * AREA_SCALE)
+
+
+def with_reserve(area_mm2: int, reserve_bp: int) -> int:
+    # результат в мм² × RESERVE_SCALE — без деления, поэтому точно
+    return area_mm2 * (RESERVE_SCALE + reserve_bp)
+
+
+def packs_needed(target: int, pack_mm2: int) -> int:
+    return -(-target // (pack_mm2 * RESERVE_SCALE))
+
+
+# Быстрый запрос «12.5 ламинат», «8 м2 панели 30x60 5%», «3,6 плёнка без запаса»
+PRODUCT_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "film_60x3": ("плёнк", "пленк", "film", "рулон"),
+    "panel_30x30_20": ("30x30", "30х30", "30×30", "30*30"),
+    "panel_30x60_auto": ("30x60", "30х60", "30×60", "30*60"),
+    "laminate": ("ламинат", "laminate"),
+}
+PANEL_WORDS = ("панел", "panel", "плитк")
+QUICK_RESERVE = re.compile(r"(\d+(?:[.,]\d+)?)\s*%")
+QUICK_AREA = re.compile(r"(?<![\d.,])(\d+(?:[.,]\d+)?)(?![\d.,%])")
+
+
+def parse_quick_query(text: str) -> Optional[Tuple[int, Tuple[str, ...], int]]:
+    """
+    -> (площадь мм², ключи товаров, запас б.п.) или None, если площади нет.
+    Товар не назван — все; «панели» без размера — обе панели. Запас по умолчанию 10%.
+    """
+    t = text.lower()
+    keys = []
+    for key, aliases in PRODUCT_ALIASES.items():
+        for a in aliases:
+            if a in t:
+                keys.append(key)
+                t = t.replace(a, " ")
+    if not any(k.startswith("panel") for k in keys) and any(w in t for w in PANEL_WORDS):
+        keys += [k for k in PRODUCTS if k.startswith("panel")]
+
+    reserve_bp = 1000
+    m = QUICK_RESERVE.search(t)
+    if m:
+        reserve_bp = min(parse_fixed(m.group(1), 4) // 100, RESERVE_SCALE // 2)   # не больше 50%
+        t = t[:m.start()] + t[m.end():]
+    elif "без запас" in t:
+        reserve_bp = 0
+
+    m = QUICK_AREA.search(t)
+    if m is None:
+        return None
+    try:
+        area = parse_area_mm2(m.group(1))
+    except ValueError:
+        return None
+    return area, tuple(k for k in PRODUCTS if k in keys) or tuple(PRODUCTS), reserve_bp
+
+
+# =========================
+# СМЕШАННЫЕ УПАКОВКИ
+# =========================
+class PackMix:
+    """
+    Лучший набор упаковок разных вариантов (например, 2×18 шт + 1×10 шт) для любой площади.
+    Все размеры упаковок кратны общему шагу unit (НОД), поэтому задача — целочисленный рюкзак
+    по числу шагов. Таблица считается один раз; дальше ответ — индекс в списке.
+    Критерий: меньше лишнего покрытия, при равенстве — меньше упаковок;
+    если заданы цены — дешевле, при равенстве — меньше лишнего.
+    """
+    __slots__ = ("packs", "unit", "limit", "table")
+
+    def __init__(self, packs: List[int], max_mm2: int, costs: Optional[List[int]] = None) -> None:
+        self.packs = packs
+        self.unit = 0
+        for p in packs:
+            self.unit = gcd(self.unit, p)
+        sizes = [p // self.unit for p in packs]
+        # Не меньше min × max шагов: это выше числа Фробениуса плюс самая крупная упаковка,
+        # так что остаток при доборе за таблицей (см. lookup) неотрицателен и собирается точно
+        self.limit = max(-(-max_mm2 // self.unit), min(sizes) * max(sizes))
+        top = self.limit + max(sizes)
+
+        # exact[m] — лучший набор ровно на m шагов: (ключ, количество по вариантам)
+        exact: List[Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]] = [None] * (top + 1)
+        exact[0] = ((0, 0), (0,) * len(packs))
+        for m in range(1, top + 1):
+            best = None
+            for i, s in enumerate(sizes):
+                prev = exact[m - s] if m >= s else None
+                if prev is None:
+                    continue
+                key = (prev[0][0] + (costs[i] if costs else 1), prev[0][1] + 1)
+                if best is None or key < best[0]:
+                    combo = list(prev[1])
+                    combo[i] += 1
+                    best = (key, tuple(combo))
+            exact[m] = best
+
+        # table[n] — лучший набор, покрывающий не меньше n шагов
+        self.table: List[Tuple[int, ...]] = [()] * (self.limit + 1)
+        chosen = None
+        for m in range(top, -1, -1):
+            cur = exact[m]
+            if cur is not None:
+                if costs is None or chosen is None or cur[0][0] <= chosen[0][0]:
+                    chosen = cur
+            if m <= self.limit:
+                self.table[m] = chosen[1]
+
+    def lookup(self, target: int) -> Tuple[int, ...]:
+        """target — площадь с запасом в единицах with_reserve; ответ — сколько упаковок каждого варианта."""
+        n = -(-target // (self.unit * RESERVE_SCALE))
+        if n <= self.limit:
+            return self.table[n]
+        # Дальше таблицы: добираем самой крупной упаковкой, остаток — из таблицы.
+        # За пределами числа Фробениуса любое кратное шага собирается точно, так что лишнего не больше.
+        big = max(range(len(self.packs)), key=self.packs.__getitem__)
+        step = self.packs[big] // self.unit
+        extra = -(-(n - self.limit) // step)
+        rest = n - extra * step
+        combo = list(self.table[rest]) if rest >= 0 else [0] * len(self.packs)
+        combo[big] += extra
+        return tuple(combo)
+
+
+MIX_TABLES: Dict[str, PackMix] = {}
+
+
+def build_mix_tables(max_area: float = MIX_MAX_AREA) -> None:
+    for key, p in PRODUCTS.items():
+        if p.get("variants"):
+            costs = [v["pack_price"] for v in p["variants"]] if all("pack_price" in v for v in p["variants"]) else None
+            MIX_TABLES[key] = PackMix([v["pack_mm2"] for v in p["variants"]], area_mm2(max_area), costs)
+
+
+build_mix_tables()
+
+
+# =========================
+# РАСЧЁТ
+# =========================
+def calc_counts_for_product(
+    product_key: str,
+    area: float,
+    reserve_percent: float,
+    surfaces: Optional[Iterable[Tuple[str, float, float, int]]] = None,
+    room: Optional[Tuple[float, float, List[Tuple[float, float]]]] = None,
+) -> Dict[str, Any]:
+    """
+    surfaces — (название, длина см, ширина см, сторон) из режима поверхностей, для раскроя плёнки;
+    room — (длина м, ширина м, [(ширина м, высота м) проёмов]), для раскладки ламината.
+    """
+    p = PRODUCTS[product_key]
+    target = with_reserve(area_mm2(area), round(reserve_percent * RESERVE_SCALE))
+    tiles = None
+    if p.get("tile_mm") and surfaces:
+        tiles = tiles_summary(plan_tiles(surfaces, p["tile_mm"]))
+        # по площади не видно, что каждый край — отдельная подрезанная панель
+        tiled = tiles["panels"] * p["tile_mm"][0] * p["tile_mm"][1] * RESERVE_SCALE
+        tiles["bound"] = tiled > target
+        target = max(target, tiled)
+    target_area = target / (AREA_SCALE * RESERVE_SCALE)
+
+    if p.get("auto_pick"):
+        variants = []
+        best = None
+        best_over = None
+        for v in p["variants"]:
+            cnt = packs_needed(target, v["pack_mm2"])
+            over = cnt * v["pack_mm2"] * RESERVE_SCALE - target
+            item = {
+                "label": v["label"],
+                "count": cnt,
+                "pack_name": v["pack_name"],
+                "covered": cnt * v["pack_mm2"] / AREA_SCALE,
+                "over": over / (AREA_SCALE * RESERVE_SCALE),
+            }
+            variants.append(item)
+            if best_over is None or over < best_over:
+                best_over = over
+                best = item
+        combo = MIX_TABLES[product_key].lookup(target)
+        mix_covered = sum(c * v["pack_mm2"] for c, v in zip(combo, p["variants"]))
+        mix = {
+            "items": [
+                {"label": v["label"], "count": c, "pack_name": v["pack_name"]}
+                for c, v in zip(combo, p["variants"]) if c
+            ],
+            "count": sum(combo),
+            "covered": mix_covered / AREA_SCALE,
+            "over": (mix_covered * RESERVE_SCALE - target) / (AREA_SCALE * RESERVE_SCALE),
+        }
+        result = {
+            "type": "auto_pick",
+            "title": p["title"],
+            "target_area": target_area,
+            "reserve_percent": reserve_percent,
+            "variants": variants,
+            "best": best,
+            "mix": mix,
+        }
+        if tiles:
+            result["tiles"] = tiles
+        return result
+
+    cnt = packs_needed(target, p["pack_mm2"])
+    result = {
+        "type": "single",
+        "title": p["title"],
+        "target_area": target_area,
+        "reserve_percent": reserve_percent,
+        "count": cnt,
+        "pack_name": p["pack_name"],
+        "covered": cnt * p["pack_mm2"] / AREA_SCALE,
+    }
+    if tiles:
+        result["tiles"] = tiles
+    if p.get("roll_layout") and surfaces:
+        plan = film_plan_summary(plan_film_rolls(surfaces))
+        result["cut_plan"] = plan
+        # полосы не стыкуются незаметно — по раскрою рулонов может понадобиться больше, чем по площади
+        if plan["rolls"] > cnt:
+            result["count"] = plan["rolls"]
+            result["covered"] = plan["rolls"] * p["pack_mm2"] / AREA_SCALE
+    if p.get("plank_layout") and room and reserve_percent > 0:
+        length_m, width_m, openings = room
+        plan = plan_laminate(
+            round(length_m * 1000), round(width_m * 1000),
+            [(round(w * 1000), round(h * 1000)) for w, h in openings],
+        )
+        cnt = -(-plan.boards // p["pack_boards"])
+        boards_area = plan.boards * BOARD_LENGTH * BOARD_WIDTH / 10 ** 8
+        result.update(
+            target_area=boards_area,
+            count=cnt,
+            covered=cnt * p["pack_mm2"] / AREA_SCALE,
+            layout={
+                "boards": plan.boards,
+                "cuts": plan.cuts,
+                "rows": plan.rows,
+                "offcuts": len(plan.offcuts),
+                # относительно площади к расчёту, чтобы строка «с запасом X%» сходилась
+                "waste": boards_area / area - 1 if area > 0 else plan.waste,
+            },
+        )
+    return result
+
+
+def tiles_summary(counts: List[Any]) -> Dict[str, Any]:
+    return {
+        "panels": sum(t.full + t.cut for t in counts),
+        "full": sum(t.full for t in counts),
+        "cut": sum(t.cut for t in counts),
+        "reused": sum(t.reused for t in counts),
+        "surfaces": [[t.name, t.full, t.cut, t.reused] for t in counts],
+    }
+
+
+def render_tiles(tiles: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"🔲 Раскладка панелей: {tiles['panels']} шт — целых {tiles['full']}, "
+        f"под подрезку {tiles['cut']}, краёв из обрезков {tiles['reused']}"
+    ]
+    for name, full, cut, reused in tiles["surfaces"][:CUT_PLAN_MAX_ROLLS]:
+        lines.append(f"• {name}: {full} целых + {cut} под подрезку" + (f" (из обрезков: {reused})" if reused else ""))
+    if len(tiles["surfaces"]) > CUT_PLAN_MAX_ROLLS:
+        lines.append(f"… и ещё {len(tiles['surfaces']) - CUT_PLAN_MAX_ROLLS}")
+    return lines
+
+
+CUT_PLAN_MAX_ROLLS = 10
+
+
+def render_cut_plan(plan: Dict[str, Any]) -> List[str]:
+    lines = [f"✂️ Раскрой по полосам 60 см: {plan['rolls']} рулон(ов)"]
+    for i, roll in enumerate(plan["plan"][:CUT_PLAN_MAX_ROLLS], 1):
+        cuts = "; ".join(
+            f"{fmt(length)} см: " + ", ".join(f"{name} {fmt(ln)}×{fmt(w)}" for name, ln, w in pieces)
+            for length, pieces in roll
+        )
+        lines.append(f"Рулон {i} — {cuts}")
+    if len(plan["plan"]) > CUT_PLAN_MAX_ROLLS:
+        lines.append(f"… и ещё {len(plan['plan']) - CUT_PLAN_MAX_ROLLS} рулон(ов)")
+    if plan["left_cm"] > 0:
+        lines.append(f"Целый остаток: {fmt(plan['left_cm'])} см рулона")
+    return lines
+
+
+def recommended_packs(counts: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """
+    Рекомендация: [(фасовка, сколько упаковок)] — одна на результат, её же показывают карточки,
+    сравнение и история (counts_summary). У single фасовка одна — метка пустая.
+    """
+    if counts["type"] == "single":
+        return [("", counts["count"])]
+    mix = counts.get("mix")
+    if mix and mix["items"]:
+        return [(i["label"], i["count"]) for i in mix["items"]]
+    # записи истории до смешанных упаковок
+    return [(counts["best"]["label"], counts["best"]["count"])]
+
+
+def render_counts(base_area: float, openings_area: float, net_area: float, counts: Dict[str, Any]) -> str:
+    rp = float(counts.get("reserve_percent", 0.10))
+    layout = counts.get("layout")
+    tiles = counts.get("tiles")
+    if tiles and tiles["bound"]:
+        reserve_line = f"По раскладке панелей: {fmt(counts['target_area'])} м²"
+    elif layout:
+        reserve_line = f"С запасом по раскладке {fmt(layout['waste'] * 100)}%: {fmt(counts['target_area'])} м²"
+    elif rp > 0:
+        reserve_line = f"С запасом {int(rp * 100)}%: {fmt(counts['target_area'])} м²"
+    else:
+        reserve_line = f"Без запаса: {fmt(counts['target_area'])} м²"
+
+    lines = [
+        "📊 Результат расчёта",
+        "",
+        f"📏 Площадь (введено): {fmt(base_area)} м²",
+        f"🪟 Проёмы: − {fmt(openings_area)} м²" if openings_area > 0 else "🪟 Проёмы: не вычитаются",
+        f"✅ Площадь к расчёту: {fmt(net_area)} м²",
+        f"🧮 {reserve_line}",
+        "",
+    ]
+
+    if counts["type"] == "single":
+        lines += [
+            f"🧱 {counts['title']}",
+            f"📦 Нужно: {counts['count']} {counts['pack_name']}",
+            f"Покрытие: ~ {fmt(counts['covered'])} м²",
+        ]
+        if layout:
+            lines.append(
+                f"🪵 Раскладка: {layout['rows']} рядов, {layout['boards']} досок, {layout['cuts']} резов, "
+                f"пригодных обрезков останется: {layout['offcuts']}"
+            )
+        if counts.get("cut_plan"):
+            lines += [""] + render_cut_plan(counts["cut_plan"])
+        if tiles:
+            lines += [""] + render_tiles(tiles)
+        return "\n".join(lines)
+
+    lines.append(f"🧱 {counts['title']}")
+    for v in counts["variants"]:
+        lines.append(f"• {v['label']}: {v['count']} упаковок (покроет ~ {fmt(v['covered'])} м²)")
+    packs = recommended_packs(counts)
+    if len(packs) > 1:
+        mix = counts["mix"]
+        parts = " + ".join(f"{count} × {label}" for label, count in packs)
+        lines += ["", f"✅ Рекомендация: {parts} — {mix['count']} упаковок (покроет ~ {fmt(mix['covered'])} м²)"]
+    else:
+        label, count = packs[0]
+        lines += ["", f"✅ Рекомендация: {label} — {count} упаковок"]
+    if tiles:
+        lines += [""] + render_tiles(tiles)
+    return "\n".join(lines)
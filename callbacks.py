@@ -0,0 +1,160 @@
+from typing import Any, Callable, Dict, Iterable, Literal, Optional, Type, Union
+
+from pydantic import Field
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+
+# =========================
+# CALLBACK DATA
+# =========================
+# Строки на кнопках совпадают со старыми ("calc:laminate", "opening_preset:door:0.8:2.0", ...),
+# поэтому кнопки в уже отправленных сообщениях продолжают работать.
+OpeningKind = Literal["door", "window"]
+
+
+class ProductCb(CallbackData, prefix="calc"):
+    key: str
+
+
+class BackCb(CallbackData, prefix="back"):
+    to: Literal["products"]
+
+
+class ModeCb(CallbackData, prefix="mode"):
+    mode: Literal["total", "surfaces"]
+
+
+class WasteCb(CallbackData, prefix="waste"):
+    action: Literal["toggle", "continue"]
+
+
+class SidesCb(CallbackData, prefix="sides"):
+    n: int = Field(ge=1, le=2)
+
+
+class SurfaceCb(CallbackData, prefix="surface"):
+    action: Literal["add", "clear", "finish"]
+
+
+class OpeningsCb(CallbackData, prefix="openings"):
+    answer: Literal["yes", "no"]
+
+
+class OpeningTypeCb(CallbackData, prefix="opening_type"):
+    kind: OpeningKind
+
+
+class OpeningPresetCb(CallbackData, prefix="opening_preset"):
+    kind: OpeningKind
+    w: float = Field(gt=0, le=10)
+    h: float = Field(gt=0, le=10)
+
+
+class OpeningManualCb(CallbackData, prefix="opening_manual"):
+    kind: OpeningKind
+
+
+class OpeningCb(CallbackData, prefix="opening"):
+    action: Literal["finish", "clear", "back_to_type"]
+
+
+class PriceCb(CallbackData, prefix="price"):
+    answer: Literal["yes", "no"]
+
+
+class CompareCb(CallbackData, prefix="compare"):
+    # Площадь (мм²) и запас (б.п.) едут в самой кнопке: сравнение работает и после сброса сессии
+    area: int = Field(gt=0)
+    reserve: int = Field(ge=0, le=10_000)
+    key: str = ""
+
+
+class RepeatCb(CallbackData, prefix="repeat"):
+    at: int = Field(gt=0)       # время расчёта в мс — ключ записи в истории пользователя
+
+
+BACK_PRODUCTS = BackCb(to="products")
+MODE_TOTAL = ModeCb(mode="total")
+MODE_SURFACES = ModeCb(mode="surfaces")
+WASTE_TOGGLE = WasteCb(action="toggle")
+WASTE_CONTINUE = WasteCb(action="continue")
+SURFACE_ADD = SurfaceCb(action="add")
+SURFACE_CLEAR = SurfaceCb(action="clear")
+SURFACE_FINISH = SurfaceCb(action="finish")
+OPENINGS_YES = OpeningsCb(answer="yes")
+OPENINGS_NO = OpeningsCb(answer="no")
+OPENING_FINISH = OpeningCb(action="finish")
+OPENING_CLEAR = OpeningCb(action="clear")
+OPENING_BACK_TO_TYPE = OpeningCb(action="back_to_type")
+PRICE_YES = PriceCb(answer="yes")
+PRICE_NO = PriceCb(answer="no")
+
+
+# =========================
+# ROUTER
+# =========================
+class Route:
+    __slots__ = ("handler", "factory", "states")
+
+    def __init__(self, handler: Callable, factory: Optional[Type[CallbackData]], states: Iterable[State]) -> None:
+        self.handler = CallableObject(handler)
+        self.factory = factory
+        self.states = frozenset(s.state for s in states)
+
+    @property
+    def name(self) -> str:
+        return self.handler.callback.__name__
+
+
+class CallbackRouter:
+    """
+    Все callback-кнопки бота через один хендлер aiogram.
+    Кнопки без параметров ищутся по полной строке, с параметрами — по префиксу;
+    и то и другое — один поиск в dict вместо перебора фильтров.
+    Данные разбираются и валидируются один раз и приходят в хендлер как callback_data.
+    """
+
+    def __init__(self) -> None:
+        self.exact: Dict[str, Route] = {}
+        self.by_prefix: Dict[str, Route] = {}
+
+    def route(self, target: Union[CallbackData, Type[CallbackData]], *states: State):
+        def decorator(handler: Callable) -> Callable:
+            if isinstance(target, CallbackData):
+                self.exact[target.pack()] = Route(handler, None, states)
+            else:
+                self.by_prefix[target.__prefix__] = Route(handler, target, states)
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Route]:
+        route = self.exact.get(data)
+        if route is None:
+            route = self.by_prefix.get(data.partition(":")[0])
+        return route
+
+    async def dispatch(self, callback: CallbackQuery, **kwargs: Any) -> Any:
+        data = callback.data or ""
+        route = self.resolve(data)
+        if route is None:
+            return UNHANDLED
+
+        callback_data = None
+        if route.factory is not None:
+            try:
+                callback_data = route.factory.unpack(data)
+            except (TypeError, ValueError):
+                await callback.answer("Кнопка устарела или повреждена. Начните заново: /start", show_alert=True)
+                return None
+
+        # Кнопка из другого шага сценария (например, старое сообщение) — просто гасим «часики»
+        if route.states and kwargs.get("raw_state") not in route.states:
+            await callback.answer()
+            return None
+
+        return await route.handler.call(callback, callback_data=callback_data, **kwargs)
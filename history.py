@@ -0,0 +1,203 @@
+"""
+История расчётов по пользователям: SQLite только на добавление (WAL).
+
+Строка компактная: числа — целыми (время в мс, площади в мм², запас в б.п.),
+всё остальное (counts, поверхности, размеры комнаты) — одним zlib-сжатым JSON.
+Индекс (user_id, at) — и для «последних N», и для поиска по времени из кнопки.
+
+record() только кладёт строку в память; на диск пишет фоновая задача пачками
+(раз в flush_interval секунд или сразу при batch_size строк) в одном рабочем потоке,
+поэтому запись в историю не добавляет задержки к ответу с расчётом. Если пачка
+не записалась (диск, блокировка), она возвращается в очередь и уходит со следующей.
+"""
+import time
+import zlib
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from calc import AREA_SCALE, RESERVE_SCALE
+from storage import dump_data, load_data
+
+Row = Tuple[int, int, str, int, int, int, bytes]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HistoryEntry:
+    __slots__ = ("at", "product_key", "base_area", "openings_area", "reserve_percent", "counts", "surfaces", "room")
+    at: int                      # мс с начала эпохи — он же id записи в кнопке «повторить»
+    product_key: str
+    base_area: float
+    openings_area: float
+    reserve_percent: float
+    counts: Dict[str, Any]
+    surfaces: List[Any]
+    room: Optional[Any]
+
+    @property
+    def net_area(self) -> float:
+        return max(self.base_area - self.openings_area, 0.0)
+
+    def to_row(self, user_id: int) -> Row:
+        payload = dump_data({"c": self.counts, "s": self.surfaces, "r": self.room})
+        return (
+            user_id,
+            self.at,
+            self.product_key,
+            round(self.base_area * AREA_SCALE),
+            round(self.openings_area * AREA_SCALE),
+            round(self.reserve_percent * RESERVE_SCALE),
+            zlib.compress(payload.encode("utf-8")),
+        )
+
+    @classmethod
+    def from_row(cls, row: Row) -> "HistoryEntry":
+        _, at, product_key, base_mm2, openings_mm2, reserve_bp, blob = row
+        payload = load_data(zlib.decompress(blob).decode("utf-8"))
+        return cls(
+            at,
+            product_key,
+            base_mm2 / AREA_SCALE,
+            openings_mm2 / AREA_SCALE,
+            reserve_bp / RESERVE_SCALE,
+            payload["c"],
+            payload["s"],
+            payload["r"],
+        )
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class HistoryStore:
+    COLUMNS = "user_id, at, product, base_mm2, openings_mm2, reserve_bp, payload"
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 500) -> None:
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[int, HistoryEntry]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " user_id INTEGER NOT NULL,"
+                " at INTEGER NOT NULL,"
+                " product TEXT NOT NULL,"
+                " base_mm2 INTEGER NOT NULL,"
+                " openings_mm2 INTEGER NOT NULL,"
+                " reserve_bp INTEGER NOT NULL,"
+                " payload BLOB NOT NULL"
+                ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS history_user_at ON history (user_id, at)")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        if self._executor is None:       # после close() (остановка polling) хранилище можно открыть снова
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-sqlite")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # ---------- запись ----------
+    def record(self, user_id: int, entry: HistoryEntry) -> None:
+        """Без ожидания и без I/O: строка уйдёт на диск со следующей пачкой."""
+        self._pending.append((user_id, entry))
+        self.recorded += 1
+        if self._full is not None and len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    def _insert(self, pending: List[Tuple[int, HistoryEntry]]) -> None:
+        rows = [entry.to_row(user_id) for user_id, entry in pending]     # JSON и zlib — тоже в рабочем потоке
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(f"INSERT INTO history ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        # Задача встаёт в очередь рабочего потока сразу — чтения, пришедшие позже, увидят эти строки
+        try:
+            await self._run(self._insert, pending)
+        except Exception:
+            # Транзакция откатилась — пачку обратно в начало очереди, перед записанным после неё.
+            # Отмену (CancelledError) не ловим: поток мог уже закоммитить пачку.
+            self._pending = pending + self._pending
+            self.flush_errors += 1
+            raise
+        self.flushes += 1
+
+    async def _flush_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("history: пачка не записана, в очереди %d строк, повтор через %.1f с",
+                                 len(self._pending), self.flush_interval)
+                await asyncio.sleep(self.flush_interval)   # не крутиться, пока record() дёргает _full
+
+    async def start_flusher(self) -> None:
+        if self._flusher is None:
+            self._full = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_forever())
+
+    # ---------- чтение ----------
+    def _select(self, sql: str, args: tuple) -> List[HistoryEntry]:
+        rows = self._connect().execute(f"SELECT {self.COLUMNS} FROM history WHERE {sql}", args).fetchall()
+        return [HistoryEntry.from_row(row) for row in rows]
+
+    async def recent(self, user_id: int, limit: int = 10) -> List[HistoryEntry]:
+        """Последние расчёты пользователя, новые первыми (включая ещё не записанные на диск)."""
+        fresh = [e for uid, e in reversed(self._pending) if uid == user_id][:limit]
+        if len(fresh) < limit:
+            fresh += await self._run(
+                self._select, "user_id = ? ORDER BY at DESC LIMIT ?", (user_id, limit - len(fresh))
+            )
+        return fresh
+
+    async def find(self, user_id: int, at: int) -> Optional[HistoryEntry]:
+        for uid, entry in self._pending:
+            if uid == user_id and entry.at == at:
+                return entry
+        found = await self._run(self._select, "user_id = ? AND at = ?", (user_id, at))
+        return found[0] if found else None
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
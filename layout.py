@@ -0,0 +1,482 @@
+"""
+Раскладка материала по реальным размерам поверхностей (а не «площадь ÷ упаковка»).
+Все размеры — целые миллиметры.
+"""
+import time
+import random
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# =========================
+# ПЛЁНКА 60×300 см
+# =========================
+ROLL_WIDTH_MM = 600
+ROLL_LENGTH_MM = 3000
+FILM_BUDGET_MS = 2.0
+FILM_STALE_TRIALS = 20         # перестановок подряд без улучшения — дальше не ищем
+
+
+@dataclass
+class Piece:
+    __slots__ = ("name", "length", "width")
+    name: str
+    length: int   # вдоль рулона
+    width: int    # поперёк рулона, <= ROLL_WIDTH_MM
+
+
+@dataclass
+class Column:
+    """Полоса внутри отреза: куски шириной не больше width идут друг за другом по длине."""
+    __slots__ = ("width", "free_length", "pieces")
+    width: int
+    free_length: int
+    pieces: List[Piece]
+
+
+@dataclass
+class Shelf:
+    """Поперечный отрез рулона длиной length; полосы в нём лежат рядом по ширине."""
+    __slots__ = ("length", "free_width", "columns")
+    length: int
+    free_width: int
+    columns: List[Column]
+
+    @property
+    def pieces(self) -> List[Piece]:
+        return [p for c in self.columns for p in c.pieces]
+
+
+@dataclass
+class Roll:
+    __slots__ = ("free_length", "shelves")
+    free_length: int
+    shelves: List[Shelf]
+
+
+def _strips(name: str, length: int, width: int) -> List[Piece]:
+    """Полосы вдоль length: по ширине — по 60 см, по длине — не больше рулона."""
+    pieces = []
+    across = -(-width // ROLL_WIDTH_MM)
+    along = -(-length // ROLL_LENGTH_MM)
+    for i in range(across):
+        w = min(ROLL_WIDTH_MM, width - i * ROLL_WIDTH_MM)
+        for j in range(along):
+            ln = min(ROLL_LENGTH_MM, length - j * ROLL_LENGTH_MM)
+            pieces.append(Piece(name, ln, w))
+    if len(pieces) > 1:
+        for k, p in enumerate(pieces, 1):
+            p.name = f"{name} ({k}/{len(pieces)})"
+    return pieces
+
+
+def film_pieces(surfaces: Iterable[Tuple[str, float, float, int]]) -> List[Piece]:
+    """
+    (название, длина см, ширина см, сторон) -> куски плёнки.
+    Направление полос выбирается так, чтобы было меньше стыков, при равенстве — меньше расход длины.
+    """
+    pieces: List[Piece] = []
+    for name, length_cm, width_cm, sides in surfaces:
+        a, b = round(length_cm * 10), round(width_cm * 10)
+        options = [_strips(name, a, b), _strips(name, b, a)]
+        best = min(options, key=lambda ps: (len(ps), sum(p.length for p in ps)))
+        for side in range(sides):
+            suffix = f", сторона {side + 1}" if sides > 1 else ""
+            pieces += [Piece(p.name + suffix, p.length, p.width) for p in best]
+    return pieces
+
+
+def _place(rolls: List[Roll], piece: Piece) -> None:
+    for roll in rolls:
+        for shelf in roll.shelves:
+            if shelf.length < piece.length:
+                continue
+            for col in shelf.columns:
+                if col.width >= piece.width and col.free_length >= piece.length:
+                    col.pieces.append(piece)
+                    col.free_length -= piece.length
+                    return
+            if shelf.free_width >= piece.width:
+                shelf.columns.append(Column(piece.width, shelf.length - piece.length, [piece]))
+                shelf.free_width -= piece.width
+                return
+    for roll in rolls:
+        if roll.free_length >= piece.length:
+            break
+    else:
+        roll = Roll(ROLL_LENGTH_MM, [])
+        rolls.append(roll)
+    roll.shelves.append(Shelf(piece.length, ROLL_WIDTH_MM - piece.width, [Column(piece.width, 0, [piece])]))
+    roll.free_length -= piece.length
+
+
+def _copy(roll: Roll) -> Roll:
+    return Roll(roll.free_length, [
+        Shelf(s.length, s.free_width, [Column(c.width, c.free_length, list(c.pieces)) for c in s.columns])
+        for s in roll.shelves
+    ])
+
+
+def _first_fit_decreasing(pieces: List[Piece], key, deadline: Optional[float] = None) -> Optional[List[Roll]]:
+    """key=None — куски уже в нужном порядке. None — не успели до deadline (perf_counter)."""
+    rolls: List[Roll] = []
+    for p in (pieces if key is None else sorted(pieces, key=key)):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        _place(rolls, p)
+    return rolls
+
+
+def _score(rolls: List[Roll]) -> Tuple[int, int]:
+    # меньше рулонов, затем — больше непочатого остатка на самом пустом рулоне
+    return len(rolls), -max((r.free_length for r in rolls), default=0)
+
+
+def _lower_bound(pieces: List[Piece]) -> int:
+    """Меньше рулонов не бывает: по площади и по длине полос шире половины рулона (рядом не лягут)."""
+    by_area = -(-sum(p.length * p.width for p in pieces) // (ROLL_LENGTH_MM * ROLL_WIDTH_MM))
+    by_wide = -(-sum(p.length for p in pieces if 2 * p.width > ROLL_WIDTH_MM) // ROLL_LENGTH_MM)
+    return max(by_area, by_wide)
+
+
+def _drain_emptiest(rolls: List[Roll], deadline: float) -> Optional[List[Roll]]:
+    """Пробует разложить куски самого пустого рулона по остальным; None — не вышло или не успели."""
+    if len(rolls) < 2:
+        return None
+    victim = max(range(len(rolls)), key=lambda i: rolls[i].free_length)
+    rest = [_copy(r) for i, r in enumerate(rolls) if i != victim]
+    n = len(rest)
+    for shelf in rolls[victim].shelves:
+        for p in sorted(shelf.pieces, key=lambda p: (-p.length, -p.width)):
+            if time.perf_counter() > deadline:
+                return None
+            _place(rest, p)
+            if len(rest) > n:
+                return None
+    return rest
+
+
+SORT_KEYS = (
+    lambda p: (-p.length, -p.width),
+    lambda p: (-p.width, -p.length),
+    lambda p: (-p.length * p.width, -p.length),
+)
+
+
+def plan_film_rolls(
+    surfaces: Iterable[Tuple[str, float, float, int]],
+    budget_ms: float = FILM_BUDGET_MS,
+) -> List[Roll]:
+    """
+    Раскрой поверхностей по рулонам 60×300 см.
+    First-fit-decreasing по нескольким порядкам сортировки; потом, пока есть время, —
+    попытки освободить самый пустой рулон и повторы FFD с перестановкой соседних кусков
+    (детерминированно, seed фиксирован). Первый проход делается всегда и целиком;
+    каждый следующий проверяет дедлайн на каждом куске и, не успев, бросается —
+    остаётся лучший план из законченных. План, дошедший до нижней оценки (_lower_bound),
+    не улучшить — на нём останавливаемся сразу; после FILM_STALE_TRIALS перестановок
+    без улучшения — тоже, не дожидаясь дедлайна.
+    """
+    started = time.perf_counter()
+    pieces = film_pieces(surfaces)
+    bound = _lower_bound(pieces)
+    best = _first_fit_decreasing(pieces, SORT_KEYS[0])
+    # Дедлайн проверяется перед куском, а копия всех рулонов в _drain_emptiest не прерывается
+    # и стоит около шестой части первого прохода — запас на это, чтобы не выходить за бюджет
+    deadline = started + budget_ms / 1000 - (time.perf_counter() - started) / 4
+    for key in SORT_KEYS[1:]:
+        if len(best) <= bound:
+            return best
+        rolls = _first_fit_decreasing(pieces, key, deadline)
+        if rolls is None:
+            return best
+        if _score(rolls) < _score(best):
+            best = rolls
+
+    rnd = random.Random(len(pieces))
+    order = sorted(pieces, key=SORT_KEYS[0])
+    drain, stale = True, 0
+    while len(best) > bound and stale < FILM_STALE_TRIALS and time.perf_counter() < deadline:
+        if drain:       # тот же план второй раз не разгрузить
+            drained = _drain_emptiest(best, deadline)
+            if drained is not None:
+                best, stale = drained, 0
+                continue
+            drain = False
+        if len(order) < 2:
+            break
+        trial = list(order)
+        for _ in range(max(1, len(trial) // 10)):
+            i = rnd.randrange(len(trial) - 1)
+            trial[i], trial[i + 1] = trial[i + 1], trial[i]
+        rolls = _first_fit_decreasing(trial, None, deadline)
+        if rolls is not None and _score(rolls) < _score(best):
+            best, order, drain, stale = rolls, trial, True, 0
+        else:
+            stale += 1
+    return best
+
+
+def film_plan_summary(rolls: List[Roll]) -> Dict[str, Any]:
+    """
+    Компактный вид для сессии и вывода: по рулону — отрезы [длина, [куски]], размеры в см.
+    left_cm — самый длинный нетронутый остаток рулона.
+    """
+    return {
+        "rolls": len(rolls),
+        "left_cm": max((r.free_length for r in rolls), default=0) / 10,
+        "plan": [
+            [[s.length / 10, [[p.name, p.length / 10, p.width / 10] for p in s.pieces]] for s in r.shelves]
+            for r in rolls
+        ],
+    }
+
+
+# =========================
+# ЛАМИНАТ 91.44×15.24 см
+# =========================
+# Внутри — десятые доли миллиметра, чтобы размеры доски были целыми.
+BOARD_LENGTH = 9144
+BOARD_WIDTH = 1524
+MIN_PIECE = 3000          # обрезок короче 30 см в дело не идёт
+MIN_STAGGER = 3000        # стыки соседних рядов — не ближе 30 см
+
+
+@dataclass
+class PlankPlan:
+    __slots__ = ("boards", "cuts", "rows", "offcuts", "covered", "waste")
+    boards: int
+    cuts: int
+    rows: int
+    offcuts: List[int]    # что осталось пригодного, мм
+    covered: int          # мм² к укладке (комната минус проёмы)
+    waste: float          # доля сверх covered: 0.07 = 7%
+
+
+def _staggered(start: int, prev: int) -> bool:
+    off = (start - prev) % BOARD_LENGTH
+    return MIN_STAGGER <= off <= BOARD_LENGTH - MIN_STAGGER
+
+
+def _row_lengths(length: int, width: int, openings: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    (длина ряда, ширина ряда). Где проёмы стоят, не знаем, поэтому ставим их друг за другом
+    в конец рядов начиная с первого (не влезают — новым столбиком рядом): ряд, закрытый
+    проёмом по всей ширине, короче;
+    задетый частично — кладётся целиком (доску подрезают по месту).
+    """
+    rows = -(-width // BOARD_WIDTH)
+    out = [[length, min(BOARD_WIDTH, width - i * BOARD_WIDTH)] for i in range(rows)]
+    y = 0
+    for w, h in openings:
+        if y + h > width:
+            y = 0                 # не влез по ширине — следующий «столбик» проёмов
+        top = min(y + h, width)
+        for i in range(y // BOARD_WIDTH, rows):
+            lo, hi = i * BOARD_WIDTH, i * BOARD_WIDTH + out[i][1]
+            if lo >= top:
+                break
+            if lo >= y and hi <= top:
+                out[i][0] = max(0, out[i][0] - w)
+        y = top
+    return [(ln, w) for ln, w in out if ln > 0]
+
+
+def plan_laminate(length_mm: int, width_mm: int, openings_mm: Iterable[Tuple[int, int]] = ()) -> PlankPlan:
+    """
+    Укладка ряд за рядом вдоль длинной стороны. Ряд начинается обрезком с конца прошлого
+    ряда (или другим из запаса), если стыки разнесены; иначе — новой доской, при
+    необходимости укороченной на треть. Концовка ряда — самый короткий подходящий
+    обрезок, иначе новая доска. Последний ряд распускается по ширине.
+    """
+    length, width = max(length_mm, width_mm) * 10, min(length_mm, width_mm) * 10
+    openings = [(w * 10, h * 10) for w, h in openings_mm]
+    pool: List[int] = []          # пригодные обрезки, по возрастанию
+    boards = cuts = 0
+    prev_start = None
+
+    def keep(piece: int) -> None:
+        if piece >= MIN_PIECE:
+            insort(pool, piece)
+
+    rows = _row_lengths(length, width, openings)
+    for row_len, row_w in rows:
+        if row_w < BOARD_WIDTH:
+            cuts += 1             # роспуск вдоль: считаем один рез на ряд (пила ведётся по всем доскам)
+
+        # начало ряда
+        start = None
+        for i in range(len(pool) - 1, -1, -1):
+            if prev_start is None or pool[i] >= row_len or _staggered(pool[i], prev_start):
+                start = pool.pop(i)
+                break
+        if start is None:
+            boards += 1
+            start = BOARD_LENGTH
+            if prev_start is not None and not _staggered(start, prev_start):
+                start = (prev_start + BOARD_LENGTH // 3) % BOARD_LENGTH
+                if start < MIN_PIECE:
+                    start += BOARD_LENGTH // 3
+                cuts += 1
+                keep(BOARD_LENGTH - start)
+        if start >= row_len:
+            if start > row_len:
+                cuts += 1
+                keep(start - row_len)
+            prev_start = None     # ряд из одного куска — стыков нет, следующему ряду подходит любой
+            continue
+        prev_start = start
+
+        # целые доски и концовка
+        pos = start + (row_len - start) // BOARD_LENGTH * BOARD_LENGTH
+        boards += (row_len - start) // BOARD_LENGTH
+        rest = row_len - pos
+        if rest:
+            i = bisect_left(pool, rest)
+            if i < len(pool):
+                piece = pool.pop(i)
+            else:
+                boards += 1
+                piece = BOARD_LENGTH
+            if piece > rest:
+                cuts += 1
+                keep(piece - rest)
+
+    covered = sum(ln * w for ln, w in rows)
+    used = boards * BOARD_LENGTH * BOARD_WIDTH
+    return PlankPlan(
+        boards=boards,
+        cuts=cuts,
+        rows=len(rows),
+        offcuts=[p // 10 for p in reversed(pool)],
+        covered=covered // 100,
+        waste=used / covered - 1 if covered else 0.0,
+    )
+
+
+# =========================
+# ПАНЕЛИ 30×30 / 30×60 см
+# =========================
+TILE_MIN_OFFCUT = 20      # мм; полоска уже 2 см — в отход
+
+
+def _cut_table(size: int) -> Tuple[List[int], List[int]]:
+    """Для полосы шириной r из панели размером size: сколько полос выйдет и сколько останется."""
+    per = [0] * (size + 1)
+    left = [0] * (size + 1)
+    for r in range(1, size + 1):
+        per[r], left[r] = divmod(size, r)
+    return per, left
+
+
+CUT_TABLES: Dict[int, Tuple[List[int], List[int]]] = {s: _cut_table(s) for s in (300, 600)}
+
+
+@dataclass
+class TileCount:
+    __slots__ = ("name", "full", "cut", "reused")
+    name: str
+    full: int      # целых панелей
+    cut: int       # панелей, распиленных под края
+    reused: int    # краевых кусков, взятых из обрезков
+
+
+class OffcutPool:
+    """Обрезки-полоски: по длине полосы (сторона панели) — отсортированные ширины."""
+    __slots__ = ("strips",)
+
+    def __init__(self) -> None:
+        self.strips: Dict[int, List[int]] = {}
+
+    def put(self, length: int, width: int, n: int = 1) -> None:
+        if width >= TILE_MIN_OFFCUT and n > 0:
+            row = self.strips.setdefault(length, [])
+            for _ in range(n):
+                insort(row, width)
+
+    def take(self, length: int, width: int) -> Optional[int]:
+        row = self.strips.get(length)
+        if not row:
+            return None
+        i = bisect_left(row, width)
+        return row.pop(i) if i < len(row) else None
+
+    def __len__(self) -> int:
+        return sum(map(len, self.strips.values()))
+
+
+def _edge(pool: OffcutPool, n: int, r: int, size: int, length: int) -> Tuple[int, int]:
+    """
+    n краевых полос шириной r и длиной length (поперёк — сторона панели size).
+    Сначала из обрезков, потом из новых панелей. -> (новых панелей, кусков из обрезков).
+    """
+    reused = 0
+    while n:
+        x = pool.take(length, r)
+        if x is None:
+            break
+        k = min(n, x // r)
+        n -= k
+        reused += k
+        pool.put(length, x - k * r)
+    if not n:
+        return 0, reused
+    per, left = CUT_TABLES[size]
+    tiles = -(-n // per[r])
+    pool.put(length, r, tiles * per[r] - n)
+    pool.put(length, left[r], tiles)
+    return tiles, reused
+
+
+def _corner(pool: OffcutPool, rl: int, rw: int, a: int, b: int) -> Tuple[int, int]:
+    # уголок rl×rw — из любой полоски, длина которой не меньше rw
+    for length in (b, a):
+        if length >= rw and pool.take(length, rl) is not None:
+            return 0, 1
+    pool.put(b, a - rl)
+    return 1, 0
+
+
+def _tile_estimate(length: int, width: int, a: int, b: int) -> int:
+    nl, rl = divmod(length, a)
+    nw, rw = divmod(width, b)
+    per_l, per_w = CUT_TABLES[a][0], CUT_TABLES[b][0]
+    edges = (-(-nw // per_l[rl]) if rl else 0) + (-(-nl // per_w[rw]) if rw else 0)
+    return nl * nw + edges + (1 if rl and rw else 0)
+
+
+def plan_tiles(
+    surfaces: Iterable[Tuple[str, float, float, int]],
+    tile: Tuple[int, int],
+    pool: Optional[OffcutPool] = None,
+) -> List[TileCount]:
+    """
+    Раскладка панелей tile (мм) сеткой от угла каждой поверхности. Краевые куски режутся
+    из панелей по таблице CUT_TABLES, лишние полоски копятся в общем запасе обрезков
+    и идут на края следующих поверхностей. Прямоугольную панель кладём той стороной,
+    при которой панелей меньше.
+    """
+    pool = OffcutPool() if pool is None else pool
+    out = []
+    for name, length_cm, width_cm, sides in surfaces:
+        length, width = round(length_cm * 10), round(width_cm * 10)
+        a, b = tile
+        if a != b and _tile_estimate(length, width, b, a) < _tile_estimate(length, width, a, b):
+            a, b = b, a
+        nl, rl = divmod(length, a)
+        nw, rw = divmod(width, b)
+        for side in range(sides):
+            cut = reused = 0
+            if rl:
+                t, u = _edge(pool, nw, rl, a, b)
+                cut, reused = cut + t, reused + u
+            if rw:
+                t, u = _edge(pool, nl, rw, b, a)
+                cut, reused = cut + t, reused + u
+            if rl and rw:
+                t, u = _corner(pool, rl, rw, a, b)
+                cut, reused = cut + t, reused + u
+            suffix = f", сторона {side + 1}" if sides > 1 else ""
+            out.append(TileCount(name + suffix, nl * nw, cut, reused))
+    return out
@@ -0,0 +1,178 @@
+"""
+Метрики в текстовом формате Prometheus (exposition 0.0.4) — без внешних зависимостей.
+
+Всё пишется из одного event loop, поэтому замки не нужны: observe() — это поиск серии
+в dict по кортежу меток, bisect по границам корзин и два сложения. Накопленные суммы
+по корзинам считаются только при выдаче /metrics.
+
+Тут же middleware aiogram, которые засекают время:
+- UpdateTimer (outer на update, перед ограничителем и FSM) — весь апдейт; момент получения
+  кладётся в contextvar, по нему since_update() меряет «от апдейта до ответа»;
+- RequestTimer (request-middleware сессии, после SendQueue) — сам вызов Bot API
+  без ожидания в очереди, и ошибки по методам.
+"""
+import time
+import contextvars
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import Update
+
+# Секунды: от долей миллисекунды (хендлер без I/O) до секунд (ответ, ждавший очередь отправки)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in self.values.items()]
+
+
+class _Series:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size        # по корзинам, не накопленные; последняя — выше всех границ
+        self.sum = 0.0
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Labels = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.bounds = tuple(sorted(buckets))
+        self.series: Dict[Labels, _Series] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = _Series(len(self.bounds) + 1)
+        series.counts[bisect_left(self.bounds, value)] += 1     # le — включительно
+        series.sum += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in self.series.items():
+            total = 0
+            for bound, n in zip(self.bounds + (float("inf"),), series.counts):
+                total += n
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_num(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {total}")
+            suffix = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_num(series.sum)}")
+            lines.append(f"{self.name}_count{suffix} {total}")
+        return lines
+
+
+class Gauge:
+    """Значение снимается функцией в момент выдачи — для того, что уже считается в HEALTH и stats()."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]) -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_num(self.read())}"]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, labelnames: Labels = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Labels = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        return self._add(Gauge(name, help, read))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines += m.samples()
+        return "\n".join(lines) + "\n"
+
+
+# =========================
+# ТАЙМЕРЫ ДЛЯ AIOGRAM
+# =========================
+_received: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("update_received", default=None)
+
+
+def since_update() -> Optional[float]:
+    """Секунды с момента, когда UpdateTimer получил текущий апдейт (None — вне апдейта)."""
+    received = _received.get()
+    return None if received is None else time.perf_counter() - received
+
+
+class UpdateTimer:
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        token = _received.set(started)
+        try:
+            return await handler(event, data)
+        finally:
+            _received.reset(token)
+            self.histogram.observe(time.perf_counter() - started, event.event_type)
+
+
+class RequestTimer(BaseRequestMiddleware):
+    def __init__(self, histogram: Histogram, errors: Counter) -> None:
+        self.histogram = histogram
+        self.errors = errors
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.histogram.observe(time.perf_counter() - started, name)
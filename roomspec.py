@@ -0,0 +1,143 @@
+"""
+Комната одной строкой:
+
+    room 4.2x3.1 h2.7; door 80x200; window 140x140 x2
+    room 0,0 4,0 4,2 2,2 2,3 0,3 h2.7          (Г-образная: вершины в метрах)
+    floor 4.2x3.1                               (пол вместо стен)
+
+room с высотой h — стены (периметр × высота), без высоты и floor — пол (площадь по формуле
+шнурков). Проёмы door/window — ширина×высота, «x2» — количество. Размеры — как в parse_dims.
+Русские слова тоже: комната, пол, дверь, окно, в (высота).
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from calc import parse_dims, parse_fixed, parse_length_mm
+
+KEYWORDS = {
+    "room": "room", "комната": "room",
+    "floor": "floor", "пол": "floor",
+    "door": "door", "дверь": "door",
+    "window": "window", "окно": "window",
+}
+HEIGHT = re.compile(r"(?:h|в|высота)\s*=?\s*(\d+(?:[.,]\d+)?(?:см|cm|мм|mm|м|m)?)", re.IGNORECASE)
+COUNT = re.compile(r"\s[x×х*]\s*(\d+)\s*$", re.IGNORECASE)
+DIMS = re.compile(r"\d\s*[x×х*]\s*\d", re.IGNORECASE)
+VERTEX = re.compile(r"(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+MAX_OPENINGS = 50
+
+
+class SpecError(ValueError):
+    pass
+
+
+@dataclass
+class RoomSpec:
+    __slots__ = ("area_mm2", "openings", "rect")
+    area_mm2: int                            # стены или пол, без вычета проёмов
+    openings: List[Tuple[str, int, int]]     # (door/window, ширина мм, высота мм), по одному на проём
+    rect: Optional[Tuple[int, int]]          # пол-прямоугольник (мм) — для раскладки ламината
+
+    @property
+    def base_area(self) -> float:
+        return self.area_mm2 / 1_000_000
+
+    @property
+    def openings_area(self) -> float:
+        return sum(w * h for _, w, h in self.openings) / 1_000_000
+
+
+def looks_like_spec(text: str) -> bool:
+    word = text.strip().split(maxsplit=1)[:1]
+    return bool(word) and word[0].lower() in KEYWORDS
+
+
+def _coord_mm(num: str) -> int:
+    neg = num.startswith("-")
+    v = parse_fixed(num.lstrip("-"), 3)        # метры -> мм
+    return -v if neg else v
+
+
+def _polygon(vertices: List[Tuple[int, int]]) -> Tuple[int, float]:
+    """Площадь (формула шнурков, мм²) и периметр (мм)."""
+    twice = 0
+    perimeter = 0.0
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+        twice += x1 * y2 - x2 * y1
+        perimeter += math.hypot(x2 - x1, y2 - y1)
+    return abs(twice) // 2, perimeter
+
+
+def _surface(kind: str, args: str, part: str) -> Tuple[int, Optional[Tuple[int, int]]]:
+    height = None
+    m = HEIGHT.search(args)
+    if m:
+        height = parse_length_mm(m.group(1))
+        args = args[:m.start()] + args[m.end():]
+    if kind == "floor" and height is not None:
+        raise SpecError(f"«{part}»: у пола нет высоты — уберите h")
+
+    if not DIMS.search(args):
+        vertices = [(_coord_mm(x), _coord_mm(y)) for x, y in VERTEX.findall(args)]
+        if len(vertices) < 3:
+            raise SpecError(f"«{part}»: нужно AxB или хотя бы 3 вершины x,y")
+        area, perimeter = _polygon(vertices)
+        rect = None
+    else:
+        length, width = parse_dims(args)
+        area, perimeter = length * width, 2.0 * (length + width)
+        rect = (length, width)
+    if area <= 0:
+        raise SpecError(f"«{part}»: площадь получилась 0 — проверьте вершины")
+    if height is None:
+        return area, rect
+    return round(perimeter * height), None
+
+
+def compile_room_spec(text: str) -> RoomSpec:
+    """Один проход по частям через «;» или перевод строки. Ошибка — SpecError с понятным текстом."""
+    area = 0
+    openings: List[Tuple[str, int, int]] = []
+    rects: List[Tuple[int, int]] = []
+    surfaces = 0
+    for part in re.split(r"[;\n]", text):
+        part = part.strip()
+        if not part:
+            continue
+        word, _, args = part.partition(" ")
+        kind = KEYWORDS.get(word.lower())
+        if kind is None:
+            raise SpecError(f"«{part}»: не знаю «{word}» — room, floor, door или window")
+        args = args.strip().replace(";", "")
+        try:
+            if kind in ("room", "floor"):
+                a, rect = _surface(kind, args, part)
+                area += a
+                surfaces += 1
+                if rect:
+                    rects.append(rect)
+                continue
+            count = 1
+            m = COUNT.search(args)
+            if m:
+                count = int(m.group(1))
+                args = args[:m.start()]
+            w, h = parse_dims(args)
+        except SpecError:
+            raise
+        except ValueError:
+            raise SpecError(f"«{part}»: не понял размеры") from None
+        if count < 1:
+            raise SpecError(f"«{part}»: количество — от 1")
+        if len(openings) + count > MAX_OPENINGS:
+            raise SpecError(f"«{part}»: проёмов слишком много (не больше {MAX_OPENINGS})")
+        openings += [(kind, w, h)] * count
+
+    if not surfaces:
+        raise SpecError("Нет ни room, ни floor — что считать?")
+    spec = RoomSpec(area, openings, rects[0] if surfaces == 1 and len(rects) == 1 else None)
+    if spec.openings_area >= spec.base_area:
+        raise SpecError("Проёмы больше площади — проверьте размеры")
+    return spec
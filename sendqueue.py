@@ -0,0 +1,212 @@
+"""
+Очередь исходящих сообщений между хендлерами и Bot API (request-middleware сессии aiogram).
+
+Telegram режет ~30 сообщений/с на бота и ~1/с в один чат (короткие всплески можно).
+Каждый вызов с chat_id проходит два ведра токенов: своего чата и общее.
+- В одном чате вызовы идут строго по очереди: следующий стартует после ответа на предыдущий.
+- Общее ведро раздаёт токены по приоритету: результаты расчёта (HIGH) — раньше остальных.
+- TelegramRetryAfter: чат ставится на паузу на retry_after, запрос повторяется — порядок не ломается.
+Вызовы без chat_id (answerCallbackQuery, answerInlineQuery, getUpdates, ...) идут мимо очереди.
+
+Хендлер по-прежнему просто делает await message.answer(...) и получает Message.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+HIGH = 0
+NORMAL = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("send_priority", default=NORMAL)
+
+
+@contextmanager
+def send_priority(priority: int) -> Iterator[None]:
+    """Всё, что отправлено внутри блока, получает общий токен с этим приоритетом."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """Сколько ждать до целого токена (0 — есть сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.stamp) * self.rate >= self.capacity
+
+
+class _Lane:
+    __slots__ = ("lock", "bucket", "users", "paused_until")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.lock = asyncio.Lock()
+        self.bucket = bucket
+        self.users = 0
+        self.paused_until = 0.0
+
+
+class SendQueue(BaseRequestMiddleware):
+    """bot.session.middleware(SendQueue(...)) — и все отправки в чаты идут через очередь."""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 5.0,
+        max_retries: int = 5,
+    ) -> None:
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.lanes: "OrderedDict[Any, _Lane]" = OrderedDict()
+        self._global: Optional[TokenBucket] = None
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        # метрики
+        self.depth = 0              # вызовов в очереди прямо сейчас (ждут чат или общий токен)
+        self.max_depth = 0
+        self.dequeued = 0
+        self.sent = 0
+        self.retries = 0
+        self.wait_total = 0.0       # суммарное ожидание в очереди, с
+        self.wait_max = 0.0
+
+    # ---------- общее ведро с приоритетами ----------
+    def _global_bucket(self, now: float) -> TokenBucket:
+        if self._global is None:
+            self._global = TokenBucket(self.global_rate, self.global_rate, now)
+        return self._global
+
+    async def _global_token(self, priority: int) -> None:
+        bucket = self._global_bucket(time.monotonic())
+        if not self._waiters and bucket.delay(time.monotonic()) == 0:
+            bucket.take(time.monotonic())
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await fut
+
+    async def _run_pump(self) -> None:
+        bucket = self._global
+        while self._waiters:
+            wait = bucket.delay(time.monotonic())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():          # отправитель отменён — токен не тратим
+                continue
+            bucket.take(time.monotonic())
+            fut.set_result(None)
+
+    # ---------- чаты ----------
+    def _lane(self, chat_id: Any, now: float) -> _Lane:
+        lane = self.lanes.get(chat_id)
+        if lane is None:
+            self._forget_idle(now)
+            lane = self.lanes[chat_id] = _Lane(TokenBucket(self.chat_rate, self.chat_burst, now))
+        else:
+            self.lanes.move_to_end(chat_id)
+        return lane
+
+    def _forget_idle(self, now: float, batch: int = 16) -> None:
+        # Давно молчащие чаты (ведро уже полное) с начала OrderedDict: новая полоса будет такой же
+        stale = []
+        for chat_id, lane in itertools.islice(self.lanes.items(), batch):
+            if lane.users or not lane.bucket.full(now) or lane.paused_until > now:
+                break
+            stale.append(chat_id)
+        for chat_id in stale:
+            del self.lanes[chat_id]
+
+    async def _turn(self, lane: _Lane, priority: int) -> None:
+        now = time.monotonic()
+        wait = max(lane.paused_until - now, lane.bucket.delay(now))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        lane.bucket.take(time.monotonic())
+        await self._global_token(priority)
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        priority = _priority.get()
+        queued = time.monotonic()
+        lane = self._lane(chat_id, queued)
+        lane.users += 1
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        in_queue = True
+        try:
+            async with lane.lock:
+                await self._turn(lane, priority)
+                waited = time.monotonic() - queued
+                self.depth -= 1
+                in_queue = False
+                self.dequeued += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                for attempt in itertools.count(1):
+                    try:
+                        result = await make_request(bot, method)
+                    except TelegramRetryAfter as e:
+                        if attempt > self.max_retries:
+                            raise
+                        self.retries += 1
+                        lane.paused_until = time.monotonic() + e.retry_after
+                        self._global.tokens = min(self._global.tokens, 0.0)   # и притормозить всех
+                        await self._turn(lane, priority)
+                        continue
+                    self.sent += 1
+                    return result
+        finally:
+            lane.users -= 1
+            if in_queue:
+                self.depth -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "waiting_global": len(self._waiters),
+            "chats": len(self.lanes),
+            "sent": self.sent,
+            "retries": self.retries,
+            "wait_avg_ms": self.wait_total / self.dequeued * 1000 if self.dequeued else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
@@ -0,0 +1,783 @@
+import json
+import time
+import asyncio
+import itertools
+import sqlite3
+import contextvars
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Mapping, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseEventIsolation,
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+
+
+# Одна запись FSM = (state, data). Бэкенды ниже хранят их вместе,
+# чтобы состояние и данные можно было записать одной операцией.
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+
+def state_str(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+# Компактные объекты в данных FSM (поверхности, проёмы): в JSON пишутся как
+# {"<тег>": [поля...]}. Класс должен уметь to_wire() -> list и from_wire(list).
+WIRE_TYPES: Dict[str, Any] = {}
+_WIRE_TAGS: Dict[type, str] = {}
+
+
+def register_wire_type(tag: str, cls: type) -> type:
+    WIRE_TYPES[tag] = cls
+    _WIRE_TAGS[cls] = tag
+    return cls
+
+
+def _wire_default(obj: Any) -> Any:
+    tag = _WIRE_TAGS.get(type(obj))
+    if tag is None:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return {tag: obj.to_wire()}
+
+
+def _wire_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        tag, row = next(iter(obj.items()))
+        cls = WIRE_TYPES.get(tag)
+        if cls is not None and isinstance(row, list):
+            return cls.from_wire(row)
+    return obj
+
+
+def dump_data(data: Mapping[str, Any]) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_wire_default)
+
+
+def load_data(raw: Optional[str]) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_wire_hook) if raw else {}
+
+
+def check_data(data: Any) -> None:
+    if not isinstance(data, dict):
+        raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+
+
+class RecordStorage(BaseStorage):
+    """
+    Хранилище, у которого состояние и данные лежат в одной записи.
+    Наследникам достаточно реализовать get_record / set_record.
+    """
+
+    async def get_record(self, key: StorageKey) -> Record:
+        raise NotImplementedError
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _, data = await self.get_record(key)
+        await self.set_record(key, state_str(state), data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self.get_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        check_data(data)
+        state, _ = await self.get_record(key)
+        await self.set_record(key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self.get_record(key)
+        return data
+
+
+# =========================
+# ПАМЯТЬ С ВЫТЕСНЕНИЕМ (TTL простоя + лимит сессий)
+# =========================
+class _MemoryRecord:
+    __slots__ = ("state", "data", "touched", "size")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], touched: float, size: int) -> None:
+        self.state = state
+        self.data = data
+        self.touched = touched
+        self.size = size
+
+
+class EvictingMemoryStorage(RecordStorage):
+    """
+    In-memory FSM для брошенных на полпути расчётов: запись удаляется после
+    ttl секунд простоя или, если сессий больше max_sessions, — самая давняя.
+    Записи лежат в OrderedDict в порядке последнего обращения, поэтому
+    и LRU-вытеснение, и поиск просроченных — с начала словаря.
+
+    Размер (для health) запись не меряет: JSON всей сессии на каждый апдейт дороже
+    самой записи. Изменённые ключи копятся в множестве, и фоновая задача раз
+    в sweep_interval меряет только их — bytes отстаёт не больше чем на этот интервал.
+    """
+
+    # Накладные расходы на запись помимо JSON-размера данных (ключ, dict, объект записи)
+    RECORD_OVERHEAD = 400
+
+    def __init__(self, ttl: float = 0, max_sessions: int = 0, sweep_interval: float = 60.0, sweep_batch: int = 500) -> None:
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.records: "OrderedDict[StorageKey, _MemoryRecord]" = OrderedDict()
+        self.bytes = 0
+        self._unsized: Set[StorageKey] = set()     # записаны после последнего measure()
+        self.evicted_ttl = 0
+        self.evicted_lru = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _expired(self, rec: _MemoryRecord, now: float) -> bool:
+        return bool(self.ttl) and now - rec.touched > self.ttl
+
+    def _drop(self, key: StorageKey) -> None:
+        rec = self.records.pop(key)
+        self.bytes -= rec.size
+        self._unsized.discard(key)
+
+    async def get_record(self, key: StorageKey) -> Record:
+        rec = self.records.get(key)
+        if rec is None:
+            return None, {}
+        now = time.monotonic()
+        if self._expired(rec, now):
+            self._drop(key)
+            self.evicted_ttl += 1
+            return None, {}
+        rec.touched = now
+        self.records.move_to_end(key)
+        return rec.state, rec.data.copy()
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        if key in self.records:
+            self._drop(key)
+        if state is None and not data:
+            return
+        self.records[key] = _MemoryRecord(state, dict(data), time.monotonic(), 0)
+        self._unsized.add(key)
+        while self.max_sessions and len(self.records) > self.max_sessions:
+            self._drop(next(iter(self.records)))
+            self.evicted_lru += 1
+
+    async def sweep(self) -> int:
+        """Удаляет просроченные записи пачками, отдавая управление loop между пачками."""
+        removed = 0
+        while self.ttl and self.records:
+            now = time.monotonic()
+            batch = 0
+            for key, rec in self.records.items():
+                if not self._expired(rec, now) or batch >= self.sweep_batch:
+                    break
+                batch += 1
+            if not batch:
+                break
+            for key in list(itertools.islice(self.records, batch)):
+                self._drop(key)
+            removed += batch
+            self.evicted_ttl += batch
+            await asyncio.sleep(0)
+        return removed
+
+    async def measure(self) -> int:
+        """Пересчитывает размер записей, изменённых с прошлого раза, пачками по sweep_batch."""
+        measured = 0
+        while self._unsized:
+            for _ in range(min(self.sweep_batch, len(self._unsized))):
+                rec = self.records[self._unsized.pop()]
+                size = self.RECORD_OVERHEAD + len(rec.state or "") + (len(dump_data(rec.data)) if rec.data else 0)
+                self.bytes += size - rec.size
+                rec.size = size
+                measured += 1
+            await asyncio.sleep(0)
+        return measured
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.sweep()
+            await self.measure()
+
+    async def start_sweeper(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self.records),
+            "bytes": self.bytes,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_lru": self.evicted_lru,
+        }
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+
+# =========================
+# SQLITE (WAL)
+# =========================
+class SQLiteStorage(RecordStorage):
+    """
+    FSM в SQLite-файле (режим WAL). Все запросы идут через один рабочий поток,
+    поэтому event loop не блокируется и соединению не нужны блокировки.
+    """
+
+    def __init__(self, path: str, key_builder: Optional[KeyBuilder] = None) -> None:
+        self.path = path
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fsm ("
+                " key TEXT PRIMARY KEY,"
+                " state TEXT,"
+                " data TEXT NOT NULL DEFAULT '{}',"
+                " updated_at REAL NOT NULL DEFAULT (julianday('now'))"
+                ")"
+            )
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get(self, k: str) -> Record:
+        row = self._connect().execute("SELECT state, data FROM fsm WHERE key = ?", (k,)).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], load_data(row[1])
+
+    def _set(self, k: str, state: Optional[str], raw: Optional[str]) -> None:
+        conn = self._connect()
+        if state is None and raw is None:
+            conn.execute("DELETE FROM fsm WHERE key = ?", (k,))
+            return
+        conn.execute(
+            "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, julianday('now')) "
+            "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+            "updated_at = excluded.updated_at",
+            (k, state, raw or "{}"),
+        )
+
+    async def get_record(self, key: StorageKey) -> Record:
+        return await self._run(self._get, self.key_builder.build(key))
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        raw = dump_data(data) if data else None
+        await self._run(self._set, self.key_builder.build(key), state, raw)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
+
+
+# =========================
+# REDIS (RESP2 поверх asyncio)
+# =========================
+class RedisError(Exception):
+    pass
+
+
+class _RespConn:
+    """Одно соединение RESP2: ответы читаются строго по порядку отправленных команд."""
+
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    async def _read(self) -> Any:
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            payload = await self.reader.readexactly(n + 2)
+            return payload[:-2]
+        if kind == b"*":
+            n = int(rest)
+            if n < 0:
+                return None
+            return [await self._read() for _ in range(n)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def pipeline(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        self.writer.write(b"".join(RespClient._encode(c) for c in commands))
+        await self.writer.drain()
+        return [await self._read() for _ in commands]
+
+    def abort(self) -> None:
+        self.writer.close()
+
+
+class RespClient:
+    """
+    Минимальный клиент протокола Redis (RESP2) с небольшим пулом соединений:
+    команды пачкой отправляются одним write и читаются по порядку, разные чаты
+    идут по разным соединениям (до pool_size одновременно).
+    Работает с Redis, KeyDB, Dragonfly и локальной заглушкой из benchmarks/.
+
+    Соединение, на котором обмен прервался чем угодно (обрыв, таймаут, отмена задачи),
+    закрывается и в пул не возвращается: иначе следующий вызов прочитал бы чужой ответ.
+    """
+
+    def __init__(self, url: str, pool_size: int = 8, timeout: float = 5.0) -> None:
+        u = urlparse(url)
+        self.host = u.hostname or "localhost"
+        self.port = u.port or 6379
+        self.password = u.password
+        self.db = int(u.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout              # на подключение и на каждую пачку команд, сек
+        self._idle: List[_RespConn] = []
+        # Semaphore создаётся лениво: на Python 3.9 он привязывается к текущему loop
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    async def _connect(self) -> _RespConn:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = _RespConn(reader, writer)
+        hello: List[Tuple[Any, ...]] = []
+        if self.password:
+            hello.append(("AUTH", self.password))
+        if self.db:
+            hello.append(("SELECT", self.db))
+        if hello:
+            try:
+                for r in await conn.pipeline(hello):
+                    if isinstance(r, RedisError):
+                        raise r
+            except BaseException:
+                conn.abort()
+                raise
+        return conn
+
+    async def _exchange(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        conn = self._idle.pop() if self._idle else await self._connect()
+        try:
+            replies = await conn.pipeline(commands)
+        except BaseException:
+            conn.abort()
+            raise
+        self._idle.append(conn)
+        return replies
+
+    async def pipeline(self, commands: List[Tuple[Any, ...]]) -> List[Any]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            replies = await asyncio.wait_for(self._exchange(commands), self.timeout)
+        for r in replies:
+            if isinstance(r, RedisError):
+                raise r
+        return replies
+
+    async def execute(self, *args: Any) -> Any:
+        return (await self.pipeline([args]))[0]
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.abort()
+            try:
+                await conn.writer.wait_closed()
+            except Exception:
+                pass
+
+
+class RedisStorage(RecordStorage):
+    """
+    FSM в Redis: одна запись = hash с полями state и data.
+    Общий для нескольких реплик бота. ttl (сек) продлевается при каждой записи.
+    """
+
+    def __init__(self, url: str, ttl: Optional[int] = None, key_builder: Optional[KeyBuilder] = None) -> None:
+        self.client = RespClient(url)
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder()
+
+    async def get_record(self, key: StorageKey) -> Record:
+        state, raw = await self.client.execute("HMGET", self.key_builder.build(key), "state", "data")
+        return (state.decode() if state else None), load_data(raw.decode() if raw else None)
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        k = self.key_builder.build(key)
+        if state is None and not data:
+            await self.client.execute("DEL", k)
+            return
+        commands: List[Tuple[Any, ...]] = [("HSET", k, "state", state or "", "data", dump_data(data))]
+        if self.ttl:
+            commands.append(("EXPIRE", k, self.ttl))
+        await self.client.pipeline(commands)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+# =========================
+# WRITE-BEHIND: все записи апдейта — одной операцией в конце
+# =========================
+class _Pending:
+    __slots__ = ("state", "data", "dirty")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any]) -> None:
+        self.state = state
+        self.data = data
+        self.dirty = False
+
+
+_pending: contextvars.ContextVar[Optional[Dict[StorageKey, _Pending]]] = contextvars.ContextVar(
+    "fsm_pending", default=None
+)
+
+
+class WriteBehindStorage(BaseStorage):
+    """
+    Обёртка над RecordStorage. Пока обрабатывается апдейт, запись читается
+    из бэкенда один раз, а все set_state / set_data / update_data копятся в памяти
+    и сбрасываются одной set_record в конце апдейта (см. WriteBehindIsolation).
+    Вне апдейта вызовы идут напрямую в бэкенд.
+    """
+
+    def __init__(self, backend: RecordStorage) -> None:
+        self.backend = backend
+        self.flushes = 0
+        self.coalesced_writes = 0
+
+    async def _entry(self, key: StorageKey) -> Optional[_Pending]:
+        pending = _pending.get()
+        if pending is None:
+            return None
+        entry = pending.get(key)
+        if entry is None:
+            state, data = await self.backend.get_record(key)
+            entry = pending[key] = _Pending(state, data)
+        return entry
+
+    def _mark(self, entry: _Pending) -> None:
+        if entry.dirty:
+            self.coalesced_writes += 1
+        entry.dirty = True
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.set_state(key, state)
+        entry.state = state_str(state)
+        self._mark(entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.get_state(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        check_data(data)
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.set_data(key, data)
+        entry.data = dict(data)
+        self._mark(entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.get_data(key)
+        return entry.data.copy()
+
+    async def get_record(self, key: StorageKey) -> Record:
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.get_record(key)
+        return entry.state, entry.data.copy()
+
+    async def set_record(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        if entry is None:
+            return await self.backend.set_record(key, state, data)
+        entry.state, entry.data = state, dict(data)
+        self._mark(entry)
+
+    async def flush(self, pending: Dict[StorageKey, _Pending]) -> None:
+        for key, entry in pending.items():
+            if entry.dirty:
+                await self.backend.set_record(key, entry.state, entry.data)
+                self.flushes += 1
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncGenerator[None, None]:
+        if _pending.get() is not None:
+            yield
+            return
+        pending: Dict[StorageKey, _Pending] = {}
+        token = _pending.set(pending)
+        try:
+            yield
+        finally:
+            _pending.reset(token)
+            await self.flush(pending)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+
+class WriteBehindIsolation(BaseEventIsolation):
+    """
+    FSMContextMiddleware держит lock() вокруг чтения состояния и вызова хендлера —
+    ровно на время апдейта. Здесь же открывается батч WriteBehindStorage.
+    """
+
+    def __init__(self, storage: WriteBehindStorage, inner: Optional[BaseEventIsolation] = None) -> None:
+        self.storage = storage
+        self.inner = inner or DisabledEventIsolation()
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        async with self.inner.lock(key):
+            async with self.storage.batch():
+                yield
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+
+# =========================
+# ПОРЯДОК АПДЕЙТОВ В ЧАТЕ
+# =========================
+class _ChatLock:
+    __slots__ = ("lock", "users")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class ChatOrderIsolation(BaseEventIsolation):
+    """
+    Апдейты одного чата обрабатываются по одному и в порядке поступления: asyncio.Lock
+    пропускает ждущих по FIFO, а polling/webhook запускают задачи апдейтов по порядку
+    update_id, и до FSMContextMiddleware (где берётся lock) в задаче нет ни одного await.
+    Разные чаты идут параллельно. Замок живёт, пока его держат или ждут, —
+    словарь не растёт с числом чатов (в отличие от SimpleEventIsolation aiogram).
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[StorageKey, _ChatLock] = {}
+        self.queued = 0          # апдейтов, которым пришлось ждать предыдущий апдейт своего чата
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _ChatLock()
+        elif entry.lock.locked():
+            self.queued += 1
+        entry.users += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.users -= 1
+            if not entry.users:
+                del self._locks[key]
+
+    @property
+    def waiting(self) -> int:
+        return sum(e.users - e.lock.locked() for e in self._locks.values())
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+def build_storage(
+    kind: str,
+    sqlite_path: str = "fsm.sqlite3",
+    redis_url: str = "",
+    ttl: Optional[int] = None,
+    max_sessions: int = 0,
+) -> Tuple[BaseStorage, BaseEventIsolation]:
+    kind = (kind or "memory").strip().lower()
+    if kind == "memory":
+        if not ttl and not max_sessions:
+            return MemoryStorage(), ChatOrderIsolation()
+        return EvictingMemoryStorage(ttl=ttl or 0, max_sessions=max_sessions), ChatOrderIsolation()
+    if kind == "sqlite":
+        backend: RecordStorage = SQLiteStorage(sqlite_path)
+    elif kind == "redis":
+        backend = RedisStorage(redis_url or "redis://localhost:6379/0", ttl=ttl)
+    else:
+        raise ValueError(f"Неизвестный FSM_STORAGE={kind!r}. Допустимо: memory, sqlite, redis.")
+    storage = WriteBehindStorage(backend)
+    return storage, WriteBehindIsolation(storage, ChatOrderIsolation())
+
+
+def time_storage_ops(storage: BaseStorage, observe: Callable[[float, str], None]) -> None:
+    """
+    Засекает каждое настоящее обращение к хранилищу: observe(секунды, операция).
+    У RecordStorage это get_record / set_record (у WriteBehindStorage — его бэкенда:
+    сброс батча в конце апдейта тоже попадает), у остальных — get/set state/data.
+    Методы подменяются на самом объекте: isinstance и вызовы изнутри класса не меняются.
+    """
+    target = storage.backend if isinstance(storage, WriteBehindStorage) else storage
+    if isinstance(target, RecordStorage):
+        ops: Tuple[str, ...] = ("get_record", "set_record")
+    else:
+        ops = ("get_state", "set_state", "get_data", "set_data")
+    for op in ops:
+        setattr(target, op, _timed(getattr(target, op), op, observe))
+
+
+def _timed(method: Callable[..., Awaitable[Any]], op: str, observe: Callable[[float, str], None]):
+    async def timed(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            observe(time.perf_counter() - started, op)
+    return timed
+
+
+# =========================
+# FSM-СЕССИЯ АПДЕЙТА: одно чтение, одна запись
+# =========================
+SESSION_STATS: Dict[str, int] = {
+    "updates": 0,
+    "logical_ops": 0,   # сколько обращений к хранилищу сделал бы хендлер через FSMContext
+    "storage_ops": 0,   # сколько их было на самом деле
+}
+
+
+class FSMSession:
+    """
+    Данные FSM на время одного апдейта. Читаются один раз до хендлера,
+    хендлер меняет их в памяти, а в конце апдейта состояние и данные
+    записываются одной операцией (если что-то изменилось).
+    """
+
+    __slots__ = ("context", "state", "data", "dirty", "logical_ops", "storage_ops")
+
+    def __init__(self, context: FSMContext, state: Optional[str], data: Dict[str, Any]) -> None:
+        self.context = context
+        self.state = state
+        self.data = data
+        self.dirty = False
+        # Чтение состояния в FSMContextMiddleware и get_data в load(): одна запись из бэкенда
+        # только у WriteBehindStorage (второе чтение берёт её из батча). RecordStorage без
+        # него (EvictingMemoryStorage по умолчанию) читает запись дважды, MemoryStorage —
+        # состояние и данные отдельно. Сверяется с настоящими вызовами в benchmarks/fsm_ops.py.
+        self.logical_ops = 1
+        self.storage_ops = 1 if isinstance(context.storage, WriteBehindStorage) else 2
+
+    @property
+    def record_based(self) -> bool:
+        return isinstance(self.context.storage, (RecordStorage, WriteBehindStorage))
+
+    @classmethod
+    async def load(cls, context: FSMContext, raw_state: Optional[str]) -> "FSMSession":
+        return cls(context, raw_state, await context.get_data())
+
+    def get_data(self) -> Dict[str, Any]:
+        self.logical_ops += 1
+        return self.data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self.logical_ops += 1
+        return self.data.get(key, default)
+
+    def update(self, **kwargs: Any) -> None:
+        self.logical_ops += 2  # update_data = get_data + set_data
+        self.data.update(kwargs)
+        self.dirty = True
+
+    def set_state(self, state: StateType = None) -> None:
+        self.logical_ops += 1
+        self.state = state_str(state)
+        self.dirty = True
+
+    def clear(self) -> None:
+        self.logical_ops += 2  # FSMContext.clear = set_state + set_data
+        self.state = None
+        self.data = {}
+        self.dirty = True
+
+    @property
+    def saved_ops(self) -> int:
+        return self.logical_ops - self.storage_ops
+
+    async def commit(self) -> None:
+        if not self.dirty:
+            return
+        storage, key = self.context.storage, self.context.key
+        if self.record_based:
+            await storage.set_record(key, self.state, self.data)
+            self.storage_ops += 1
+        else:
+            await storage.set_state(key, self.state)
+            await storage.set_data(key, self.data)
+            self.storage_ops += 2
+        self.dirty = False
+
+
+class FSMSessionMiddleware:
+    """
+    Outer-middleware на update (после FSMContextMiddleware): кладёт в хендлер
+    аргумент session и коммитит её после успешной обработки.
+    """
+
+    async def __call__(self, handler, event, data):
+        context: Optional[FSMContext] = data.get("state")
+        if context is None:
+            return await handler(event, data)
+        session = await FSMSession.load(context, data.get("raw_state"))
+        data["session"] = session
+        result = await handler(event, data)
+        await session.commit()
+        SESSION_STATS["updates"] += 1
+        SESSION_STATS["logical_ops"] += session.logical_ops
+        SESSION_STATS["storage_ops"] += session.storage_ops
+        return result
@@ -0,0 +1,34 @@
+"""
+Пакетный расчёт (batch.estimate) совпадает со скалярным calc_counts_for_product — и по рекомендации.
+"""
+import random
+
+import pytest
+
+from batch import estimate, iter_rows
+from calc import MIX_MAX_AREA, PRODUCTS, calc_counts_for_product
+
+
+def areas():
+    rnd = random.Random(4)
+    return [round(rnd.uniform(0.5, 200), 2) for _ in range(300)] + [16.2, 1.8, MIX_MAX_AREA + 0.7, 1234.5]
+
+
+@pytest.mark.parametrize("key", [k for k, p in PRODUCTS.items() if p.get("auto_pick")])
+@pytest.mark.parametrize("reserve", [0.0, 0.1])
+def test_mix_matches_scalar(key, reserve):
+    a = areas()
+    mix = estimate(a, reserve, [key])[key]["mix"]
+    for i, area in enumerate(a):
+        c = calc_counts_for_product(key, area, reserve)
+        got = [(v["label"], int(n)) for v, n in zip(c["variants"], mix["counts"][i]) if n]
+        assert got == [(m["label"], m["count"]) for m in c["mix"]["items"]], area
+        assert (mix["covered"][i], mix["over"][i]) == (c["mix"]["covered"], c["mix"]["over"]), area
+
+
+def test_rows_carry_recommendation():
+    rows = list(iter_rows([16.2], [0.0], products=["panel_30x60_auto"]))
+    assert [(r["variant"], r["count"], r["best"], r["recommended"]) for r in rows] == [
+        ("10 шт/уп", 9, 1, 0),
+        ("18 шт/уп", 5, 0, 5),
+    ]
@@ -0,0 +1,117 @@
+"""
+Маршрутизация callback-кнопок (callbacks.CallbackRouter): точные и префиксные маршруты,
+фильтр по шагу сценария и повреждённые/устаревшие данные кнопок.
+"""
+import asyncio
+from typing import Any, List
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, User
+
+from callbacks import PRICE_NO, CallbackRouter, CompareCb, OpeningPresetCb, SidesCb
+
+
+class Steps(StatesGroup):
+    sides = State()
+    other = State()
+
+
+class RecordingSession(BaseSession):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: List[Any] = []
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args: Any, **kwargs: Any):  # pragma: no cover
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        return True
+
+
+def make_router(seen: list) -> CallbackRouter:
+    router = CallbackRouter()
+
+    @router.route(PRICE_NO)
+    async def price_no(callback, callback_data, **kwargs):
+        seen.append(("price_no", callback_data))
+
+    @router.route(SidesCb, Steps.sides)
+    async def sides(callback, callback_data, **kwargs):
+        seen.append(("sides", callback_data))
+
+    @router.route(OpeningPresetCb)
+    async def preset(callback, callback_data, **kwargs):
+        seen.append(("preset", callback_data))
+
+    @router.route(CompareCb)
+    async def compare(callback, callback_data, **kwargs):
+        seen.append(("compare", callback_data))
+
+    return router
+
+
+def press(data: str, raw_state=None):
+    """-> (результат dispatch, вызванные хендлеры, вызовы Bot API)."""
+    session = RecordingSession()
+    bot = Bot("123456:" + "A" * 35, session=session)
+    callback = CallbackQuery(
+        id="1", chat_instance="c", data=data, from_user=User(id=1, is_bot=False, first_name="u"),
+    ).as_(bot)
+    seen: list = []
+    result = asyncio.run(make_router(seen).dispatch(callback, raw_state=raw_state))
+    return result, seen, session.calls
+
+
+def test_exact_route():
+    _, seen, calls = press("price:no")
+    assert seen == [("price_no", None)]
+    assert calls == []
+
+
+def test_prefix_route_parses_data():
+    _, seen, _ = press("opening_preset:door:0.8:2.0")
+    assert seen == [("preset", OpeningPresetCb(kind="door", w=0.8, h=2.0))]
+
+
+def test_unknown_prefix_unhandled():
+    result, seen, calls = press("nope:1")
+    assert result is UNHANDLED
+    assert (seen, calls) == ([], [])
+
+
+@pytest.mark.parametrize("data", [
+    "opening_preset:door:abc:2",
+    "opening_preset:door:0:2",
+    "opening_preset:garage:1:1",
+    "sides:3",
+    "sides:",
+    "compare:-5:0:",
+    "compare:5:0:x:y",
+])
+def test_malformed_payload_alerts(data):
+    result, seen, calls = press(data, raw_state=Steps.sides.state)
+    assert result is None
+    assert seen == []
+    assert len(calls) == 1 and isinstance(calls[0], AnswerCallbackQuery)
+    assert calls[0].show_alert and "/start" in calls[0].text
+
+
+def test_wrong_step_only_stops_spinner():
+    result, seen, calls = press("sides:2", raw_state=Steps.other.state)
+    assert result is None
+    assert seen == []
+    assert len(calls) == 1 and isinstance(calls[0], AnswerCallbackQuery) and not calls[0].show_alert
+
+
+def test_right_step():
+    _, seen, _ = press("sides:2", raw_state=Steps.sides.state)
+    assert seen == [("sides", SidesCb(n=2))]
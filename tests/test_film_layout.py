@@ -0,0 +1,61 @@
+"""
+Раскрой плёнки (layout.plan_film_rolls): раскладка корректна и план не сидит до дедлайна зря.
+"""
+import random
+import time
+
+from layout import ROLL_LENGTH_MM, ROLL_WIDTH_MM, _lower_bound, film_pieces, plan_film_rolls
+
+
+def random_surfaces(rnd: random.Random, n: int):
+    return [
+        (f"Деталь {i}", rnd.choice((30, 45, 60, 120, 210, 240)) + rnd.randint(0, 9) * 0.5,
+         rnd.choice((20, 35, 50, 60, 70, 100)), rnd.choice((1, 2)))
+        for i in range(1, n + 1)
+    ]
+
+
+def check(surfaces, rolls) -> None:
+    want = sorted((p.name, p.length, p.width) for p in film_pieces(surfaces))
+    got = []
+    for r in rolls:
+        assert sum(s.length for s in r.shelves) + r.free_length == ROLL_LENGTH_MM
+        for s in r.shelves:
+            assert sum(c.width for c in s.columns) + s.free_width == ROLL_WIDTH_MM
+            for c in s.columns:
+                assert sum(p.length for p in c.pieces) + c.free_length == s.length
+                assert all(p.width <= c.width for p in c.pieces)
+            got += [(p.name, p.length, p.width) for p in s.pieces]
+    assert sorted(got) == want
+
+
+def test_every_piece_placed_once():
+    rnd = random.Random(1)
+    for _ in range(30):
+        surfaces = random_surfaces(rnd, rnd.randint(1, 20))
+        rolls = plan_film_rolls(surfaces)
+        check(surfaces, rolls)
+        assert len(rolls) >= _lower_bound(film_pieces(surfaces))
+
+
+def test_stops_at_lower_bound():
+    # две детали на один рулон: бюджет в 10 с не должен уходить целиком
+    surfaces = [("Полка", 80, 30, 1), ("Полка 2", 80, 30, 1)]
+    t0 = time.perf_counter()
+    rolls = plan_film_rolls(surfaces, budget_ms=10_000)
+    assert time.perf_counter() - t0 < 1
+    assert len(rolls) == 1
+
+
+def test_stops_when_no_improvement():
+    rnd = random.Random(2)
+    surfaces = random_surfaces(rnd, 6)
+    t0 = time.perf_counter()
+    check(surfaces, plan_film_rolls(surfaces, budget_ms=10_000))
+    assert time.perf_counter() - t0 < 1
+
+
+def test_wide_strips_bound():
+    # полосы шире половины рулона рядом не лягут: 4 × 200 см = 8 м — не меньше 3 рулонов
+    pieces = film_pieces([("Стена", 200, 40, 4)])
+    assert _lower_bound(pieces) == 3
@@ -0,0 +1,78 @@
+"""
+Свойства целочисленного расчёта упаковок (calc.py, мм² + б.п.) на случайных входах.
+Эталон — Fraction, точная рациональная арифметика. Скорость — в benchmarks/fixed_point.py.
+
+    python -m pytest -q tests
+"""
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+from calc import PRODUCTS, calc_counts_for_product, parse_float, parse_length_to_m
+
+PACKS = {
+    key: [Fraction(v["pack_mm2"], 10 ** 6) for v in p.get("variants", [p])]
+    for key, p in PRODUCTS.items()
+}
+RESERVES = ("0", "0.05", "0.1", "0.15")
+
+
+def counts(result):
+    return [v["count"] for v in result["variants"]] if result["type"] == "auto_pick" else [result["count"]]
+
+
+def exact_counts(key, area: Fraction, reserve: Fraction):
+    target = area * (1 + reserve)
+    return [math.ceil(target / pack) for pack in PACKS[key]]
+
+
+def random_decimals(n: int, seed: int = 7):
+    """Строки вида «12», «12.345», «12,3» — до шести знаков после запятой, без нуля."""
+    rnd = random.Random(seed)
+    for _ in range(n):
+        whole = rnd.randint(0, 300)
+        frac = "".join(rnd.choice("0123456789") for _ in range(rnd.randint(0, 6)))
+        text = f"{whole}.{frac}" if frac else str(whole)
+        text = text.replace(".", ",") if rnd.random() < 0.3 else text
+        if Fraction(text.replace(",", ".")):
+            yield text, rnd
+
+
+def test_parse_matches_exact():
+    for text, _ in random_decimals(20_000):
+        exact = Fraction(text.replace(",", "."))
+        assert Fraction(parse_float(text)) == Fraction(float(exact)), text
+        # см -> целые мм, половина вверх (но только по трём знакам ввода — как в parse_fixed)
+        cm = Fraction(math.floor(exact * 1000 + Fraction(1, 2)), 1000) if exact * 1000 % 1 else exact
+        assert parse_length_to_m(text + " см") == math.floor(cm * 10 + Fraction(1, 2)) / 1000, text
+
+
+@pytest.mark.parametrize("key", list(PRODUCTS))
+def test_counts_match_exact_ceil(key):
+    for text, rnd in random_decimals(5_000):
+        reserve = rnd.choice(RESERVES)
+        got = counts(calc_counts_for_product(key, parse_float(text), float(reserve)))
+        assert got == exact_counts(key, Fraction(text.replace(",", ".")), Fraction(reserve)), (text, reserve)
+
+
+@pytest.mark.parametrize("key", list(PRODUCTS))
+def test_exact_multiples_of_pack(key):
+    # float здесь ошибался: ровно k упаковок площади давали k + 1
+    for i, pack in enumerate(PACKS[key]):
+        for k in range(1, 500):
+            area = float(pack * k)
+            assert counts(calc_counts_for_product(key, area, 0.0))[i] == k, k
+            # та же площадь, полученная суммой поверхностей — с шумом float
+            noisy = sum([area / 3] * 3)
+            assert counts(calc_counts_for_product(key, noisy, 0.0))[i] == k, (k, noisy)
+
+
+@pytest.mark.parametrize("key", list(PRODUCTS))
+def test_counts_monotonic_in_area(key):
+    prev = [0] * len(PACKS[key])
+    for mm2 in range(1, 10 ** 8, 99_991):
+        cur = counts(calc_counts_for_product(key, mm2 / 10 ** 6, 0.1))
+        assert all(c >= p for c, p in zip(cur, prev)), mm2
+        prev = cur
@@ -0,0 +1,105 @@
+"""
+История расчётов (history.HistoryStore): компактная строка, чтение с учётом ещё не записанных
+строк, повтор пачки после ошибки записи и живой фоновый flusher.
+"""
+import asyncio
+
+import pytest
+
+from history import HistoryEntry, HistoryStore
+
+
+def entry(at: int, product_key: str = "laminate") -> HistoryEntry:
+    return HistoryEntry(at, product_key, 12.5, 1.6, 0.1, {"auto_pick": False}, [["Стол", 120.0, 60.0, 2]], None)
+
+
+def test_row_round_trip():
+    e = HistoryEntry(1_700_000_000_000, "panel_30x60_auto", 16.2, 0.8, 0.075,
+                     {"auto_pick": True, "mix": {"items": []}}, [["Полка", 80.0, 30.0, 1]], [4200, 3100])
+    row = e.to_row(7)
+    assert row[:6] == (7, e.at, "panel_30x60_auto", 16_200_000, 800_000, 750)
+    assert HistoryEntry.from_row(row) == e
+    assert e.net_area == pytest.approx(15.4)
+
+
+def test_recent_and_find_span_pending_and_disk(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.sqlite3"))
+
+    async def main():
+        for at in (1, 2, 3):
+            store.record(1, entry(at))
+        store.record(2, entry(4))
+        await store.flush()
+        store.record(1, entry(5))                       # ещё в памяти
+        recent = [e.at for e in await store.recent(1, limit=3)]
+        found = (await store.find(1, 2), await store.find(1, 5), await store.find(2, 1))
+        await store.close()
+        return recent, found
+
+    recent, (on_disk, pending, other_user) = asyncio.run(main())
+    assert recent == [5, 3, 2]
+    assert (on_disk.at, pending.at, other_user) == (2, 5, None)
+    assert (store.recorded, store.flushes) == (5, 2)     # close() дописал последнюю
+
+
+def test_failed_flush_requeues_in_order(tmp_path):
+    store = HistoryStore(str(tmp_path / "h.sqlite3"))
+    insert = store._insert
+    fails = [1]
+
+    def flaky(pending):
+        if fails[0]:
+            fails[0] -= 1
+            raise OSError("disk I/O error")
+        insert(pending)
+
+    store._insert = flaky
+
+    async def main():
+        store.record(1, entry(1))
+        store.record(1, entry(2))
+        with pytest.raises(OSError):
+            await store.flush()
+        store.record(1, entry(3))
+        assert [e.at for _, e in store._pending] == [1, 2, 3]
+        await store.flush()
+        rows = await store.recent(1, limit=10)
+        await store.close()
+        return [e.at for e in rows]
+
+    assert asyncio.run(main()) == [3, 2, 1]
+    assert (store.flush_errors, store.flushes) == (1, 1)
+
+
+def test_flusher_survives_write_errors(tmp_path, caplog):
+    store = HistoryStore(str(tmp_path / "h.sqlite3"), flush_interval=0.01)
+    insert = store._insert
+    fails = [2]
+
+    def flaky(pending):
+        if fails[0]:
+            fails[0] -= 1
+            raise OSError("database is locked")
+        insert(pending)
+
+    store._insert = flaky
+
+    async def main():
+        await store.start_flusher()
+        for at in range(5):
+            store.record(1, entry(at))
+        for _ in range(200):
+            if store.flushes:
+                break
+            await asyncio.sleep(0.01)
+        alive = not store._flusher.done()
+        rows = await store.recent(1, limit=10)
+        await store.close()
+        return alive, [e.at for e in rows]
+
+    with caplog.at_level("ERROR", logger="history"):
+        alive, rows = asyncio.run(main())
+    assert alive
+    assert rows == [4, 3, 2, 1, 0]
+    assert store.flush_errors == 2
+    assert len([r for r in caplog.records if r.name == "history"]) == 2
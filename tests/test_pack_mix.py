@@ -0,0 +1,73 @@
+"""
+Смешанные упаковки (calc.PackMix): таблица, добор за её пределами и одна рекомендация на результат.
+"""
+import pytest
+
+from calc import (
+    MIX_MAX_AREA,
+    PRODUCTS,
+    PackMix,
+    area_mm2,
+    build_mix_tables,
+    calc_counts_for_product,
+    recommended_packs,
+    with_reserve,
+)
+
+KEY = "panel_30x60_auto"
+PACKS = [v["pack_mm2"] for v in PRODUCTS[KEY]["variants"]]
+
+
+def covered(combo) -> int:
+    return sum(c * p for c, p in zip(combo, PACKS))
+
+
+@pytest.fixture
+def small_tables():
+    build_mix_tables(1)                 # как MIX_MAX_AREA=1: таблица меньше самой крупной упаковки
+    yield
+    build_mix_tables(MIX_MAX_AREA)
+
+
+def test_small_table_past_limit(small_tables):
+    c = calc_counts_for_product(KEY, 1.2, 0.0)
+    assert [(i["label"], i["count"]) for i in c["mix"]["items"]] == [("10 шт/уп", 1)]
+    c = calc_counts_for_product(KEY, 2.0, 0.0)
+    assert [(i["label"], i["count"]) for i in c["mix"]["items"]] == [("18 шт/уп", 1)]
+
+
+@pytest.mark.parametrize("max_area", [0, 1, 10, 40])
+def test_small_table_covers_like_full(max_area):
+    small, full = PackMix(PACKS, area_mm2(max_area)), PackMix(PACKS, area_mm2(500))
+    for mm2 in range(1, 60 * 10 ** 6, 7919):
+        target = with_reserve(mm2, 0)
+        got = small.lookup(target)
+        assert covered(got) >= mm2, mm2
+        assert covered(got) == covered(full.lookup(target)), mm2
+
+
+def test_mix_is_exact_cover_when_possible():
+    mix = PackMix(PACKS, area_mm2(50))
+    for k10 in range(6):
+        for k18 in range(6):
+            area = k10 * PACKS[0] + k18 * PACKS[1]
+            assert covered(mix.lookup(with_reserve(area, 0))) == area, (k10, k18)
+
+
+def test_costs_prefer_cheaper():
+    # ровно одна упаковка 18 шт; если 10 шт почти даром, дешевле две по 10, хоть и с лишним
+    target = with_reserve(PACKS[1], 0)
+    assert PackMix(PACKS, area_mm2(50)).lookup(target) == (0, 1)
+    assert PackMix(PACKS, area_mm2(50), costs=[100, 1000]).lookup(target) == (2, 0)
+
+
+def test_recommendation_on_tie_follows_mix():
+    # 16.2 м² = 9 × 10 шт = 5 × 18 шт: лишнего поровну, упаковок меньше у 18 шт
+    c = calc_counts_for_product(KEY, 16.2, 0.0)
+    assert recommended_packs(c) == [("18 шт/уп", 5)]
+
+
+def test_recommendation_without_mix():
+    c = calc_counts_for_product(KEY, 16.2, 0.0)
+    del c["mix"]                        # запись истории до смешанных упаковок
+    assert recommended_packs(c) == [(c["best"]["label"], c["best"]["count"])]
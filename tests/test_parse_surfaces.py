@@ -0,0 +1,45 @@
+"""
+Список поверхностей одним сообщением (calc.parse_surfaces): строки, единицы, стороны и ошибки.
+"""
+import pytest
+
+from calc import BULK_MAX_LINES, looks_like_bulk, parse_surfaces
+
+
+def test_lines_units_and_sides():
+    text = "Стол 120x60 x2\n• Полка 80×30\nДверца 40*70 см 1\n\nШкаф 2x0.6 м\nФасад 600х400 мм"
+    rows, errors = parse_surfaces(text)
+    assert errors == []
+    assert rows == [
+        ("Стол", 120.0, 60.0, 2),
+        ("Полка", 80.0, 30.0, 1),
+        ("Дверца", 40.0, 70.0, 1),
+        ("Шкаф", 200.0, 60.0, 1),
+        ("Фасад", 60.0, 40.0, 1),
+    ]
+
+
+@pytest.mark.parametrize("line, error", [
+    ("Стол 120x60 x3", "сторон может быть 1 или 2"),
+    ("120x60", "нет названия"),
+    ("абв", "не понял"),
+    ("Полка 0x30", "больше нуля"),
+])
+def test_bad_line_reported_and_skipped(line, error):
+    rows, errors = parse_surfaces(f"Полка 80x30\n{line}")
+    assert rows == [("Полка", 80.0, 30.0, 1)]
+    assert len(errors) == 1
+    assert errors[0].startswith("строка 2:") and error in errors[0]
+
+
+def test_line_limit():
+    rows, errors = parse_surfaces("\n".join(f"Полка {i} 80x30" for i in range(BULK_MAX_LINES + 5)))
+    assert len(rows) == BULK_MAX_LINES
+    assert errors == [f"строка {BULK_MAX_LINES + 1}: больше {BULK_MAX_LINES} поверхностей за раз — остальные пропущены"]
+
+
+def test_looks_like_bulk():
+    assert looks_like_bulk("Стол 120x60")
+    assert looks_like_bulk("Полка 80 × 30")
+    assert not looks_like_bulk("Стол")
+    assert not looks_like_bulk("12.5")
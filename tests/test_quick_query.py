@@ -0,0 +1,36 @@
+"""
+Быстрый inline-запрос (calc.parse_quick_query): площадь, товары и запас из свободного текста.
+"""
+import pytest
+
+from calc import PRODUCTS, parse_quick_query
+
+PANELS = ("panel_30x30_20", "panel_30x60_auto")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("12.5 ламинат", (12_500_000, ("laminate",), 1000)),
+    ("8 м2 панели 30x60 5%", (8_000_000, ("panel_30x60_auto",), 500)),
+    ("3,6 плёнка без запаса", (3_600_000, ("film_60x3",), 0)),
+    ("5 кв.м пленка", (5_000_000, ("film_60x3",), 1000)),
+    ("7,25 панели 30х30", (7_250_000, ("panel_30x30_20",), 1000)),
+    ("12.5 м2 ламинат запас 15%", (12_500_000, ("laminate",), 1500)),
+    ("4 панели", (4_000_000, PANELS, 1000)),
+    ("12.5", (12_500_000, tuple(PRODUCTS), 1000)),
+])
+def test_parsed(text, expected):
+    assert parse_quick_query(text) == expected
+
+
+def test_reserve_capped_at_half():
+    assert parse_quick_query("10 ламинат 80%")[2] == 5000
+
+
+def test_product_order_follows_catalog():
+    _, keys, _ = parse_quick_query("3 ламинат и плёнка")
+    assert keys == tuple(k for k in PRODUCTS if k in ("laminate", "film_60x3"))
+
+
+@pytest.mark.parametrize("text", ["ламинат", "abc", "0 ламинат", "", "5% ламинат"])
+def test_no_area(text):
+    assert parse_quick_query(text) is None
@@ -0,0 +1,59 @@
+"""
+Комната одной строкой (roomspec.compile_room_spec): стены, пол, многоугольник, проёмы и ошибки.
+"""
+import pytest
+
+from roomspec import SpecError, compile_room_spec, looks_like_spec
+
+
+def test_walls_with_openings():
+    spec = compile_room_spec("room 4.2x3.1 h2.7; door 80x200; window 140x140 x2")
+    assert spec.area_mm2 == 2 * (4200 + 3100) * 2700          # периметр × высота
+    assert spec.openings == [("door", 800, 2000), ("window", 1400, 1400), ("window", 1400, 1400)]
+    assert spec.rect is None
+    assert spec.openings_area == pytest.approx(0.8 * 2.0 + 2 * 1.4 * 1.4)
+
+
+def test_floor_keeps_rect():
+    spec = compile_room_spec("floor 4.2x3.1")
+    assert (spec.area_mm2, spec.rect) == (4200 * 3100, (4200, 3100))
+
+
+def test_l_shaped_polygon():
+    assert compile_room_spec("room 0,0 4,0 4,2 2,2 2,3 0,3").area_mm2 == 10_000_000
+    # стены: периметр 14 м × 2.7
+    assert compile_room_spec("room 0,0 4,0 4,2 2,2 2,3 0,3 h2.7").area_mm2 == 14_000 * 2700
+
+
+@pytest.mark.parametrize("text", [
+    "комната 4x3 высота = 2.5 м\nдверь 0.8x2",
+    "room 4x3 h 250см; door 80x200",
+    "room 4x3 в2,5; door 800x2000 мм",
+])
+def test_russian_words_and_height_forms(text):
+    spec = compile_room_spec(text)
+    assert spec.area_mm2 == 2 * (4000 + 3000) * 2500
+    assert spec.openings == [("door", 800, 2000)]
+
+
+@pytest.mark.parametrize("text, error", [
+    ("floor 4x3 h2.7", "у пола нет высоты"),
+    ("room 4x3; shelf 1x1", "не знаю «shelf»"),
+    ("door 80x200", "Нет ни room, ни floor"),
+    ("room 0,0 1,1", "хотя бы 3 вершины"),
+    ("room 0,0 1,1 2,2", "площадь получилась 0"),
+    ("room 1x1 h1; door 2x2", "Проёмы больше площади"),
+    ("room 4x3; window 1x1 x51", "проёмов слишком много"),
+    ("room 4x3; door abc", "не понял размеры"),
+    ("room 4x3; door 80x200 x0", "количество — от 1"),
+])
+def test_errors(text, error):
+    with pytest.raises(SpecError, match=error):
+        compile_room_spec(text)
+
+
+def test_looks_like_spec():
+    assert looks_like_spec("Room 4x3")
+    assert looks_like_spec("пол 4x3")
+    assert not looks_like_spec("")
+    assert not looks_like_spec("12.5")
@@ -0,0 +1,113 @@
+"""
+Очередь исходящих (sendqueue.SendQueue): порядок внутри чата, лимит чата, приоритет
+общего ведра, повтор после TelegramRetryAfter и метрики.
+"""
+import time
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+
+from sendqueue import HIGH, SendQueue, send_priority
+
+
+class FakeApi:
+    """make_request для middleware: пишет (chat_id, text) и может ответить RetryAfter."""
+
+    def __init__(self, retry_after: float = 0.0, failures: int = 0) -> None:
+        self.calls = []
+        self.retry_after = retry_after
+        self.failures = failures
+        self.busy = set()
+
+    async def __call__(self, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        assert chat_id not in self.busy, "два запроса в один чат одновременно"
+        self.busy.add(chat_id)
+        self.calls.append((chat_id, getattr(method, "text", None), time.monotonic()))
+        await asyncio.sleep(0)
+        self.busy.discard(chat_id)
+        if self.failures:
+            self.failures -= 1
+            raise TelegramRetryAfter(method, "Too Many Requests", self.retry_after)
+        return method.text
+
+
+def send(queue: SendQueue, api: FakeApi, chat_id: int, text: str):
+    return queue(api, None, SendMessage(chat_id=chat_id, text=text))
+
+
+def test_calls_without_chat_bypass_queue():
+    queue, api = SendQueue(), FakeApi()
+    asyncio.run(queue(api, None, AnswerCallbackQuery(callback_query_id="1")))
+    assert len(api.calls) == 1
+    assert (queue.stats()["chats"], queue.sent) == (0, 0)
+
+
+def test_chat_order_and_rate():
+    queue, api = SendQueue(chat_rate=20.0, chat_burst=2.0), FakeApi()
+
+    async def main():
+        started = time.monotonic()
+        results = await asyncio.gather(*(send(queue, api, 1, str(i)) for i in range(5)))
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results == ["0", "1", "2", "3", "4"]
+    assert [text for _, text, _ in api.calls] == results
+    assert elapsed >= 3 / 20 * 0.9                     # два из ведра, ещё три — по 50 мс
+    stats = queue.stats()
+    assert (stats["depth"], stats["max_depth"], stats["sent"]) == (0, 4, 5)   # первый прошёл без ожидания
+    assert stats["wait_max_ms"] >= stats["wait_avg_ms"] > 0
+
+
+def test_high_priority_takes_global_token_first():
+    queue, api = SendQueue(global_rate=50.0), FakeApi()
+
+    async def high(chat_id):
+        with send_priority(HIGH):
+            return await send(queue, api, chat_id, "result")
+
+    async def main():
+        queue._global_bucket(time.monotonic()).tokens = 0.0
+        await asyncio.gather(*(send(queue, api, chat_id, "menu") for chat_id in (1, 2, 3)), high(4))
+
+    asyncio.run(main())
+    assert [chat_id for chat_id, _, _ in api.calls] == [4, 1, 2, 3]
+
+
+def test_retry_after_pauses_chat_and_keeps_order():
+    queue, api = SendQueue(), FakeApi(retry_after=0.05, failures=1)
+
+    async def main():
+        return await asyncio.gather(send(queue, api, 1, "a"), send(queue, api, 1, "b"), send(queue, api, 2, "c"))
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
+    assert [text for chat_id, text, _ in api.calls if chat_id == 1] == ["a", "a", "b"]
+    first_a, second_a = [at for _, text, at in api.calls if text == "a"]
+    assert second_a - first_a >= 0.05 * 0.9
+    assert (queue.retries, queue.sent) == (1, 3)
+
+
+def test_retry_after_gives_up_after_max_retries():
+    queue, api = SendQueue(max_retries=2), FakeApi(failures=10)
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(send(queue, api, 1, "a"))
+    assert (len(api.calls), queue.retries, queue.sent, queue.depth) == (3, 2, 0, 0)
+
+
+def test_cancelled_sender_leaves_queue():
+    queue, api = SendQueue(chat_rate=1.0, chat_burst=1.0), FakeApi()
+
+    async def main():
+        await send(queue, api, 1, "a")
+        waiting = asyncio.ensure_future(send(queue, api, 1, "b"))
+        await asyncio.sleep(0.01)
+        assert queue.stats()["depth"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(main())
+    assert (queue.depth, queue.lanes[1].users, len(api.calls)) == (0, 0, 1)
@@ -0,0 +1,215 @@
+"""
+Хранилища FSM (storage): SQLite и Redis сохраняют запись целиком, write-behind
+копит изменения апдейта и пишет их в бэкенд одной операцией, память вытесняет
+брошенные сессии по TTL и лимиту.
+"""
+import asyncio
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from benchmarks import resp_server
+from storage import EvictingMemoryStorage, RecordStorage, RedisStorage, SQLiteStorage, WriteBehindStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+OTHER = StorageKey(bot_id=1, chat_id=20, user_id=20)
+DATA = {"surfaces": [["Стол", 120.0, 60.0, 2]], "reserve": 0.1, "name": "кухня"}
+
+
+async def round_trip(storage: RecordStorage) -> None:
+    assert await storage.get_record(KEY) == (None, {})
+    await storage.set_state(KEY, "CalcState:waiting_surface_name")
+    await storage.set_data(KEY, DATA)
+    assert await storage.get_record(KEY) == ("CalcState:waiting_surface_name", DATA)
+    assert await storage.get_record(OTHER) == (None, {})
+    await storage.update_data(KEY, {"reserve": 0.15})
+    assert await storage.get_data(KEY) == {**DATA, "reserve": 0.15}
+    # состояние сбрасывается, данные остаются
+    await storage.set_state(KEY, None)
+    assert await storage.get_record(KEY) == (None, {**DATA, "reserve": 0.15})
+    # пустая запись удаляется
+    await storage.set_data(KEY, {})
+    assert await storage.get_record(KEY) == (None, {})
+
+
+def test_sqlite_round_trip(tmp_path):
+    async def main():
+        storage = SQLiteStorage(str(tmp_path / "fsm.sqlite3"))
+        await round_trip(storage)
+        await storage.close()
+
+    asyncio.run(main())
+
+
+def test_sqlite_survives_reopen(tmp_path):
+    path = str(tmp_path / "fsm.sqlite3")
+
+    async def write():
+        storage = SQLiteStorage(path)
+        await storage.set_record(KEY, "CalcState:waiting_total_area", DATA)
+        await storage.close()
+
+    async def read():
+        storage = SQLiteStorage(path)
+        try:
+            return await storage.get_record(KEY)
+        finally:
+            await storage.close()
+
+    asyncio.run(write())
+    assert asyncio.run(read()) == ("CalcState:waiting_total_area", DATA)
+
+
+def test_redis_round_trip_and_ttl():
+    async def main():
+        stand_in, server, port = await resp_server.start()
+        storage = RedisStorage(f"redis://127.0.0.1:{port}/0", ttl=600)
+        try:
+            await round_trip(storage)
+            await storage.set_record(KEY, "CalcState:waiting_total_area", DATA)
+            assert list(stand_in.expires) == list(stand_in.hashes)
+            # параллельные запросы делят пул соединений и не путают ответы
+            keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(50)]
+            await asyncio.gather(*(storage.set_record(k, None, {"i": k.chat_id}) for k in keys))
+            got = await asyncio.gather(*(storage.get_data(k) for k in keys))
+            assert got == [{"i": k.chat_id} for k in keys]
+        finally:
+            await storage.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(main())
+
+
+class CountingStorage(RecordStorage):
+    def __init__(self) -> None:
+        self.records = {}
+        self.reads = 0
+        self.writes = 0
+
+    async def get_record(self, key):
+        self.reads += 1
+        state, data = self.records.get(key, (None, {}))
+        return state, dict(data)
+
+    async def set_record(self, key, state, data):
+        self.writes += 1
+        self.records[key] = (state, dict(data))
+
+    async def close(self) -> None:
+        pass
+
+
+def test_write_behind_one_read_one_write_per_update():
+    backend = CountingStorage()
+    storage = WriteBehindStorage(backend)
+
+    async def main():
+        async with storage.batch():
+            await storage.set_state(KEY, "CalcState:waiting_surface_name")
+            await storage.update_data(KEY, {"a": 1})
+            await storage.update_data(KEY, {"b": 2})
+            assert await storage.get_data(KEY) == {"a": 1, "b": 2}
+            assert backend.writes == 0
+        return await storage.get_record(KEY)
+
+    assert asyncio.run(main()) == ("CalcState:waiting_surface_name", {"a": 1, "b": 2})
+    assert (backend.reads, backend.writes) == (2, 1)     # +1 чтение вне апдейта
+    assert (storage.flushes, storage.coalesced_writes) == (1, 2)
+
+
+def test_write_behind_skips_clean_keys_and_flushes_on_error():
+    backend = CountingStorage()
+    storage = WriteBehindStorage(backend)
+
+    async def main():
+        async with storage.batch():
+            await storage.get_state(OTHER)
+        with pytest.raises(RuntimeError):
+            async with storage.batch():
+                await storage.update_data(KEY, {"a": 1})
+                raise RuntimeError
+
+    asyncio.run(main())
+    assert backend.writes == 1
+    assert backend.records == {KEY: (None, {"a": 1})}
+
+
+def test_write_behind_outside_update_goes_direct():
+    backend = CountingStorage()
+    storage = WriteBehindStorage(backend)
+    asyncio.run(storage.set_data(KEY, {"a": 1}))
+    assert backend.records == {KEY: (None, {"a": 1})}
+    assert storage.flushes == 0
+
+
+def age(storage: EvictingMemoryStorage, key: StorageKey, seconds: float) -> None:
+    storage.records[key].touched -= seconds
+
+
+def test_memory_round_trip():
+    asyncio.run(round_trip(EvictingMemoryStorage(ttl=600, max_sessions=10)))
+
+
+def test_memory_idle_ttl():
+    storage = EvictingMemoryStorage(ttl=60)
+
+    async def main():
+        await storage.set_record(KEY, "s", {"a": 1})
+        await storage.set_record(OTHER, "s", {"b": 2})
+        age(storage, KEY, 61)
+        age(storage, OTHER, 59)
+        return await storage.get_record(KEY), await storage.get_record(OTHER)
+
+    assert asyncio.run(main()) == ((None, {}), ("s", {"b": 2}))
+    assert storage.stats()["evicted_ttl"] == 1
+    assert list(storage.records) == [OTHER]
+
+
+def test_memory_evicts_least_recently_used():
+    storage = EvictingMemoryStorage(max_sessions=2)
+    third = StorageKey(bot_id=1, chat_id=30, user_id=30)
+
+    async def main():
+        await storage.set_record(KEY, "s", {"a": 1})
+        await storage.set_record(OTHER, "s", {"b": 2})
+        await storage.get_record(KEY)                   # KEY свежее OTHER
+        await storage.set_record(third, "s", {"c": 3})
+
+    asyncio.run(main())
+    assert list(storage.records) == [KEY, third]
+    assert storage.stats()["evicted_lru"] == 1
+
+
+def test_memory_sweep_in_batches():
+    storage = EvictingMemoryStorage(ttl=60, sweep_batch=2)
+    keys = [StorageKey(bot_id=1, chat_id=i, user_id=i) for i in range(5)]
+
+    async def main():
+        for k in keys:
+            await storage.set_record(k, "s", {"i": k.chat_id})
+        for k in keys[:3]:
+            age(storage, k, 61)
+        return await storage.sweep()
+
+    assert asyncio.run(main()) == 3
+    assert list(storage.records) == keys[3:]
+    assert storage.stats()["evicted_ttl"] == 3
+
+
+def test_memory_bytes_measured_lazily():
+    storage = EvictingMemoryStorage(sweep_batch=1)
+
+    async def main():
+        await storage.set_record(KEY, "s", DATA)
+        await storage.set_record(OTHER, None, {"b": 2})
+        assert storage.stats()["bytes"] == 0             # запись не сериализует данные
+        assert await storage.measure() == 2
+        sized = storage.stats()["bytes"]
+        assert await storage.measure() == 0
+        await storage.set_record(KEY, None, {})
+        return sized, storage.stats()
+
+    sized, stats = asyncio.run(main())
+    assert sized > 2 * EvictingMemoryStorage.RECORD_OVERHEAD
+    assert stats == {"sessions": 1, "bytes": storage.records[OTHER].size, "evicted_ttl": 0, "evicted_lru": 0}
@@ -0,0 +1,80 @@
+"""
+Ограничение частоты (throttle.ThrottleMiddleware): всплеск burst, пополнение 1/rate,
+чистка таблицы и ответ на отсечённые апдейты.
+"""
+import asyncio
+
+import pytest
+from aiogram.dispatcher.middlewares.user_context import EVENT_CONTEXT_KEY, EventContext
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import Update, User
+
+from throttle import ThrottleMiddleware
+
+USER = {"id": 7, "is_bot": False, "first_name": "u"}
+
+
+def test_burst_then_reject():
+    throttle = ThrottleMiddleware(rate=2.0, burst=3)
+    assert [throttle.allow(7, 100.0) for _ in range(4)] == [True, True, True, False]
+    assert throttle.allow(8, 100.0)                      # у другого пользователя своё ведро
+
+
+def test_refill_one_token_per_interval():
+    throttle = ThrottleMiddleware(rate=2.0, burst=3)
+    for _ in range(3):
+        throttle.allow(7, 100.0)
+    assert not throttle.allow(7, 100.4)
+    assert throttle.allow(7, 100.5)
+    assert not throttle.allow(7, 100.5)
+    # после простоя ведро полное, но не больше burst
+    assert [throttle.allow(7, 200.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_sweep_drops_full_buckets():
+    throttle = ThrottleMiddleware(rate=2.0, burst=3)
+    throttle.allow(7, 100.0)
+    throttle.allow(8, 100.0)
+    throttle.allow(8, 100.0)
+    assert throttle.sweep(100.6) == 1
+    assert list(throttle.tat) == [8]
+    assert throttle.sweep(101.1) == 1 and throttle.tat == {}
+
+
+def update(kind: str, n: int) -> Update:
+    payload = {
+        "message": {"message_id": n, "date": 0, "chat": {"id": 7, "type": "private"}, "from": USER, "text": "12"},
+        "callback_query": {"id": str(n), "chat_instance": "c", "from": USER, "data": "calc:laminate"},
+        "inline_query": {"id": str(n), "from": USER, "query": "12", "offset": ""},
+    }[kind]
+    return Update.model_validate({"update_id": n, kind: payload})
+
+
+def dispatch(throttle: ThrottleMiddleware, kind: str, count: int):
+    async def handler(event, data):
+        return "handled"
+
+    async def main():
+        data = {EVENT_CONTEXT_KEY: EventContext(user=User(**USER))}
+        return [await throttle(handler, update(kind, n), data) for n in range(count)]
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind, rejected", [("message", None), ("callback_query", AnswerCallbackQuery)])
+def test_over_limit_rejected(kind, rejected):
+    throttle = ThrottleMiddleware(rate=1.0, burst=2)
+    results = dispatch(throttle, kind, 3)
+    assert results[:2] == ["handled", "handled"]
+    if rejected is None:
+        assert results[2] is None
+    else:
+        assert isinstance(results[2], rejected) and results[2].callback_query_id == "2"
+    stats = throttle.stats()
+    assert (stats["passed"], stats["throttled"], stats[f"throttled_{kind}"]) == (2, 1, 1)
+
+
+def test_inline_queries_not_throttled():
+    throttle = ThrottleMiddleware(rate=1.0, burst=2)
+    assert dispatch(throttle, "inline_query", 5) == ["handled"] * 5
+    assert throttle.stats()["passed"] == 0 and throttle.tat == {}
@@ -0,0 +1,76 @@
+"""
+Ограничение частоты апдейтов от одного пользователя (outer-middleware на update).
+
+Ведро токенов в виде GCRA: на пользователя хранится одно число — момент, когда его
+ведро снова станет полным (tat). Апдейт проходит, если tat - now не больше «допуска»
+на всплеск burst, и сдвигает tat на 1/rate. Запись с tat <= now ничем не отличается
+от отсутствующей, поэтому таблица чистится простым проходом раз в sweep_interval.
+
+Стоит перед FSMContextMiddleware (см. bot.py): отсечённый апдейт не берёт замок чата,
+не читает хранилище и не шлёт сообщений. Нажатию кнопки сверх лимита отвечаем
+AnswerCallbackQuery прямо результатом апдейта — в webhook это тело HTTP-ответа,
+в polling aiogram отправит его сам, — чтобы у пользователя не висели «часики».
+
+Inline-запросы не ограничиваются и токены не тратят: Telegram шлёт их на каждое нажатие
+клавиши, а отвечать надо на последний — иначе подсказка так и останется от старого текста.
+Хранилище и замок чата им не нужны, так что спамить ими дёшево и без ограничителя.
+"""
+import time
+from typing import Any, Dict
+
+from aiogram.dispatcher.middlewares.user_context import EVENT_CONTEXT_KEY
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import Update
+
+
+class ThrottleMiddleware:
+    def __init__(self, rate: float = 3.0, burst: int = 10, sweep_interval: float = 60.0) -> None:
+        self.interval = 1.0 / rate
+        self.tolerance = (burst - 1) * self.interval
+        self.sweep_interval = sweep_interval
+        self.tat: Dict[int, float] = {}
+        self._next_sweep = 0.0
+        self.passed = 0
+        self.throttled: Dict[str, int] = {"callback_query": 0, "message": 0, "other": 0}
+
+    def allow(self, user_id: int, now: float) -> bool:
+        tat = self.tat.get(user_id, now)
+        if tat < now:
+            tat = now
+        if tat - now > self.tolerance:
+            return False
+        self.tat[user_id] = tat + self.interval
+        return True
+
+    def sweep(self, now: float) -> int:
+        before = len(self.tat)
+        self.tat = {uid: tat for uid, tat in self.tat.items() if tat > now}
+        return before - len(self.tat)
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]) -> Any:
+        context = data.get(EVENT_CONTEXT_KEY)
+        user_id = context.user_id if context is not None else None
+        if user_id is None or event.inline_query is not None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+            self._next_sweep = now + self.sweep_interval
+        if self.allow(user_id, now):
+            self.passed += 1
+            return await handler(event, data)
+
+        if event.callback_query is not None:
+            self.throttled["callback_query"] += 1
+            return AnswerCallbackQuery(callback_query_id=event.callback_query.id)
+        self.throttled["message" if event.message is not None else "other"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passed": self.passed,
+            "throttled": sum(self.throttled.values()),
+            **{f"throttled_{kind}": n for kind, n in self.throttled.items()},
+            "buckets": len(self.tat),
+        }